@@ -0,0 +1,142 @@
+"""
+Nearby-tattooer search benchmark: geohash index vs. a full scan sorted by distance.
+
+    $ python benchmarks/geo.py --count 1000000 --queries 200
+
+Profiles are generated in a throwaway SQLite file (reused between runs with --keep),
+clustered around city centres like a real marketplace, plus a uniform background.
+For each query shape the script reports the median and p95 latency of
+api.geo.nearest and checks it returns the same ids as the naive scan.
+"""
+import argparse
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '../src'))
+
+from sqlalchemy import insert, select  # noqa: E402
+from app import create_app  # noqa: E402
+from api.models import db, Profile, Category  # noqa: E402
+from api.geo import nearest, haversine_km  # noqa: E402
+from api.geohash import encode  # noqa: E402
+
+# (lat, lng) de ciudades: la mayoria de los perfiles cae cerca de alguna
+CITIES = [
+    (-33.45, -70.66), (-34.60, -58.38), (-23.55, -46.63), (19.43, -99.13), (40.71, -74.01),
+    (34.05, -118.24), (51.51, -0.13), (48.86, 2.35), (52.52, 13.40), (40.42, -3.70),
+    (41.39, 2.17), (35.68, 139.69), (37.57, 126.98), (-37.81, 144.96), (4.71, -74.07),
+]
+INSERT_BATCH = 20000
+
+SHAPES = [
+    ('k=20 city', lambda rng: (_near_city(rng), {'k': 20})),
+    ('k=20 rural', lambda rng: (_uniform(rng), {'k': 20})),
+    ('radius 5km', lambda rng: (_near_city(rng), {'k': 100, 'max_radius_km': 5})),
+    ('radius 50km', lambda rng: (_near_city(rng), {'k': 100, 'max_radius_km': 50})),
+    ('k=20 category', lambda rng: (_near_city(rng), {'k': 20, 'category': True})),
+]
+
+
+def _near_city(rng):
+    lat, lng = rng.choice(CITIES)
+    return lat + rng.gauss(0, 0.15), lng + rng.gauss(0, 0.15)
+
+
+def _uniform(rng):
+    return rng.uniform(-55, 70), rng.uniform(-180, 180)
+
+
+def populate(count, categories, seed=1):
+    rng = random.Random(seed)
+    db.session.execute(insert(Category), [
+        {'name': f'category-{index}', 'description': '', 'image': ''} for index in range(categories)
+    ])
+    rows = []
+    for index in range(count):
+        lat, lng = _near_city(rng) if rng.random() < 0.9 else _uniform(rng)
+        lat = max(min(lat, 90.0), -90.0)
+        lng = (lng + 180) % 360 - 180
+        rows.append({
+            'user_id': index + 1, 'bio': '', 'social_media': None, 'profile_picture': '',
+            'ranking': rng.randint(0, 5), 'category_id': rng.randint(1, categories),
+            'latitude': lat, 'longitude': lng, 'geohash': encode(lat, lng),
+        })
+        if len(rows) == INSERT_BATCH:
+            db.session.execute(insert(Profile), rows)
+            rows = []
+    if rows:
+        db.session.execute(insert(Profile), rows)
+    db.session.commit()
+
+
+def naive(all_rows, lat, lng, k, max_radius_km, category_id):
+    hits = sorted(
+        (haversine_km(lat, lng, row_lat, row_lng), profile_id)
+        for profile_id, row_lat, row_lng, row_category in all_rows
+        if category_id is None or row_category == category_id
+    )
+    return [profile_id for distance, profile_id in hits[:k] if distance <= max_radius_km]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1000000, help='profiles to generate')
+    parser.add_argument('--queries', type=int, default=200, help='queries per shape')
+    parser.add_argument('--categories', type=int, default=12)
+    parser.add_argument('--naive-queries', type=int, default=5, help='full scans per shape (slow)')
+    parser.add_argument('--database', default=os.path.join(tempfile.gettempdir(), 'geo_benchmark.db'))
+    parser.add_argument('--keep', action='store_true', help='reuse the database of a previous run')
+    args = parser.parse_args()
+
+    if not args.keep and os.path.exists(args.database):
+        os.remove(args.database)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{args.database}',
+                      'JWT_SECRET_KEY': 'benchmark', 'ENABLE_CLI': False, 'ENABLE_ADMIN': False})
+    with app.app_context():
+        db.create_all()
+        existing = db.session.scalar(select(db.func.count(Profile.id)))
+        if not existing:
+            start = time.perf_counter()
+            populate(args.count, args.categories)
+            print(f'generated {args.count} profiles in {time.perf_counter() - start:.1f}s')
+        else:
+            print(f'reusing {existing} profiles from {args.database}')
+
+        all_rows = db.session.execute(
+            select(Profile.id, Profile.latitude, Profile.longitude, Profile.category_id)
+        ).all()
+        rng = random.Random(7)
+        print(f'{"query":16} {"median ms":>10} {"p95 ms":>10} {"naive ms":>10}')
+        for name, make in SHAPES:
+            timings, naive_timings = [], []
+            for index in range(args.queries):
+                (lat, lng), params = make(rng)
+                category_id = rng.randint(1, args.categories) if params.get('category') else None
+                criteria = [Profile.category_id == category_id] if category_id else []
+                max_radius_km = params.get('max_radius_km', 500.0)
+                start = time.perf_counter()
+                hits = nearest(lat, lng, params['k'], max_radius_km, criteria)
+                timings.append((time.perf_counter() - start) * 1000)
+                if index < args.naive_queries:
+                    start = time.perf_counter()
+                    expected = naive(all_rows, lat, lng, params['k'], max_radius_km, category_id)
+                    naive_timings.append((time.perf_counter() - start) * 1000)
+                    got = [profile_id for profile_id, _ in hits]
+                    if got != expected:
+                        print(f'  mismatch in {name} at ({lat:.4f}, {lng:.4f}): {got[:5]} != {expected[:5]}')
+            naive_ms = statistics.median(naive_timings) if naive_timings else float('nan')
+            print(f'{name:16} {statistics.median(timings):10.2f} {percentile(timings, 0.95):10.2f} {naive_ms:10.0f}')
+
+
+if __name__ == '__main__':
+    main()
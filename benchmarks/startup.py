@@ -0,0 +1,62 @@
+"""
+Startup benchmark: boot time and peak RSS of a fresh process building the app.
+
+    $ python benchmarks/startup.py --runs 5
+
+Each run starts a clean interpreter, so imports are not cached between runs.
+Modes:
+  cli     create_app() as used by `flask ...` (admin + Migrate + commands)
+  worker  create_app({'ENABLE_CLI': False}) as built by src/wsgi.py
+  lean    worker without Flask-Admin (ENABLE_ADMIN=0)
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), '../src')
+
+MODES = {
+    'cli': {},
+    'worker': {'ENABLE_CLI': False},
+    'lean': {'ENABLE_CLI': False, 'ENABLE_ADMIN': False},
+}
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+from app import create_app
+app = create_app(json.loads(sys.argv[1]))
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'seconds': elapsed, 'rss_kb': rss_kb, 'modules': len(sys.modules)}))
+"""
+
+
+def measure(config):
+    output = subprocess.check_output(
+        [sys.executable, '-c', PROBE, json.dumps(config)], cwd=SRC_DIR,
+        # create_app no arranca sin clave JWT
+        env={'JWT_SECRET_KEY': 'benchmark', **os.environ}
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'boot ms (median)':>17} {'peak RSS MB':>12} {'modules':>8}")
+    for mode, config in MODES.items():
+        samples = [measure(config) for _ in range(args.runs)]
+        boot_ms = statistics.median(sample['seconds'] for sample in samples) * 1000
+        rss_mb = statistics.median(sample['rss_kb'] for sample in samples) / 1024
+        modules = samples[-1]['modules']
+        print(f"{mode:<8} {boot_ms:>17.1f} {rss_mb:>12.1f} {modules:>8}")
+
+
+if __name__ == '__main__':
+    main()
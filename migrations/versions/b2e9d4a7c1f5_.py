@@ -0,0 +1,45 @@
+"""change_event ids are never reused (SQLite AUTOINCREMENT)
+
+Revision ID: b2e9d4a7c1f5
+Revises: d9f2b7c4a1e6
+Create Date: 2026-10-19 10:24:51.603117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2e9d4a7c1f5'
+down_revision = 'd9f2b7c4a1e6'
+branch_labels = None
+depends_on = None
+
+
+def _set_sequence(bind):
+    # La secuencia parte sobre todo id ya entregado, aunque cdc-prune haya vaciado la tabla
+    last_id = bind.execute(sa.text(
+        'SELECT max(coalesce((SELECT max(id) FROM change_event), 0), '
+        'coalesce((SELECT max(last_event_id) FROM cdc_checkpoint), 0))'
+    )).scalar()
+    bind.execute(sa.text("DELETE FROM sqlite_sequence WHERE name = 'change_event'"))
+    bind.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES ('change_event', :seq)"), {'seq': last_id})
+
+
+def upgrade():
+    bind = op.get_bind()
+    # En PostgreSQL la secuencia del serial ya no retrocede
+    if bind.dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('change_event', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        pass
+    _set_sequence(bind)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('change_event', recreate='always',
+                              table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+        pass
@@ -0,0 +1,30 @@
+"""idempotency_key.created_at NOT NULL and indexed for the TTL prune
+
+Revision ID: c8f1e3a6d2b4
+Revises: b2e9d4a7c1f5
+Create Date: 2026-10-19 11:02:17.480926
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f1e3a6d2b4'
+down_revision = 'b2e9d4a7c1f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Claves sin fecha: cuentan desde ahora y vencen con el primer prune pasado el TTL
+    op.execute(sa.text('UPDATE idempotency_key SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL'))
+    with op.batch_alter_table('idempotency_key', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index(batch_op.f('ix_idempotency_key_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('idempotency_key', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_idempotency_key_created_at'))
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
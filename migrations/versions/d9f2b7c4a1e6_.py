@@ -0,0 +1,70 @@
+"""notification_archive; archival index on notification; one like per user and post
+
+Revision ID: d9f2b7c4a1e6
+Revises: c3a7e5d91f48
+Create Date: 2026-10-19 01:12:40.218733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9f2b7c4a1e6'
+down_revision = 'c3a7e5d91f48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.DateTime(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('min_id', sa.Integer(), nullable=False),
+    sa.Column('max_id', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'month', name='uq_notification_archive_user_month')
+    )
+    with op.batch_alter_table('notification_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_notification_archive_user_max_id', ['user_id', 'max_id'], unique=False)
+
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.create_index('ix_notification_read_created', ['is_read', 'created_at'], unique=False)
+
+    # Likes repetidos (mismo usuario y post) se borran antes del indice unico y el
+    # contador de esos posts se recalcula
+    bind = op.get_bind()
+    duplicated = [row[0] for row in bind.execute(sa.text(
+        'SELECT DISTINCT post_id FROM likes GROUP BY post_id, user_id HAVING count(*) > 1'
+    ))]
+    if duplicated:
+        bind.execute(sa.text(
+            'DELETE FROM likes WHERE id NOT IN (SELECT min(id) FROM likes GROUP BY post_id, user_id)'
+        ))
+        for post_id in duplicated:
+            bind.execute(sa.text(
+                'UPDATE post SET likes = (SELECT count(*) FROM likes WHERE post_id = :post_id) WHERE id = :post_id'
+            ), {'post_id': post_id})
+
+    with op.batch_alter_table('likes', schema=None) as batch_op:
+        batch_op.drop_index('ix_likes_post_id')
+        batch_op.create_index('ix_likes_post_user', ['post_id', 'user_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('likes', schema=None) as batch_op:
+        batch_op.drop_index('ix_likes_post_user')
+        batch_op.create_index('ix_likes_post_id', ['post_id'], unique=False)
+
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.drop_index('ix_notification_read_created')
+
+    with op.batch_alter_table('notification_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_notification_archive_user_max_id')
+
+    op.drop_table('notification_archive')
@@ -0,0 +1,51 @@
+"""likes, post and review ids are never reused (SQLite AUTOINCREMENT)
+
+Revision ID: f3a7c2e9b5d1
+Revises: c8f1e3a6d2b4
+Create Date: 2026-10-19 12:14:06.251873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a7c2e9b5d1'
+down_revision = 'c8f1e3a6d2b4'
+branch_labels = None
+depends_on = None
+
+# Tabla de origen -> fuente del watermark de rollups
+TABLES = {'likes': 'likes', 'post': 'posts', 'review': 'reviews'}
+
+
+def _set_sequence(bind, table, source):
+    # La secuencia parte sobre todo id ya agregado, aunque esas filas se hayan borrado
+    last_id = bind.execute(sa.text(
+        f'SELECT max(coalesce((SELECT max(id) FROM {table}), 0), '
+        'coalesce((SELECT last_id FROM rollup_watermark WHERE source = :source), 0))'
+    ), {'source': source}).scalar()
+    bind.execute(sa.text('DELETE FROM sqlite_sequence WHERE name = :table'), {'table': table})
+    bind.execute(sa.text('INSERT INTO sqlite_sequence (name, seq) VALUES (:table, :seq)'),
+                 {'table': table, 'seq': last_id})
+
+
+def upgrade():
+    bind = op.get_bind()
+    # En PostgreSQL la secuencia del serial ya no retrocede
+    if bind.dialect.name != 'sqlite':
+        return
+    for table, source in TABLES.items():
+        with op.batch_alter_table(table, recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+            pass
+        _set_sequence(bind, table, source)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for table in TABLES:
+        with op.batch_alter_table(table, recreate='always',
+                                  table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+            pass
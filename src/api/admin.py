@@ -1,17 +1,278 @@
-  
 import os
+import time
+from collections import OrderedDict
+from flask import flash
 from flask_admin import Admin
-from .models import db, User
+from flask_admin.actions import action
+from flask_admin.babel import gettext, ngettext, lazy_gettext
+from .models import db, User, UserType, Profile, Post, Likes, Review, Notification, Category
+from .ratings import rating_delta_statements, deltas_for_rows, counted_reviews
+from .cdc import record_changes, record_deletes
+from .rollups import discount_rollups
 from flask_admin.contrib.sqla import ModelView
+from sqlalchemy import delete, update, select, func, text
+
+# Seconds a table count is reused before running count(*) again
+COUNT_CACHE_SECONDS = 60
+# Above this many rows the Postgres planner estimate is good enough for the pager
+APPROXIMATE_COUNT_THRESHOLD = 100000
+# Page boundaries remembered per view for keyset pagination
+KEYSET_CACHE_SIZE = 256
+
+
+class CachedCountQuery:
+    """
+    Stands in for the count query of an unfiltered list page: `scalar()` answers from the
+    view's count cache. Search and filters call `filter`/`join` on it, which returns the
+    real query, so filtered counts stay exact.
+    """
+    def __init__(self, view, query):
+        self._view = view
+        self._query = query
+
+    def scalar(self):
+        return self._view.cached_count()
+
+    def __getattr__(self, name):
+        return getattr(self._query, name)
+
+
+class FastModelView(ModelView):
+    """
+    ModelView for large tables: cached/approximate counts, keyset pagination on the
+    default id ordering, scalar-only column lists and set-based bulk deletes.
+    """
+    page_size = 50
+    can_set_page_size = True
+    column_display_pk = True
+    column_default_sort = ('id', True)
+    # Searches use LIKE: prefix searches ("^term") can use the column index
+    search_placeholder_text = 'Search (^prefix uses the index)'
+
+    def __init__(self, model, session, **kwargs):
+        super().__init__(model, session, **kwargs)
+        self._count_cache = None
+        self._page_boundaries = OrderedDict()
+
+    def search_placeholder(self):
+        return self.search_placeholder_text
+
+    def get_count_query(self):
+        return CachedCountQuery(self, super().get_count_query())
+
+    def cached_count(self):
+        now = time.monotonic()
+        if self._count_cache is not None and self._count_cache[1] > now:
+            return self._count_cache[0]
+        count = self._estimate_count()
+        if count is None:
+            count = super().get_count_query().scalar()
+        self._count_cache = (count, now + COUNT_CACHE_SECONDS)
+        return count
+
+    def _estimate_count(self):
+        # Postgres keeps a row estimate per table; count(*) is only needed for small tables
+        if self.session.get_bind().dialect.name != 'postgresql':
+            return None
+        estimate = self.session.execute(
+            text('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)'),
+            {'name': f'"{self.model.__tablename__}"'}
+        ).scalar()
+        if estimate is None or estimate < APPROXIMATE_COUNT_THRESHOLD:
+            return None
+        return estimate
+
+    def _remember_boundary(self, key, last_id):
+        self._page_boundaries[key] = (last_id, time.monotonic() + COUNT_CACHE_SECONDS)
+        self._page_boundaries.move_to_end(key)
+        while len(self._page_boundaries) > KEYSET_CACHE_SIZE:
+            self._page_boundaries.popitem(last=False)
+
+    def _boundary(self, key):
+        entry = self._page_boundaries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            return None
+        return entry[0]
+
+    def get_list(self, page, sort_column, sort_desc, search, filters,
+                 execute=True, page_size=None):
+        page_size = page_size or self.page_size
+        # Without a page size limit there is nothing to paginate
+        count, query = super().get_list(page, sort_column, sort_desc, search, filters,
+                                        execute=False, page_size=False)
+
+        # Keyset pagination is possible on the default "id desc" ordering when the
+        # previous page was already served: continue after its last id instead of OFFSET
+        keyset = sort_column is None and not search and not filters
+        boundary = self._boundary((page - 1, page_size)) if keyset and page else None
+        if boundary is not None:
+            query = query.filter(self.model.id < boundary).limit(page_size)
+        else:
+            query = self._apply_pagination(query, page, page_size)
+
+        if not execute:
+            return count, query
+        rows = query.all()
+        if keyset and rows:
+            self._remember_boundary((page or 0, page_size), rows[-1].id)
+        return count, rows
+
+    def dependent_statements(self, ids):
+        """
+        Set-based statements that must run before deleting the rows in `ids`
+        (children without ON DELETE CASCADE, derived data). Override per model.
+        """
+        return []
+
+    @action('delete',
+            lazy_gettext('Delete'),
+            lazy_gettext('Are you sure you want to delete selected records?'))
+    def action_delete(self, ids):
+        try:
+            ids = [int(pk) for pk in ids]
+            for statement in self.dependent_statements(ids):
+                self.session.execute(statement)
+            record_deletes(self.session, self.model, self.model.id.in_(ids))
+            discount_rollups(self.session, self.model, self.model.id.in_(ids))
+            count = self.session.execute(
+                delete(self.model).where(self.model.id.in_(ids))
+            ).rowcount
+            self.session.commit()
+            self._count_cache = None
+            self._page_boundaries.clear()
+
+            flash(ngettext('Record was successfully deleted.',
+                           '%(count)s records were successfully deleted.',
+                           count,
+                           count=count), 'success')
+        except Exception as ex:
+            self.session.rollback()
+            if not self.handle_view_exception(ex):
+                raise
+
+            flash(gettext('Failed to delete records. %(error)s', error=str(ex)), 'error')
+
+
+class UserAdmin(FastModelView):
+    # Deleting a user needs a full cleanup of its content, the API takes care of that
+    can_delete = False
+    column_list = ('id', 'username', 'email', 'name', 'user_type_id', 'notification_enabled', 'created_at')
+    column_searchable_list = ('username', 'email')
+    column_filters = ('user_type_id', 'notification_enabled', 'created_at')
+    form_excluded_columns = ('profile', 'reviews', 'posts', 'notifications', 'likes')
+
+
+class UserTypeAdmin(FastModelView):
+    can_delete = False
+    column_list = ('id', 'name', 'description')
+    column_searchable_list = ('name',)
+    form_excluded_columns = ('users',)
+
+
+class CategoryAdmin(FastModelView):
+    can_delete = False
+    column_list = ('id', 'name', 'description', 'image')
+    column_searchable_list = ('name',)
+    form_excluded_columns = ('profile',)
+
+
+class ProfileAdmin(FastModelView):
+    column_list = ('id', 'user_id', 'category_id', 'ranking', 'profile_picture')
+    column_filters = ('user_id', 'category_id', 'ranking')
+    form_ajax_refs = {'user': {'fields': ('username', 'email')}}
+
+
+class PostAdmin(FastModelView):
+    column_list = ('id', 'user_id', 'image', 'description', 'likes', 'created_at')
+    column_filters = ('user_id', 'created_at', 'likes')
+    form_excluded_columns = ('post_likes',)
+    form_ajax_refs = {'user': {'fields': ('username', 'email')}}
+
+    def dependent_statements(self, ids):
+        # Spam cleanup: the likes of the selected posts go in the same transaction
+        record_deletes(self.session, Likes, Likes.post_id.in_(ids))
+        discount_rollups(self.session, Likes, Likes.post_id.in_(ids))
+        return [delete(Likes).where(Likes.post_id.in_(ids))]
+
+
+class LikesAdmin(FastModelView):
+    column_list = ('id', 'user_id', 'post_id')
+    column_filters = ('user_id', 'post_id')
+    form_ajax_refs = {
+        'user': {'fields': ('username', 'email')},
+        'post': {'fields': ('description',)},
+    }
+
+    def dependent_statements(self, ids):
+        # Keep the Post.likes counter in sync with the rows being removed
+        removed = (
+            select(func.count(Likes.id))
+            .where(Likes.post_id == Post.id, Likes.id.in_(ids))
+            .scalar_subquery()
+        )
+        affected = select(Likes.post_id).where(Likes.id.in_(ids))
+        post_ids = self.session.scalars(affected.distinct()).all()
+        user_ids = dict(self.session.execute(select(Post.id, Post.user_id).where(Post.id.in_(post_ids))).all())
+        record_changes(self.session, Post, [{'id': post_id, 'user_id': user_ids.get(post_id)} for post_id in post_ids],
+                       'update', fields=['likes'])
+        return [update(Post).where(Post.id.in_(affected)).values(likes=Post.likes - removed)]
+
+
+class ReviewAdmin(FastModelView):
+    column_list = ('id', 'tattooer_id', 'user_id', 'rating', 'description', 'created_at')
+    column_filters = ('tattooer_id', 'user_id', 'rating', 'created_at')
+    form_ajax_refs = {
+        'user': {'fields': ('username', 'email')},
+        'tattooer': {'fields': ('username', 'email')},
+    }
+
+    def dependent_statements(self, ids):
+        # The set-based delete skips the ORM flush, so the rating histogram is adjusted here
+        # (reviews by soft-deleted authors were already taken out)
+        rows = self.session.execute(counted_reviews(Review.id.in_(ids))).all()
+        return rating_delta_statements(self.session.get_bind().dialect.name, deltas_for_rows(rows, sign=-1))
+
+
+class NotificationAdmin(FastModelView):
+    column_list = ('id', 'user_id', 'sender_id', 'type', 'is_read', 'created_at')
+    column_filters = ('user_id', 'sender_id', 'type', 'is_read', 'created_at')
+    form_ajax_refs = {
+        'user': {'fields': ('username', 'email')},
+        'sender': {'fields': ('username', 'email')},
+    }
+
+    @action('mark_read', 'Mark as read')
+    def action_mark_read(self, ids):
+        # Only unread rows change; the bulk UPDATE skips the flush, so their change events
+        # are written here, in the same transaction
+        rows = [row._asdict() for row in self.session.execute(
+            select(Notification.id, Notification.user_id, Notification.sender_id)
+            .where(Notification.id.in_([int(pk) for pk in ids]), Notification.is_read.is_(False))
+        )]
+        if rows:
+            self.session.execute(
+                update(Notification).where(Notification.id.in_([row['id'] for row in rows])).values(is_read=True)
+            )
+            record_changes(self.session, Notification, rows, 'update', fields=['is_read'])
+        self.session.commit()
+        flash(f'{len(rows)} notifications marked as read', 'success')
+
 
 def setup_admin(app):
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     admin = Admin(app, name='4Geeks Admin', template_mode='bootstrap3')
 
-    
+
     # Add your models here, for example this is how we add a the User model to the admin
-    admin.add_view(ModelView(User, db.session))
+    admin.add_view(UserAdmin(User, db.session))
+    admin.add_view(UserTypeAdmin(UserType, db.session))
+    admin.add_view(ProfileAdmin(Profile, db.session))
+    admin.add_view(CategoryAdmin(Category, db.session))
+    admin.add_view(PostAdmin(Post, db.session))
+    admin.add_view(LikesAdmin(Likes, db.session))
+    admin.add_view(ReviewAdmin(Review, db.session))
+    admin.add_view(NotificationAdmin(Notification, db.session))
 
     # You can duplicate that line to add mew models
-    # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
+    # admin.add_view(ModelView(YourModelName, db.session))
@@ -0,0 +1,153 @@
+"""
+Retention for notifications: a hot table and a compressed monthly archive.
+
+`notification` only keeps what inboxes read all the time: unread notifications and the
+recent ones. `archive_notifications` moves read notifications older than N days into
+`notification_archive`, one row per user and month holding the zlib-compressed JSON of
+that month's notifications, so the hot table and its indexes stay the size of the
+active inboxes instead of growing forever.
+
+Routes keep querying `notification` only; the archive is read on a miss
+(`find_archived`) or when a client asks for it (`archived_page`, used by
+GET /api/notifications?include_archived=1).
+"""
+import json
+import zlib
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete
+from api.models import db, Notification, NotificationArchive
+from api.cdc import record_deletes
+
+ARCHIVE_AFTER_DAYS = 90
+# Columnas guardadas por notificacion; user_id ya esta en la fila del archivo
+ARCHIVED_FIELDS = tuple(name for name in Notification.SERIALIZE_FIELDS if name != 'user_id')
+DATE_FIELDS = ('date', 'created_at')
+COMPRESSION_LEVEL = 6
+
+
+def _pack(items):
+    raw = json.dumps(items, separators=(',', ':'), default=lambda value: value.isoformat())
+    return zlib.compress(raw.encode('utf-8'), COMPRESSION_LEVEL)
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(data))
+
+
+def _restore(user_id, item, fields=None):
+    # Mismo formato que Notification.serialize(fields)
+    data = {}
+    for name in Notification.SERIALIZE_FIELDS:
+        if fields is not None and name not in fields:
+            continue
+        value = user_id if name == 'user_id' else item.get(name)
+        if name in DATE_FIELDS and value is not None:
+            value = datetime.fromisoformat(value)
+        data[name] = value
+    return data
+
+
+def _month(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def archive_notifications(days=ARCHIVE_AFTER_DAYS, batch_size=1000, log=print):
+    """
+    Moves read notifications created more than `days` ago into the archive, one
+    transaction per batch (archive rows written and hot rows deleted together).
+    Returns the number of notifications moved.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    columns = [getattr(Notification, name) for name in ('user_id',) + ARCHIVED_FIELDS]
+    moved = 0
+    while True:
+        # ix_notification_read_created: las filas movidas ya no aparecen en la siguiente vuelta
+        rows = db.session.execute(
+            select(*columns).where(Notification.is_read.is_(True), Notification.created_at < cutoff)
+            .order_by(Notification.created_at).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        groups = {}
+        for row in rows:
+            item = row._asdict()
+            user_id = item.pop('user_id')
+            groups.setdefault((user_id, _month(item['created_at'])), []).append(item)
+
+        existing = {
+            (archive.user_id, archive.month): archive for archive in db.session.scalars(
+                select(NotificationArchive).where(
+                    NotificationArchive.user_id.in_({user_id for user_id, _ in groups}),
+                    NotificationArchive.month.in_({month for _, month in groups})
+                )
+            )
+        }
+        now = datetime.utcnow()
+        for (user_id, month), items in groups.items():
+            archive = existing.get((user_id, month))
+            if archive is not None:
+                # Se reescribe el mes completo; por id para no duplicar si se reintenta
+                merged = {item['id']: item for item in _unpack(archive.data)}
+                merged.update((item['id'], item) for item in items)
+                items = list(merged.values())
+            else:
+                archive = NotificationArchive(user_id=user_id, month=month)
+                db.session.add(archive)
+            # Del mas nuevo al mas viejo, el orden en que se leen
+            items.sort(key=lambda item: item['id'], reverse=True)
+            archive.data = _pack(items)
+            archive.count = len(items)
+            archive.min_id, archive.max_id = items[-1]['id'], items[0]['id']
+            archive.updated_at = now
+
+        ids = [row.id for row in rows]
+        # Para los consumidores CDC la fila salio de la tabla
+        record_deletes(db.session, Notification, Notification.id.in_(ids))
+        db.session.execute(delete(Notification).where(Notification.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+    log(f'notification: {moved} rows archived')
+    return moved
+
+
+def find_archived(user_id, notification_id, fields=None):
+    # Por el indice (user_id, max_id) casi siempre es un solo mes; None si no esta archivada
+    archives = db.session.scalars(
+        select(NotificationArchive).where(
+            NotificationArchive.user_id == user_id,
+            NotificationArchive.max_id >= notification_id,
+            NotificationArchive.min_id <= notification_id
+        )
+    )
+    for archive in archives:
+        for item in _unpack(archive.data):
+            if item['id'] == notification_id:
+                return _restore(user_id, item, fields)
+    return None
+
+
+def archived_page(user_id, limit, before_id=None, fields=None):
+    """
+    The newest `limit` archived notifications of the user with id < before_id, as
+    [(id, serialized notification)]. Reads archive rows newest first and stops as soon
+    as no older month can hold a larger id.
+    """
+    query = select(NotificationArchive).where(NotificationArchive.user_id == user_id) \
+        .order_by(NotificationArchive.max_id.desc())
+    if before_id is not None:
+        query = query.where(NotificationArchive.min_id < before_id)
+    found = []
+    # De a pocas filas: cada una trae un mes comprimido
+    result = db.session.scalars(query.execution_options(yield_per=4))
+    try:
+        for archive in result:
+            if len(found) >= limit and archive.max_id < found[limit - 1][0]:
+                break
+            found.extend(
+                (item['id'], _restore(user_id, item, fields)) for item in _unpack(archive.data)
+                if before_id is None or item['id'] < before_id
+            )
+            found.sort(key=lambda pair: pair[0], reverse=True)
+    finally:
+        result.close()
+    return found[:limit]
@@ -0,0 +1,216 @@
+"""
+Change-data-capture for the models derived data depends on.
+
+Every ORM flush that inserts, updates or deletes a Post, Likes, Review, Profile or
+Notification appends a compact event to the `change_event` outbox in the same
+transaction, so an event exists if and only if the change committed. Consumers read the
+outbox in id order with `read_batch`/`ack` (or `consume`), keeping a checkpoint per
+consumer name: delivery is at-least-once, handlers must be idempotent.
+
+Ids are taken at flush time but become visible at commit, so a slow transaction can
+commit after events with higher ids were already delivered. The checkpoint keeps the
+ids it skipped as gaps and `read_batch` re-reads them until they show up (delivered
+late, out of id order) or GAP_TIMEOUT passes (the transaction rolled back).
+
+Writes that bypass the unit of work (executemany inserts, set-based deletes) call
+`record_changes` / `record_deletes` themselves.
+"""
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import event, select, insert, delete, inspect, or_
+from sqlalchemy.orm import Session
+from api.models import db, Post, Likes, Review, Profile, Notification, ChangeEvent, CdcCheckpoint
+
+# Columnas que viajan en cada evento para que el consumidor pueda enrutar sin consultar
+TRACKED_MODELS = {
+    Post: ('user_id',),
+    Likes: ('post_id', 'user_id'),
+    Review: ('tattooer_id', 'user_id'),
+    Profile: ('user_id', 'category_id'),
+    Notification: ('user_id', 'sender_id'),
+}
+
+# Un hueco en los ids puede ser una transaccion que aun no hace commit: se vuelve a
+# buscar hasta que aparece o pasa este tiempo (entonces se asume que hizo rollback).
+# Los consumidores no esperan al hueco, asi que puede ser largo
+GAP_TIMEOUT = timedelta(minutes=30)
+
+# Despierta a los consumidores locales que esperan eventos nuevos
+_new_events = threading.Condition()
+
+
+def _event_row(obj, operation, fields=()):
+    keys = {key: getattr(obj, key) for key in TRACKED_MODELS[type(obj)]}
+    return {
+        'table_name': obj.__tablename__,
+        'row_id': obj.id,
+        'operation': operation,
+        'payload': {'keys': keys, 'fields': list(fields)},
+        'created_at': datetime.utcnow(),
+    }
+
+
+def _changed_fields(obj):
+    state = inspect(obj)
+    return [attr.key for attr in state.mapper.column_attrs if state.attrs[attr.key].history.has_changes()]
+
+
+@event.listens_for(Session, 'after_flush')
+def capture_changes(session, flush_context):
+    rows = []
+    for obj in session.new:
+        if type(obj) in TRACKED_MODELS:
+            rows.append(_event_row(obj, 'insert'))
+    for obj in session.dirty:
+        if type(obj) in TRACKED_MODELS and session.is_modified(obj, include_collections=False):
+            fields = _changed_fields(obj)
+            if fields:
+                rows.append(_event_row(obj, 'update', fields))
+    for obj in session.deleted:
+        if type(obj) in TRACKED_MODELS:
+            rows.append(_event_row(obj, 'delete'))
+    if rows:
+        session.connection().execute(insert(ChangeEvent.__table__), rows)
+        session.info['cdc_pending'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def notify_consumers(session):
+    if session.info.pop('cdc_pending', False):
+        with _new_events:
+            _new_events.notify_all()
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_pending(session):
+    session.info.pop('cdc_pending', None)
+
+
+def record_changes(session, model, rows, operation, fields=()):
+    """
+    Appends events for rows written without the ORM unit of work. `rows` are dicts
+    holding at least `id` and the model's routing keys.
+    """
+    if model not in TRACKED_MODELS or not rows:
+        return
+    now = datetime.utcnow()
+    session.execute(insert(ChangeEvent.__table__), [{
+        'table_name': model.__tablename__,
+        'row_id': row['id'],
+        'operation': operation,
+        'payload': {'keys': {key: row.get(key) for key in TRACKED_MODELS[model]}, 'fields': list(fields)},
+        'created_at': now,
+    } for row in rows])
+    session.info['cdc_pending'] = True
+
+
+def record_deletes(session, model, criteria):
+    # Captura las claves de las filas que un DELETE por conjuntos esta a punto de borrar
+    if model not in TRACKED_MODELS:
+        return
+    columns = [model.id] + [getattr(model, key) for key in TRACKED_MODELS[model]]
+    query = select(*columns).where(criteria).execution_options(include_deleted=True)
+    rows = [row._asdict() for row in session.execute(query)]
+    record_changes(session, model, rows, 'delete')
+
+
+def _open_gaps(checkpoint, now):
+    # {id: primera vez visto} sin los huecos vencidos
+    cutoff = now - GAP_TIMEOUT
+    gaps = {}
+    for event_id, seen_at in ((checkpoint.gaps or {}) if checkpoint else {}).items():
+        seen_at = datetime.fromisoformat(seen_at)
+        if seen_at > cutoff:
+            gaps[int(event_id)] = seen_at
+    return gaps
+
+
+def read_batch(consumer, limit=500):
+    """
+    Returns the next events (serialized dicts, id order) for the consumer: events that
+    fill one of its open gaps, then the events after its checkpoint.
+    """
+    checkpoint = db.session.get(CdcCheckpoint, consumer)
+    last_id = checkpoint.last_event_id if checkpoint else 0
+    criteria = ChangeEvent.id > last_id
+    gaps = _open_gaps(checkpoint, datetime.utcnow())
+    if gaps:
+        criteria = or_(ChangeEvent.id.in_(list(gaps)), criteria)
+    events = db.session.scalars(select(ChangeEvent).where(criteria).order_by(ChangeEvent.id).limit(limit)).all()
+    return [change.serialize() for change in events]
+
+
+def ack(consumer, last_event_id, delivered=None):
+    """
+    Moves the checkpoint up to `last_event_id`. `delivered` holds the ids of the batch
+    the consumer handled: ids up to last_event_id it did not get are kept as gaps, and
+    delivered gaps are closed. Without it (a rebuild that read the tables themselves)
+    every event up to last_event_id counts as handled.
+    """
+    now = datetime.utcnow()
+    checkpoint = db.session.get(CdcCheckpoint, consumer)
+    if checkpoint is None:
+        checkpoint = CdcCheckpoint(consumer=consumer, last_event_id=0)
+        db.session.add(checkpoint)
+        # Un consumidor nuevo no busca los ids bajo su primer evento: cdc-prune pudo borrarlos
+        first_id = min(delivered) - 1 if delivered else last_event_id
+    else:
+        first_id = checkpoint.last_event_id
+    gaps = _open_gaps(checkpoint, now)
+    if delivered is not None:
+        delivered = set(delivered)
+        for event_id in range(first_id + 1, last_event_id + 1):
+            if event_id not in delivered:
+                gaps[event_id] = now
+        gaps = {event_id: seen_at for event_id, seen_at in gaps.items() if event_id not in delivered}
+    # El checkpoint solo avanza: reconocer un lote viejo no re-entrega los siguientes
+    checkpoint.last_event_id = max(checkpoint.last_event_id, last_event_id)
+    checkpoint.gaps = {str(event_id): seen_at.isoformat() for event_id, seen_at in sorted(gaps.items())}
+    checkpoint.updated_at = now
+    db.session.commit()
+
+
+def consume(consumer, handler, batch_size=500, max_batches=None):
+    """
+    Feeds batches of events to `handler(events)` and acknowledges each batch after the
+    handler returns. Stops when caught up (or after max_batches). Returns events handled.
+    """
+    handled = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        events = read_batch(consumer, batch_size)
+        if not events:
+            break
+        handler(events)
+        ack(consumer, events[-1]['id'], delivered=[change['id'] for change in events])
+        handled += len(events)
+        batches += 1
+    return handled
+
+
+def wait_for_events(timeout):
+    # Bloquea hasta que este proceso confirme nuevos eventos o pase el timeout
+    with _new_events:
+        return _new_events.wait(timeout)
+
+
+def prune_events(batch_size=5000):
+    """
+    Deletes events every registered consumer has acknowledged, in bounded batches.
+    Returns the number of events removed.
+    """
+    # Los huecos abiertos aun pueden llegar: se conserva todo desde el menor
+    checkpoints = db.session.scalars(select(CdcCheckpoint)).all()
+    if not checkpoints:
+        return 0
+    now = datetime.utcnow()
+    low_water = min(min(_open_gaps(checkpoint, now), default=checkpoint.last_event_id + 1) - 1
+                    for checkpoint in checkpoints)
+    removed = 0
+    while True:
+        ids = select(ChangeEvent.id).where(ChangeEvent.id <= low_water).order_by(ChangeEvent.id).limit(batch_size)
+        count = db.session.execute(delete(ChangeEvent).where(ChangeEvent.id.in_(ids))).rowcount
+        db.session.commit()
+        removed += count
+        if count < batch_size:
+            return removed
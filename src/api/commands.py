@@ -1,6 +1,17 @@
 
+import json
 import click
-from api.models import db, User
+from api.models import db, User, IdempotencyKey
+from api.dataset import export_dataset, import_dataset
+from api.rollups import refresh_rollups, reset_rollups
+from api.ratings import rebuild_rating_summaries
+from api.cdc import prune_events
+from api.utils import prune_idempotent_responses, IDEMPOTENCY_KEY_TTL_HOURS
+from api.purge import purge_deleted
+from api.static_assets import AssetManifest, precompress
+from api.jobs import enqueue, run_worker, queue_stats
+from api.recommendations import rebuild_recommendations, refresh_recommendations
+from api.archive import archive_notifications, ARCHIVE_AFTER_DAYS
 
 """
 In this file, you can add as many commands as you want using the @app.cli.command decorator
@@ -31,4 +42,143 @@ def setup_commands(app):
 
     @app.cli.command("insert-test-data")
     def insert_test_data():
-        pass
\ No newline at end of file
+        pass
+
+    """
+    Dataset dump / restore as gzip compressed NDJSON, one file per table:
+    $ flask export ./backup
+    $ flask import ./backup --resume
+    """
+    @app.cli.command("export")
+    @click.argument("directory")
+    @click.option("--chunk-size", default=1000, help="Rows fetched per server-side cursor batch")
+    def export_data(directory, chunk_size):
+        counts = export_dataset(directory, chunk_size=chunk_size)
+        print("Exported", sum(counts.values()), "rows to", directory)
+
+    @app.cli.command("import")
+    @click.argument("directory")
+    @click.option("--chunk-size", default=1000, help="Rows inserted per transaction")
+    @click.option("--resume", is_flag=True, help="Continue a partial import")
+    def import_data(directory, chunk_size, resume):
+        import_dataset(directory, chunk_size=chunk_size, resume=resume)
+        print("Import finished")
+
+    """
+    Folds new likes, posts and reviews into the hourly/daily rollups used by /api/stats.
+    Run it periodically (cron): $ flask refresh-rollups
+    A full backfill: $ flask refresh-rollups --rebuild
+    """
+    @app.cli.command("refresh-rollups")
+    @click.option("--batch-size", default=5000, help="Source rows aggregated per transaction")
+    @click.option("--rebuild", is_flag=True, help="Drop the rollups and recompute them from scratch")
+    def refresh_rollups_command(batch_size, rebuild):
+        if rebuild:
+            reset_rollups()
+        refresh_rollups(batch_size=batch_size)
+
+    """
+    Recomputes every tattooer rating histogram from the review table (after a restore
+    or a manual data fix): $ flask rebuild-rating-summaries
+    """
+    @app.cli.command("rebuild-rating-summaries")
+    def rebuild_rating_summaries_command():
+        rebuild_rating_summaries()
+        print("Rating summaries rebuilt")
+
+    """
+    Deletes change events already acknowledged by every CDC consumer:
+    $ flask cdc-prune
+    """
+    @app.cli.command("cdc-prune")
+    @click.option("--batch-size", default=5000, help="Events deleted per transaction")
+    def cdc_prune(batch_size):
+        removed = prune_events(batch_size=batch_size)
+        print("Removed", removed, "change events")
+
+    """
+    Deletes stored bulk-write responses older than --hours (Idempotency-Key replays).
+    Run it daily (cron): $ flask idempotency-prune     or     $ flask enqueue idempotency-prune
+    """
+    @app.cli.command("idempotency-prune")
+    @click.option("--hours", default=IDEMPOTENCY_KEY_TTL_HOURS, help="Keep keys newer than this")
+    @click.option("--batch-size", default=5000, help="Keys deleted per transaction")
+    def idempotency_prune(hours, batch_size):
+        removed = prune_idempotent_responses(db.session, IdempotencyKey, hours=hours, batch_size=batch_size)
+        print("Removed", removed, "idempotency keys")
+
+    """
+    Removes soft-deleted users and posts with their likes, reviews and notifications,
+    in bounded batches. Run it periodically: $ flask purge-deleted
+    """
+    @app.cli.command("purge-deleted")
+    @click.option("--batch-size", default=500, help="Rows deleted per transaction")
+    def purge_deleted_command(batch_size):
+        purge_deleted(batch_size=batch_size)
+
+    """
+    Writes .gz/.br variants of the built front end next to each file (run after
+    `npm run build`): $ flask compress-assets
+    """
+    @app.cli.command("compress-assets")
+    def compress_assets():
+        written = precompress(app.config['STATIC_ROOT'])
+        app.extensions['static_assets'] = AssetManifest(app.config['STATIC_ROOT'], reload=app.config['STATIC_RELOAD'])
+        print(written, "compressed variants written")
+
+    """
+    Similar posts / similar tattooers neighbour lists served by /api/recommendations.
+    Full recompute: $ flask rebuild-recommendations
+    Apply the likes and reviews since the last run (cron or the worker):
+    $ flask refresh-recommendations
+    """
+    @app.cli.command("rebuild-recommendations")
+    def rebuild_recommendations_command():
+        rebuild_recommendations()
+
+    @app.cli.command("refresh-recommendations")
+    @click.option("--batch-size", default=500, help="Change events handled per batch")
+    def refresh_recommendations_command(batch_size):
+        handled = refresh_recommendations(batch_size=batch_size)
+        print("Applied", handled, "change events")
+
+    """
+    Moves read notifications older than --days into the compressed monthly archive
+    (notification_archive), keeping the notification table small. Run it daily (cron):
+    $ flask archive-notifications --days 90     or     $ flask enqueue archive-notifications
+    """
+    @app.cli.command("archive-notifications")
+    @click.option("--days", default=ARCHIVE_AFTER_DAYS, help="Archive read notifications older than this")
+    @click.option("--batch-size", default=1000, help="Notifications moved per transaction")
+    def archive_notifications_command(days, batch_size):
+        archive_notifications(days=days, batch_size=batch_size)
+
+    """
+    Background job worker on the local SQLite queue (see api/jobs.py):
+    $ flask worker --processes 4
+    $ flask worker --types purge-deleted,refresh-rollups --burst
+    Jobs can also be queued from cron: $ flask enqueue refresh-rollups
+    """
+    @app.cli.command("worker")
+    @click.option("--processes", default=2, help="Worker processes")
+    @click.option("--types", default=None, help="Comma separated job types to run (default: all)")
+    @click.option("--poll-interval", default=1.0, help="Seconds to wait when the queue is empty")
+    @click.option("--burst", is_flag=True, help="Exit once the queue is empty")
+    def worker(processes, types, poll_interval, burst):
+        import api.tasks  # registers the job handlers
+        run_worker(app, processes=processes, types=types.split(',') if types else None,
+                   poll_interval=poll_interval, burst=burst)
+
+    @app.cli.command("enqueue")
+    @click.argument("job_type")
+    @click.option("--payload", default="{}", help="JSON object passed to the handler as keyword arguments")
+    @click.option("--priority", default=0, help="Higher runs first")
+    @click.option("--delay", default=0.0, help="Seconds before the job can run")
+    def enqueue_command(job_type, payload, priority, delay):
+        job_id = enqueue(job_type, json.loads(payload), priority=priority, delay=delay)
+        print("Job", job_id, "queued")
+
+    @app.cli.command("jobs")
+    def jobs_status():
+        for (status, job_type), count in sorted(queue_stats().items()):
+            print(f"{job_type:30} {status:8} {count}")
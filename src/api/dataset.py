@@ -0,0 +1,150 @@
+"""
+Streaming export / import of the whole dataset as gzip compressed NDJSON files,
+one file per table. Used by the `flask export` and `flask import` commands.
+
+Only the source tables travel. The derived ones (rating summaries, stat rollups,
+recommendations) are rebuilt from them once an import finishes, since the bulk
+inserts skip the ORM hooks that keep them up to date.
+"""
+import base64
+import gzip
+import json
+import os
+from datetime import datetime
+from sqlalchemy import select, func, text, DateTime, LargeBinary
+from api.models import db, UserType, Category, User, Profile, Post, Likes, Review, Notification, NotificationArchive
+from api.ratings import rebuild_rating_summaries
+from api.rollups import refresh_rollups, reset_rollups
+from api.recommendations import rebuild_recommendations
+
+# Orden de dependencias (claves foraneas): las tablas padre primero
+DATASET_MODELS = [UserType, Category, User, Profile, Post, Likes, Review, Notification, NotificationArchive]
+
+STATE_FILE = '.import-state.json'
+
+
+def _table_path(directory, table):
+    return os.path.join(directory, f'{table.name}.ndjson.gz')
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    return value
+
+
+def _decoders(table):
+    # Solo las fechas y los binarios (base64) necesitan conversion; el resto sale de json tal cual
+    decoders = {column.name: datetime.fromisoformat for column in table.columns if isinstance(column.type, DateTime)}
+    decoders.update((column.name, base64.b64decode) for column in table.columns if isinstance(column.type, LargeBinary))
+    return decoders
+
+
+def _read_state(directory):
+    path = os.path.join(directory, STATE_FILE)
+    if not os.path.isfile(path):
+        return {}
+    with open(path) as state_file:
+        return json.load(state_file)
+
+
+def _write_state(directory, state):
+    # Escritura atomica para que un corte a mitad no deje el checkpoint corrupto
+    path = os.path.join(directory, STATE_FILE)
+    with open(path + '.tmp', 'w') as state_file:
+        json.dump(state, state_file)
+    os.replace(path + '.tmp', path)
+
+
+def export_dataset(directory, chunk_size=1000, log=print):
+    """
+    Writes every table to <directory>/<table>.ndjson.gz using a server-side cursor,
+    so memory stays constant whatever the table size. Returns {table: rows}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for model in DATASET_MODELS:
+        table = model.__table__
+        query = select(table).order_by(*table.primary_key.columns)
+        result = db.session.execute(query.execution_options(stream_results=True, yield_per=chunk_size))
+        count = 0
+        with gzip.open(_table_path(directory, table), 'wt', encoding='utf-8') as out:
+            for partition in result.partitions(chunk_size):
+                for row in partition:
+                    out.write(json.dumps({key: _encode(value) for key, value in row._mapping.items()}))
+                    out.write('\n')
+                count += len(partition)
+        counts[table.name] = count
+        log(f'{table.name}: {count} rows exported')
+    db.session.rollback()
+    with open(os.path.join(directory, 'manifest.json'), 'w') as manifest:
+        json.dump({'exported_at': datetime.utcnow().isoformat(), 'tables': counts}, manifest, indent=2)
+    return counts
+
+
+def _reset_sequence(table):
+    # En Postgres los ids insertados a mano no avanzan la secuencia del serial
+    if db.engine.dialect.name != 'postgresql':
+        return
+    db.session.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), "
+        f"COALESCE((SELECT MAX(id) FROM \"{table.name}\"), 1))"
+    ))
+
+
+def import_dataset(directory, chunk_size=1000, resume=False, log=print):
+    """
+    Loads the files written by export_dataset with batched executemany inserts, one
+    transaction per batch. Finished tables are checkpointed in <directory>/.import-state.json;
+    with `resume=True` those are skipped and a partially loaded table continues after the
+    highest id already committed (exports are written in primary key order). When every
+    table is loaded the derived tables are rebuilt.
+    """
+    state = _read_state(directory) if resume else {}
+    for model in DATASET_MODELS:
+        table = model.__table__
+        path = _table_path(directory, table)
+        if not os.path.isfile(path):
+            log(f'{table.name}: no export file, skipped')
+            continue
+        if state.get(table.name) == 'complete':
+            log(f'{table.name}: already imported, skipped')
+            continue
+        last_id = None
+        if resume:
+            last_id = db.session.scalar(select(func.max(table.c.id)))
+        decoders = _decoders(table)
+        statement = table.insert()
+        batch = []
+        count = 0
+        with gzip.open(path, 'rt', encoding='utf-8') as source:
+            for line in source:
+                row = json.loads(line)
+                if last_id is not None and row['id'] <= last_id:
+                    continue
+                for key, decode in decoders.items():
+                    if row.get(key) is not None:
+                        row[key] = decode(row[key])
+                batch.append(row)
+                if len(batch) >= chunk_size:
+                    db.session.execute(statement, batch)
+                    db.session.commit()
+                    count += len(batch)
+                    batch = []
+        if batch:
+            db.session.execute(statement, batch)
+            count += len(batch)
+        _reset_sequence(table)
+        db.session.commit()
+        state[table.name] = 'complete'
+        _write_state(directory, state)
+        log(f'{table.name}: {count} rows imported')
+
+    # Tablas derivadas: los INSERT por lotes no pasan por los hooks del ORM
+    rebuild_rating_summaries()
+    log('rating_summary: rebuilt')
+    reset_rollups()
+    refresh_rollups(log=log)
+    rebuild_recommendations(log=log)
@@ -0,0 +1,130 @@
+"""
+Geohash index for "tattooers near me".
+
+Every located profile stores the geohash of its position (Profile.geohash, indexed).
+A search covers the circle with a handful of geohash cells, reads the candidates of
+each cell as an index range scan (`geohash >= cell AND geohash < cell + '{'`, which
+works on every backend, unlike LIKE; with a category filter the (category_id, geohash)
+index is used instead). The circle's bounding box is checked in SQL too, so only rows
+near the circle come back even when the cells are much larger than it, and the exact
+great-circle distance check is done in Python. k-nearest searches start with a small radius and widen it until k
+results fall inside the searched circle, so dense cities only read nearby rows.
+"""
+import math
+from sqlalchemy import select, or_, and_
+from api.models import db, Profile
+from api.geohash import BASE32, encode, cell_size
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Celdas por busqueda: pocas consultas de rango y pocos candidatos fuera del circulo
+MAX_CELLS = 16
+START_RADIUS_KM = 2.0
+MAX_RADIUS_KM = 500.0
+
+# '{' va justo despues de 'z' (ultimo caracter base32): [celda, celda + '{') es el prefijo
+_PREFIX_END = chr(ord(BASE32[-1]) + 1)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _bounding_box(latitude, longitude, radius_km):
+    dlat = radius_km / KM_PER_DEGREE
+    south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    # Cerca de los polos el circulo cubre todas las longitudes
+    cos_lat = math.cos(math.radians(max(abs(south), abs(north))))
+    if cos_lat < 1e-6 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180:
+        return south, north, -180.0, 180.0
+    dlng = radius_km / (KM_PER_DEGREE * cos_lat)
+    return south, north, longitude - dlng, longitude + dlng
+
+
+def _cells_at(precision, south, north, west, east):
+    lat_step, lng_step = cell_size(precision)
+    rows = math.floor((north + 90) / lat_step) - math.floor((south + 90) / lat_step) + 1
+    columns = math.floor((east + 180) / lng_step) - math.floor((west + 180) / lng_step) + 1
+    columns = min(columns, round(360 / lng_step))
+    if rows * columns > MAX_CELLS:
+        return None
+    cells = set()
+    first_row = math.floor((south + 90) / lat_step)
+    first_column = math.floor((west + 180) / lng_step)
+    for row in range(rows):
+        lat = min(-90 + (first_row + row + 0.5) * lat_step, 90.0)
+        for column in range(columns):
+            # Las longitudes fuera de [-180, 180) dan la vuelta (antimeridiano)
+            lng = (-180 + (first_column + column + 0.5) * lng_step + 180) % 360 - 180
+            cells.add(encode(lat, lng, precision))
+    return cells
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    The finest set of at most MAX_CELLS geohash prefixes that covers the circle.
+    """
+    return _covering_box(_bounding_box(latitude, longitude, radius_km))
+
+
+def _covering_box(box):
+    best = {''}
+    for precision in range(1, 13):
+        cells = _cells_at(precision, *box)
+        if cells is None:
+            break
+        best = cells
+    return sorted(best)
+
+
+def _cell_filter(cells, criteria=()):
+    if cells == ['']:
+        return and_(Profile.geohash.isnot(None), *criteria)
+    # Los filtros se repiten dentro de cada rango: asi cada rama del OR usa el indice
+    # compuesto (category_id, geohash) en vez de que el motor elija solo uno de los dos
+    return or_(*[
+        and_(*criteria, Profile.geohash >= cell, Profile.geohash < cell + _PREFIX_END) for cell in cells
+    ])
+
+
+def _box_filter(south, north, west, east):
+    # Las celdas pueden ser mucho mas grandes que el circulo: el recuadro descarta en la
+    # bd las filas lejanas en vez de traerlas para calcular su distancia
+    latitude = Profile.latitude.between(south, north)
+    if west <= -180 and east >= 180:
+        return latitude
+    if west < -180:
+        longitude = or_(Profile.longitude >= west + 360, Profile.longitude <= east)
+    elif east > 180:
+        longitude = or_(Profile.longitude >= west, Profile.longitude <= east - 360)
+    else:
+        longitude = Profile.longitude.between(west, east)
+    return and_(latitude, longitude)
+
+
+def nearest(latitude, longitude, k, max_radius_km=MAX_RADIUS_KM, criteria=()):
+    """
+    Up to `k` located profiles within `max_radius_km`, closest first, matching the extra
+    SQL `criteria`. Returns [(profile_id, distance_km)].
+    """
+    radius = min(START_RADIUS_KM, max_radius_km)
+    while True:
+        box = _bounding_box(latitude, longitude, radius)
+        rows = db.session.execute(
+            select(Profile.id, Profile.latitude, Profile.longitude)
+            .where(_cell_filter(_covering_box(box), criteria), _box_filter(*box))
+        ).all()
+        hits = []
+        for profile_id, lat, lng in rows:
+            distance = haversine_km(latitude, longitude, lat, lng)
+            if distance <= radius:
+                hits.append((distance, profile_id))
+        if len(hits) >= k or radius >= max_radius_km:
+            hits.sort()
+            return [(profile_id, distance) for distance, profile_id in hits[:k]]
+        # Con la densidad observada se estima el radio que alcanza k resultados
+        growth = math.sqrt(k / len(hits)) * 1.2 if hits else 8
+        radius = min(radius * min(max(growth, 2), 8), max_radius_km)
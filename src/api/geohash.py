@@ -0,0 +1,40 @@
+"""
+Geohash encoding (base32, interleaved longitude/latitude bits), pure Python.
+"""
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Precision guardada en Profile.geohash: celdas de ~5 m
+PRECISION = 9
+
+
+def encode(latitude, longitude, precision=PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        # Los bits pares parten la longitud, los impares la latitud
+        target, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (target[0] + target[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            target[0] = middle
+        else:
+            target[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    # (alto, ancho) en grados de una celda: la longitud recibe el bit extra cuando es impar
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
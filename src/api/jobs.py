@@ -0,0 +1,329 @@
+"""
+Background jobs on a local SQLite queue (JOBS_DATABASE, instance/jobs.db by default).
+
+The queue lives in its own SQLite file in WAL mode, apart from the main database, so
+`enqueue` is one autocommitted INSERT that never waits on the request transaction.
+`flask worker --processes N` forks N processes that claim jobs inside BEGIN IMMEDIATE
+(one writer at a time, so two processes never claim the same row), run the registered
+handler and record the result.
+
+- priority: higher runs first; equal priorities run in run_at order.
+- retries: a failed job goes back to the queue after an exponential backoff until the
+  handler's max_attempts is reached, then stays as `failed` for inspection.
+- visibility timeout: a claimed job is locked for the handler's `timeout` seconds and
+  the lock is renewed while the handler runs, so a long job is never claimed twice; if
+  the process dies the renewals stop, the lock expires and another process picks the
+  job up again.
+- concurrency: `concurrency=N` caps how many jobs of a type run at once across all
+  processes.
+
+Delivery is at-least-once: handlers must be idempotent.
+"""
+import json
+import os
+import random
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import multiprocessing
+from flask import current_app
+
+# Reintentos: 2, 4, 8... segundos, con tope, mas un poco de azar para no sincronizar procesos
+BACKOFF_BASE = 2
+BACKOFF_MAX = 3600
+
+# El lock de un job en curso se renueva cada timeout / HEARTBEAT_FRACTION segundos
+HEARTBEAT_FRACTION = 3
+
+# Jobs terminados que se conservan antes de borrarlos
+KEEP_DONE_SECONDS = 7 * 24 * 3600
+PRUNE_EVERY_SECONDS = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    run_at REAL NOT NULL,
+    locked_until REAL,
+    worker TEXT,
+    dedupe_key TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_job_ready ON job (status, priority DESC, run_at, id);
+CREATE INDEX IF NOT EXISTS ix_job_running ON job (status, type, locked_until);
+CREATE UNIQUE INDEX IF NOT EXISTS ix_job_dedupe ON job (dedupe_key) WHERE status = 'queued';
+"""
+
+
+class JobType:
+    __slots__ = ('name', 'func', 'concurrency', 'timeout', 'max_attempts')
+
+    def __init__(self, name, func, concurrency, timeout, max_attempts):
+        self.name = name
+        self.func = func
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+
+
+# Tipos de job que este proceso sabe ejecutar (ver api/tasks.py)
+HANDLERS = {}
+
+
+def job(name, concurrency=None, timeout=300, max_attempts=5):
+    """
+    Registers `func(**payload)` as the handler of job type `name`. Only the worker
+    needs the registry; enqueueing works with any type name.
+    """
+    def decorator(func):
+        HANDLERS[name] = JobType(name, func, concurrency, timeout, max_attempts)
+        return func
+    return decorator
+
+
+_local = threading.local()
+
+
+def _connection():
+    # Una conexion por hilo y por proceso: una conexion heredada por fork no se reutiliza
+    path = current_app.config['JOBS_DATABASE']
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid() or _local.path != path:
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        _local.conn, _local.pid, _local.path = conn, os.getpid(), path
+    return conn
+
+
+def enqueue(type, payload=None, priority=0, delay=0, dedupe_key=None):
+    """
+    Adds a job with a single INSERT. With `dedupe_key`, nothing is added while a job
+    with the same key is still waiting in the queue. Returns the job id (None if deduplicated).
+    """
+    now = time.time()
+    cursor = _connection().execute(
+        'INSERT OR IGNORE INTO job (type, payload, priority, run_at, dedupe_key, created_at) '
+        'VALUES (?, ?, ?, ?, ?, ?)',
+        (type, json.dumps(payload or {}), priority, now + delay, dedupe_key, now)
+    )
+    return cursor.lastrowid if cursor.rowcount else None
+
+
+def _backoff(attempts):
+    delay = min(BACKOFF_BASE ** attempts, BACKOFF_MAX)
+    return delay + random.uniform(0, delay / 4)
+
+
+def claim(worker_name, types=None):
+    """
+    Takes the next runnable job among `types` (default: every registered type) and
+    locks it for its visibility timeout. Returns (id, type, payload, attempts) or None.
+    """
+    types = [name for name in (types or HANDLERS) if name in HANDLERS]
+    if not types:
+        return None
+    conn = _connection()
+    now = time.time()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        # Jobs cuyo proceso murio: el lock vencio y vuelven a la cola (o fallan si se agotaron)
+        expired = conn.execute(
+            "SELECT id, type, attempts FROM job WHERE status = 'running' AND locked_until <= ?", (now,)
+        ).fetchall()
+        for job_id, job_type, attempts in expired:
+            handler = HANDLERS.get(job_type)
+            if handler is not None and attempts >= handler.max_attempts:
+                conn.execute("UPDATE job SET status = 'failed', last_error = ?, finished_at = ? WHERE id = ?",
+                             ('visibility timeout expired', now, job_id))
+            else:
+                conn.execute("UPDATE job SET status = 'queued', run_at = ? WHERE id = ?", (now, job_id))
+
+        running = dict(conn.execute(
+            "SELECT type, count(*) FROM job WHERE status = 'running' GROUP BY type"
+        ).fetchall())
+        allowed = [name for name in types
+                   if HANDLERS[name].concurrency is None or running.get(name, 0) < HANDLERS[name].concurrency]
+        row = None
+        if allowed:
+            placeholders = ','.join('?' * len(allowed))
+            row = conn.execute(
+                f"SELECT id, type, payload, attempts FROM job WHERE status = 'queued' AND run_at <= ? "
+                f"AND type IN ({placeholders}) ORDER BY priority DESC, run_at, id LIMIT 1",
+                (now, *allowed)
+            ).fetchone()
+        if row is not None:
+            # dedupe_key solo importa mientras el job espera: se libera para la siguiente peticion
+            conn.execute(
+                "UPDATE job SET status = 'running', attempts = attempts + 1, locked_until = ?, worker = ?, "
+                "dedupe_key = NULL WHERE id = ?",
+                (now + HANDLERS[row[1]].timeout, worker_name, row[0])
+            )
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    if row is None:
+        return None
+    return row[0], row[1], json.loads(row[2]), row[3] + 1
+
+
+def complete(job_id):
+    _connection().execute(
+        "UPDATE job SET status = 'done', locked_until = NULL, finished_at = ? WHERE id = ?",
+        (time.time(), job_id)
+    )
+
+
+def fail(job_id, job_type, attempts, error):
+    handler = HANDLERS.get(job_type)
+    now = time.time()
+    if handler is None or attempts >= handler.max_attempts:
+        _connection().execute(
+            "UPDATE job SET status = 'failed', locked_until = NULL, last_error = ?, finished_at = ? WHERE id = ?",
+            (error, now, job_id)
+        )
+    else:
+        _connection().execute(
+            "UPDATE job SET status = 'queued', locked_until = NULL, last_error = ?, run_at = ? WHERE id = ?",
+            (error, now + _backoff(attempts), job_id)
+        )
+
+
+def prune_jobs(keep_seconds=KEEP_DONE_SECONDS):
+    # Los fallidos se quedan para revisarlos; solo se borran los terminados
+    return _connection().execute(
+        "DELETE FROM job WHERE status = 'done' AND finished_at < ?", (time.time() - keep_seconds,)
+    ).rowcount
+
+
+def queue_stats():
+    return {
+        (status, job_type): count for status, job_type, count in _connection().execute(
+            'SELECT status, type, count(*) FROM job GROUP BY status, type'
+        )
+    }
+
+
+class Heartbeat:
+    """
+    Context manager that keeps renewing the lock of a running job from a background
+    thread (with its own connection) until the handler returns.
+    """
+
+    def __init__(self, path, job_id, worker_name, timeout):
+        self.path = path
+        self.job_id = job_id
+        self.worker_name = worker_name
+        self.timeout = timeout
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f'job-heartbeat-{job_id}', daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def renew(self, conn):
+        # Solo mientras el job siga siendo de este proceso
+        return conn.execute(
+            "UPDATE job SET locked_until = ? WHERE id = ? AND status = 'running' AND worker = ?",
+            (time.time() + self.timeout, self.job_id, self.worker_name)
+        ).rowcount
+
+    def _run(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            while not self._stop.wait(self.timeout / HEARTBEAT_FRACTION):
+                self.renew(conn)
+        finally:
+            conn.close()
+
+
+def run_job(worker_name, types=None, log=print):
+    """
+    Claims and runs one job. Returns False when there was nothing to run.
+    """
+    from api.models import db
+    claimed = claim(worker_name, types)
+    if claimed is None:
+        return False
+    job_id, job_type, payload, attempts = claimed
+    handler = HANDLERS[job_type]
+    try:
+        with Heartbeat(current_app.config['JOBS_DATABASE'], job_id, worker_name, handler.timeout):
+            handler.func(**payload)
+    except Exception as ex:
+        db.session.rollback()
+        fail(job_id, job_type, attempts, ''.join(traceback.format_exception_only(type(ex), ex)).strip())
+        log(f'job {job_id} ({job_type}) failed, attempt {attempts}: {ex!r}')
+    else:
+        complete(job_id)
+        log(f'job {job_id} ({job_type}) done')
+    finally:
+        db.session.remove()
+    return True
+
+
+def _work_loop(app, stop, types, poll_interval, burst, log):
+    from api.models import db
+    worker_name = f'{socket.gethostname()}:{os.getpid()}'
+    # Al terminar el supervisor avisa con `stop`; el job en curso se deja terminar
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    with app.app_context():
+        # Las conexiones heredadas del proceso padre no se comparten (ver gunicorn.conf.py)
+        db.engine.dispose(close=False)
+        while not stop.is_set():
+            if not run_job(worker_name, types, log):
+                if burst:
+                    return
+                stop.wait(poll_interval)
+
+
+def run_worker(app, processes=2, types=None, poll_interval=1.0, burst=False, log=print):
+    """
+    Runs `processes` worker processes until SIGINT/SIGTERM (or, with `burst`, until the
+    queue is empty). Crashed processes are replaced. Needs fork (Linux/macOS).
+    """
+    context = multiprocessing.get_context('fork')
+    stop = context.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+
+    def start():
+        process = context.Process(target=_work_loop, args=(app, stop, types, poll_interval, burst, log), daemon=True)
+        process.start()
+        return process
+
+    with app.app_context():
+        _connection()  # crea el archivo y el esquema antes de que los procesos compitan por hacerlo
+        prune_jobs()
+    pool = [start() for _ in range(processes)]
+    last_prune = time.monotonic()
+    while pool:
+        for process in list(pool):
+            process.join(timeout=poll_interval / len(pool))
+            if process.is_alive():
+                continue
+            pool.remove(process)
+            if process.exitcode != 0 and not stop.is_set():
+                log(f'worker {process.pid} exited with {process.exitcode}, restarting')
+                pool.append(start())
+        if time.monotonic() - last_prune > PRUNE_EVERY_SECONDS:
+            with app.app_context():
+                prune_jobs()
+            last_prune = time.monotonic()
@@ -1,9 +1,44 @@
+import hmac
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy.orm import Mapped, mapped_column, relationship, Session, with_loader_criteria, validates
+from sqlalchemy import Integer, String, Boolean, DateTime, Float, ForeignKey, Text, JSON, LargeBinary, UniqueConstraint, Index, event, text
+from api.geohash import encode as encode_geohash
 
 db = SQLAlchemy()
 
+
+def serialize_columns(obj, columns, fields=None):
+    # Solo lee los atributos pedidos: con load_only las demas columnas ni se cargan
+    return {name: getattr(obj, name) for name in columns if fields is None or name in fields}
+
+
+class SoftDeleteMixin:
+    # Las filas marcadas con deleted_at quedan ocultas en todas las consultas del ORM
+    # hasta que `flask purge-deleted` las borra (junto con sus dependencias) por lotes.
+    # Para verlas: .execution_options(include_deleted=True)
+    deleted_at: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
+
+
+def soft_delete_index(table):
+    # Indice parcial: solo las filas marcadas (lo que recorre la purga). Con un indice
+    # completo SQLite lo elige para `deleted_at IS NULL` en lugar del indice util de la consulta
+    return Index(f'ix_{table}_deleted_at', 'deleted_at',
+                 postgresql_where=text('deleted_at IS NOT NULL'),
+                 sqlite_where=text('deleted_at IS NOT NULL'))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _hide_soft_deleted(execute_state):
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.execution_options.get('include_deleted', False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(SoftDeleteMixin, lambda cls: cls.deleted_at.is_(None), include_aliases=True)
+        )
+
 class UserType(db.Model):
     __tablename__ = 'user_type'
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
@@ -20,30 +55,34 @@ class UserType(db.Model):
 
 class Likes(db.Model):
     __tablename__ = 'likes'
+    # Un like por usuario y post; los likes de un post quedan contiguos en el indice.
+    # AUTOINCREMENT: un id reutilizado quedaria detras del watermark de los rollups
+    __table_args__ = (Index('ix_likes_post_user', 'post_id', 'user_id', unique=True), {'sqlite_autoincrement': True})
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'))
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'), index=True)
     post_id: Mapped[int] = mapped_column(Integer, ForeignKey('post.id'))
+    created_at: Mapped[DateTime] = mapped_column(DateTime, nullable=True, default=datetime.utcnow)
 
-    user: Mapped['User'] = relationship('User', backref='likes')
-    post: Mapped['Post'] = relationship('Post', backref='likes')
+    user: Mapped['User'] = relationship('User', back_populates='likes')
+    post: Mapped['Post'] = relationship('Post', back_populates='post_likes')
     
-    def serialize(self):
-        return {
-            "id": self.id,
-            "user_id": self.user_id,
-            "post_id": self.post_id
-        }
+    SERIALIZE_FIELDS = ("id", "user_id", "post_id")
+
+    def serialize(self, fields=None):
+        return serialize_columns(self, self.SERIALIZE_FIELDS, fields)
 
 
-class User(db.Model):
+class User(SoftDeleteMixin, db.Model):
     __tablename__ = 'user'
+    __table_args__ = (soft_delete_index('user'),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String)
     username: Mapped[str] = mapped_column(String, nullable=False, unique=True)
     password: Mapped[str] = mapped_column(String, nullable=False)
     email: Mapped[str] = mapped_column(String, nullable=False, unique=True)
     notification_enabled: Mapped[bool] = mapped_column(Boolean, default=True)
-    user_type_id: Mapped[int] = mapped_column(Integer, ForeignKey('user_type.id'))
+    # Nullable como en la migracion que agrego la columna (b4e8d2f61c37)
+    user_type_id: Mapped[int] = mapped_column(Integer, ForeignKey('user_type.id'), nullable=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime)
 
     user_type: Mapped['UserType'] = relationship('UserType', back_populates='users')
@@ -51,97 +90,118 @@ class User(db.Model):
     reviews: Mapped[list['Review']] = relationship('Review', back_populates='user', foreign_keys='Review.user_id')
     posts: Mapped[list['Post']] = relationship('Post', back_populates='user')
     notifications: Mapped[list['Notification']] = relationship('Notification', back_populates='user', foreign_keys='Notification.user_id')
-    likes: Mapped[list['Likes']] = relationship('Likes', backref='user', cascade="all, delete-orphan")
+    likes: Mapped[list['Likes']] = relationship('Likes', back_populates='user', cascade="all, delete-orphan")
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "username": self.username,
-            "email": self.email,
-            "notification_enabled": self.notification_enabled,
-            "user_type": self.user_type.serialize() if self.user_type else None,
-            "created_at": self.created_at,
-            "profile": self.profile.serialize() if self.profile else None,
-            "reviews": [review.serialize() for review in self.reviews],
-            "posts": [post.serialize() for post in self.posts],
-            "notifications": [notification.serialize() for notification in self.notifications]
-        }
+    SERIALIZE_FIELDS = ("id", "name", "username", "email", "notification_enabled", "created_at")
+    SERIALIZE_RELATIONS = ("user_type", "profile", "reviews", "posts", "notifications")
+
+    def check_password(self, password):
+        # La contraseña todavia se guarda sin hashear; al menos la comparacion es de tiempo constante
+        return hmac.compare_digest(self.password.encode('utf-8'), str(password).encode('utf-8'))
+
+    def serialize(self, fields=None, include=None):
+        # Sin fields ni include se devuelve todo, con las relaciones anidadas
+        if fields is None and include is None:
+            include = self.SERIALIZE_RELATIONS
+        data = serialize_columns(self, self.SERIALIZE_FIELDS, fields)
+        include = include or ()
+        if "user_type" in include:
+            data["user_type"] = self.user_type.serialize() if self.user_type else None
+        if "profile" in include:
+            data["profile"] = self.profile.serialize() if self.profile else None
+        if "reviews" in include:
+            data["reviews"] = [review.serialize() for review in self.reviews]
+        if "posts" in include:
+            data["posts"] = [post.serialize() for post in self.posts]
+        if "notifications" in include:
+            data["notifications"] = [notification.serialize() for notification in self.notifications]
+        return data
 
 
-class Profile(db.Model):
+class Profile(SoftDeleteMixin, db.Model):
     __tablename__ = 'profile'
+    # Cercania filtrada por categoria (api/geo.py); tambien sirve para buscar solo por categoria
+    __table_args__ = (Index('ix_profile_category_geohash', 'category_id', 'geohash'), soft_delete_index('profile'))
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'), unique=True)
-    social_media: Mapped[str] = mapped_column(String)
+    # Links de redes sociales ({"instagram": "..."}), guardados como JSON nativo
+    social_media: Mapped[dict] = mapped_column(JSON)
     bio: Mapped[str] = mapped_column(String)
     profile_picture: Mapped[str] = mapped_column(String)
     ranking: Mapped[int] = mapped_column(Integer)
-    category_id: Mapped[int] = mapped_column(Integer, ForeignKey('category.id'))
+    category_id: Mapped[int] = mapped_column(Integer, ForeignKey('category.id'), nullable=True)
+    # Ubicacion del estudio; geohash se calcula solo y es el indice de las busquedas por cercania (api/geo.py)
+    latitude: Mapped[float] = mapped_column(Float, nullable=True)
+    longitude: Mapped[float] = mapped_column(Float, nullable=True)
+    geohash: Mapped[str] = mapped_column(String(12), nullable=True, index=True)
     user: Mapped['User'] = relationship('User', back_populates='profile')
     category: Mapped['Category'] = relationship('Category', back_populates="profile")
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "user_id": self.user_id,
-            "social_media": self.social_media,
-            "bio": self.bio,
-            "profile_picture": self.profile_picture,
-            "ranking": self.ranking
-        }
+    SERIALIZE_FIELDS = ("id", "user_id", "social_media", "bio", "profile_picture", "ranking", "latitude", "longitude")
+
+    @validates('latitude', 'longitude')
+    def _update_geohash(self, key, value):
+        latitude = value if key == 'latitude' else self.latitude
+        longitude = value if key == 'longitude' else self.longitude
+        located = latitude is not None and longitude is not None
+        self.geohash = encode_geohash(latitude, longitude) if located else None
+        return value
+
+    def serialize(self, fields=None):
+        return serialize_columns(self, self.SERIALIZE_FIELDS, fields)
 
 
 class Review(db.Model):
     __tablename__ = 'review'
+    # Listado de reviews de un tatuador ordenado por rating (paginacion keyset).
+    # AUTOINCREMENT: un id reutilizado quedaria detras del watermark de los rollups
+    __table_args__ = (Index('ix_review_tattooer_rating', 'tattooer_id', 'rating', 'id'), {'sqlite_autoincrement': True})
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     description: Mapped[str] = mapped_column(String)
-    rating: Mapped[int] = mapped_column(Integer)
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'))
-    tattooer_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'))
+    # active_history: el histograma de ratings necesita el valor anterior al editar
+    rating: Mapped[int] = mapped_column(Integer, active_history=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'), index=True, active_history=True)
+    tattooer_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'), index=True, active_history=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime)
 
     user: Mapped['User'] = relationship('User', back_populates='reviews', foreign_keys=[user_id])
     tattooer: Mapped['User'] = relationship('User', foreign_keys=[tattooer_id])
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "description": self.description,
-            "rating": self.rating,
-            "user_id": self.user_id,
-            "tattooer_id": self.tattooer_id,
-            "created_at": self.created_at
-        }
+    SERIALIZE_FIELDS = ("id", "description", "rating", "user_id", "tattooer_id", "created_at")
 
+    def serialize(self, fields=None):
+        return serialize_columns(self, self.SERIALIZE_FIELDS, fields)
 
-class Post(db.Model):
+
+class Post(SoftDeleteMixin, db.Model):
     __tablename__ = 'post'
+    # Posts de un usuario del mas nuevo al mas viejo (pagina de perfil).
+    # AUTOINCREMENT: un id reutilizado quedaria detras del watermark de los rollups
+    __table_args__ = (Index('ix_post_user_created', 'user_id', 'created_at', 'id'), soft_delete_index('post'),
+                      {'sqlite_autoincrement': True})
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     image: Mapped[str] = mapped_column(String)
     description: Mapped[str] = mapped_column(String)
     likes: Mapped[int] = mapped_column(Integer, default=0)
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'))
-    created_at: Mapped[DateTime] = mapped_column(DateTime)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'), index=True)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, index=True)
 
     user: Mapped['User'] = relationship('User', back_populates='posts')
-    likes: Mapped[list['Likes']] = relationship('Likes', backref='post', cascade="all, delete-orphan")
+    # `likes` es el contador; la relacion con las filas de Likes se llama post_likes
+    post_likes: Mapped[list['Likes']] = relationship('Likes', back_populates='post', cascade="all, delete-orphan")
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "image": self.image,
-            "description": self.description,
-            "likes": self.likes,
-            "user_id": self.user_id,
-            "created_at": self.created_at
-        }
+    SERIALIZE_FIELDS = ("id", "image", "description", "likes", "user_id", "created_at")
+
+    def serialize(self, fields=None):
+        return serialize_columns(self, self.SERIALIZE_FIELDS, fields)
 
 
 class Notification(db.Model):
+    # Tabla caliente: las leidas y viejas pasan a NotificationArchive (api/archive.py)
     __tablename__ = 'notification'
+    __table_args__ = (Index('ix_notification_read_created', 'is_read', 'created_at'),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'))
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'), index=True)
     sender_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'))
     date: Mapped[DateTime] = mapped_column(DateTime)
     is_read: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -152,23 +212,37 @@ class Notification(db.Model):
     user: Mapped['User'] = relationship('User', back_populates='notifications', foreign_keys=[user_id])
     sender: Mapped['User'] = relationship('User', foreign_keys=[sender_id])
 
-    def serialize(self):
-        return {
-            "id": self.id,
-            "user_id": self.user_id,
-            "sender_id": self.sender_id,
-            "date": self.date,
-            "is_read": self.is_read,
-            "message": self.message,
-            "type": self.type,
-            "created_at": self.created_at
-        }
+    SERIALIZE_FIELDS = ("id", "user_id", "sender_id", "date", "is_read", "message", "type", "created_at")
+
+    def serialize(self, fields=None):
+        return serialize_columns(self, self.SERIALIZE_FIELDS, fields)
+
+
+class NotificationArchive(db.Model):
+    # Notificaciones archivadas de un usuario en un mes: JSON comprimido con zlib
+    __tablename__ = 'notification_archive'
+    __table_args__ = (
+        UniqueConstraint('user_id', 'month', name='uq_notification_archive_user_month'),
+        # Busqueda de una notificacion archivada por id y paginacion hacia atras
+        Index('ix_notification_archive_user_max_id', 'user_id', 'max_id'),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'), nullable=False)
+    month: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False)
+    min_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    max_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
+
+
 class Category(db.Model):
     __tablename__ = 'category'
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] =mapped_column(String, unique=True)
     description: Mapped[str] =mapped_column(String)
     image: Mapped[str] =mapped_column(String)
+    profile: Mapped[list['Profile']] = relationship('Profile', back_populates='category')
     def serialize(self):
         return{
             "id": self.id,
@@ -177,3 +251,121 @@ class Category(db.Model):
             "image": self.image
 
         }
+
+
+class IdempotencyKey(db.Model):
+    # Guarda la respuesta de una escritura masiva para que los reintentos con la
+    # misma Idempotency-Key devuelvan el mismo resultado sin volver a insertar
+    __tablename__ = 'idempotency_key'
+    __table_args__ = (UniqueConstraint('key', 'user_id', name='uq_idempotency_key_user'),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), nullable=False)
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'), nullable=False)
+    endpoint: Mapped[str] = mapped_column(String, nullable=False)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    response: Mapped[dict] = mapped_column(JSON, nullable=False)
+    status_code: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Indexada para borrar las claves vencidas (flask idempotency-prune)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False, index=True)
+
+
+class RatingSummary(db.Model):
+    # Histograma de ratings por tatuador, mantenido en cada insert/update/delete de Review
+    __tablename__ = 'rating_summary'
+    tattooer_id: Mapped[int] = mapped_column(Integer, ForeignKey('user.id'), primary_key=True)
+    review_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    rating_sum: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    stars_1: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    stars_2: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    stars_3: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    stars_4: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    stars_5: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def serialize(self):
+        return {
+            "tattooer_id": self.tattooer_id,
+            "review_count": self.review_count,
+            "average": round(self.rating_sum / self.review_count, 2) if self.review_count else None,
+            "histogram": {str(stars): getattr(self, f"stars_{stars}") for stars in range(1, 6)}
+        }
+
+
+class StatRollup(db.Model):
+    # Agregados por hora y por dia que alimentan /api/stats sin tocar likes, post ni review.
+    # dimension_id: 0 para likes (global), category_id para posts, tattooer_id para reviews
+    __tablename__ = 'stat_rollup'
+    __table_args__ = (
+        UniqueConstraint('metric', 'granularity', 'dimension_id', 'bucket', name='uq_stat_rollup_key'),
+        Index('ix_stat_rollup_metric_granularity_bucket', 'metric', 'granularity', 'bucket'),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    metric: Mapped[str] = mapped_column(String(20), nullable=False)
+    granularity: Mapped[str] = mapped_column(String(10), nullable=False)
+    dimension_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    bucket: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def serialize(self):
+        return {
+            "metric": self.metric,
+            "granularity": self.granularity,
+            "dimension_id": self.dimension_id,
+            "bucket": self.bucket,
+            "count": self.count,
+            "total": self.total
+        }
+
+
+class RollupWatermark(db.Model):
+    # Ultimo id ya agregado de cada tabla de origen
+    __tablename__ = 'rollup_watermark'
+    source: Mapped[str] = mapped_column(String(20), primary_key=True)
+    last_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class ChangeEvent(db.Model):
+    # Outbox append-only: un evento por fila insertada, modificada o borrada de los modelos
+    # observados, escrito en la misma transaccion que el cambio (ver api/cdc.py)
+    __tablename__ = 'change_event'
+    # AUTOINCREMENT: SQLite no reutiliza ids despues de cdc-prune; un id menor que los
+    # checkpoints nunca se entregaria
+    __table_args__ = {'sqlite_autoincrement': True}
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    table_name: Mapped[str] = mapped_column(String(50), nullable=False)
+    row_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    operation: Mapped[str] = mapped_column(String(10), nullable=False)
+    # keys: columnas de enrutamiento (post_id, user_id...); fields: columnas modificadas
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
+
+    def serialize(self):
+        return {
+            "id": self.id,
+            "table": self.table_name,
+            "row_id": self.row_id,
+            "operation": self.operation,
+            "keys": self.payload.get("keys", {}),
+            "fields": self.payload.get("fields", []),
+            "created_at": self.created_at
+        }
+
+
+class CdcCheckpoint(db.Model):
+    # Ultimo evento procesado por cada consumidor
+    __tablename__ = 'cdc_checkpoint'
+    consumer: Mapped[str] = mapped_column(String(100), primary_key=True)
+    last_event_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Ids bajo el checkpoint que aun no aparecen: {"id": primera vez visto (ISO)}
+    gaps: Mapped[dict] = mapped_column(JSON, nullable=True)
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
+
+
+class ItemNeighbors(db.Model):
+    # Lista top-k de items similares (co-ocurrencia de likes/reviews), ver api/recommendations.py
+    __tablename__ = 'item_neighbors'
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+    item_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # [[id, score], ...] ordenada por score descendente
+    neighbors: Mapped[list] = mapped_column(JSON, nullable=False)
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
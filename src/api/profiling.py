@@ -0,0 +1,269 @@
+"""
+Opt-in profiling to see where the time of a slow route goes: ORM hydration,
+`serialize()`, JSON encoding or the database driver.
+
+Only enabled when PROFILING_TOKEN is set; `setup_profiling(app)` then adds:
+
+- per-request profiles: a request sent with `X-Profile: <token>` is sampled while it
+  runs and its response carries `X-Profile-Id`;
+- worker-wide profiles: POST /_profiling/sample?seconds=N samples every thread of the
+  worker that receives it for N seconds;
+- GET /_profiling/profiles lists the saved profiles and
+  GET /_profiling/profiles/<id>?format=collapsed|speedscope downloads one, as collapsed
+  stacks (flamegraph.pl, speedscope) or speedscope JSON.
+
+The /_profiling routes take the token in the `X-Profiling-Token` header (or ?token=).
+Profiles are stack samples read from a background thread with sys._current_frames(),
+so the profiled code runs unmodified. They are saved as JSON under PROFILING_DIR
+(instance/profiles by default), so any worker of the machine can serve them.
+"""
+import hmac
+import json
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from flask import Blueprint, current_app, request, jsonify, g, Response
+
+# Un perfil por peticion dura milisegundos: se muestrea seguido. El de worker dura
+# segundos y corre junto al trafico real, asi que muestrea menos
+REQUEST_INTERVAL = 0.001
+WORKER_INTERVAL = 0.01
+MAX_SAMPLE_SECONDS = 300
+# Perfiles guardados; los mas viejos se borran
+MAX_PROFILES = 100
+
+PROFILE_ID = re.compile(r'^[0-9a-z-]+$')
+FORMATS = ('collapsed', 'speedscope')
+
+profiling = Blueprint('profiling', __name__)
+
+
+class Sampler:
+    """
+    Background thread that every `interval` seconds records the stack of each thread
+    in `thread_ids` (every thread but itself when None). Stacks are aggregated as
+    (root ... leaf) tuples of frame labels with their sample count.
+    """
+
+    def __init__(self, interval, thread_ids=None):
+        self.interval = interval
+        self.thread_ids = thread_ids
+        self.stacks = Counter()
+        self.ticks = 0
+        self.seconds = 0.0
+        self._labels = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+
+    def start(self):
+        self.started_at = datetime.utcnow()
+        self._start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self._start
+        return self
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            # Los dos ultimos componentes bastan para distinguir api/routes.py de orm/query.py
+            path = '/'.join(code.co_filename.replace(os.sep, '/').split('/')[-2:])
+            label = self._labels[code] = f'{code.co_name} ({path}:{code.co_firstlineno})'
+        return label
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (self.thread_ids is not None and ident not in self.thread_ids):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+            self.ticks += 1
+
+
+def _directory():
+    return current_app.extensions['profiling']['directory']
+
+
+def _authorized(token):
+    expected = current_app.config['PROFILING_TOKEN']
+    return bool(token) and hmac.compare_digest(token.encode('utf-8'), expected.encode('utf-8'))
+
+
+def _save(directory, sampler, **meta):
+    profile_id = f'{sampler.started_at:%Y%m%d%H%M%S}-{os.getpid()}-{secrets.token_hex(3)}'
+    data = {
+        'id': profile_id, 'started_at': sampler.started_at.isoformat(), 'pid': os.getpid(),
+        'seconds': sampler.seconds, 'ticks': sampler.ticks, 'interval': sampler.interval, **meta,
+        'stacks': [[list(stack), count] for stack, count in sampler.stacks.most_common()],
+    }
+    # Escritura atomica: otro worker puede estar listando el directorio
+    path = os.path.join(directory, f'{profile_id}.json')
+    with open(path + '.tmp', 'w') as target:
+        json.dump(data, target)
+    os.replace(path + '.tmp', path)
+
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+    for name in names[:-MAX_PROFILES]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+    return profile_id
+
+
+def _load(profile_id):
+    if not PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(_directory(), f'{profile_id}.json')) as source:
+            return json.load(source)
+    except FileNotFoundError:
+        return None
+
+
+def collapsed(profile):
+    # Formato de flamegraph.pl: "raiz;...;hoja muestras" por linea
+    return ''.join(f'{";".join(stack)} {count}\n' for stack, count in profile['stacks'])
+
+
+def speedscope(profile):
+    frames, index = [], {}
+    samples, weights = [], []
+    # Cada muestra pesa el tiempo medio entre dos lecturas del muestreador
+    weight = profile['seconds'] / profile['ticks'] if profile['ticks'] else profile['interval']
+    for stack, count in profile['stacks']:
+        for label in stack:
+            if label not in index:
+                index[label] = len(frames)
+                name, _, location = label.partition(' (')
+                file, _, line = location.rstrip(')').rpartition(':')
+                frames.append({'name': name, 'file': file, 'line': int(line)})
+        samples.append([index[label] for label in stack])
+        weights.append(count * weight)
+    title = profile.get('path') or f'worker {profile["pid"]}'
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': f'{title} ({profile["id"]})',
+        'exporter': 'api.profiling',
+        'shared': {'frames': frames},
+        'profiles': [{
+            'type': 'sampled', 'name': title, 'unit': 'seconds',
+            'startValue': 0, 'endValue': sum(weights),
+            'samples': samples, 'weights': weights,
+        }],
+    }
+
+
+def _start_request_profile():
+    if _authorized(request.headers.get('X-Profile')):
+        g.profiler = Sampler(REQUEST_INTERVAL, {threading.get_ident()}).start()
+
+
+def _finish_request_profile(response):
+    sampler = g.pop('profiler', None)
+    if sampler is not None:
+        response.headers['X-Profile-Id'] = _save(
+            _directory(), sampler.stop(), kind='request', method=request.method,
+            path=request.full_path.rstrip('?'), status=response.status_code
+        )
+    return response
+
+
+def _stop_request_profile(error=None):
+    # Si la respuesta nunca se armo, el hilo del muestreador no queda vivo
+    sampler = g.pop('profiler', None)
+    if sampler is not None:
+        sampler.stop()
+
+
+@profiling.before_request
+def _require_token():
+    if not _authorized(request.headers.get('X-Profiling-Token') or request.args.get('token')):
+        return jsonify({"mensaje": "Token de profiling invalido"}), 403
+
+
+@profiling.route('/profiles', methods=['GET'])
+def list_profiles():
+    profiles = []
+    for name in sorted(os.listdir(_directory()), reverse=True):
+        if name.endswith('.json'):
+            profile = _load(name[:-len('.json')])
+            if profile is not None:
+                profile.pop('stacks')
+                profiles.append(profile)
+    return jsonify(profiles), 200
+
+
+@profiling.route('/profiles/<profile_id>', methods=['GET'])
+def download_profile(profile_id):
+    output = request.args.get('format', 'collapsed')
+    if output not in FORMATS:
+        return jsonify({"mensaje": f"format debe ser uno de: {', '.join(FORMATS)}"}), 400
+    profile = _load(profile_id)
+    if profile is None:
+        return jsonify({"mensaje": "Perfil no encontrado"}), 404
+
+    if output == 'collapsed':
+        response = Response(collapsed(profile), mimetype='text/plain')
+        filename = f'{profile_id}.collapsed.txt'
+    else:
+        response = Response(json.dumps(speedscope(profile)), mimetype='application/json')
+        filename = f'{profile_id}.speedscope.json'
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
+@profiling.route('/sample', methods=['POST'])
+def sample_worker():
+    seconds = request.args.get('seconds', 10, type=float)
+    if not 0 < seconds <= MAX_SAMPLE_SECONDS:
+        return jsonify({"mensaje": f"seconds debe estar entre 0 y {MAX_SAMPLE_SECONDS}"}), 400
+    state = current_app.extensions['profiling']
+    with state['lock']:
+        if state['worker'] is not None:
+            return jsonify({"mensaje": "Ya hay un perfil de worker en curso"}), 409
+        sampler = state['worker'] = Sampler(WORKER_INTERVAL).start()
+
+    directory = state['directory']
+
+    def finish():
+        try:
+            _save(directory, sampler.stop(), kind='worker', requested_seconds=seconds)
+        finally:
+            with state['lock']:
+                state['worker'] = None
+
+    threading.Timer(seconds, finish).start()
+    # El perfil aparece en /_profiling/profiles al terminar
+    return jsonify({"pid": os.getpid(), "seconds": seconds}), 202
+
+
+def setup_profiling(app):
+    """
+    Registers the per-request hooks and the /_profiling routes. Does nothing unless
+    PROFILING_TOKEN is set.
+    """
+    if not app.config.get('PROFILING_TOKEN'):
+        return
+    directory = app.config.get('PROFILING_DIR') or os.path.join(app.instance_path, 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    app.extensions['profiling'] = {'directory': directory, 'lock': threading.Lock(), 'worker': None}
+
+    app.before_request(_start_request_profile)
+    app.after_request(_finish_request_profile)
+    app.teardown_request(_stop_request_profile)
+    app.register_blueprint(profiling, url_prefix='/_profiling')
@@ -0,0 +1,160 @@
+"""
+Soft deletion of users and posts and the background purge that removes them for real.
+
+Routes only mark rows (`deleted_at`), which hides them from every ORM query (see
+SoftDeleteMixin). `purge_deleted` later removes the marked rows and everything that
+depends on them (likes, reviews, notifications, profile...) with set-based DELETEs of at
+most `batch_size` rows, committing after each one so no statement holds locks for long.
+"""
+from datetime import datetime
+from sqlalchemy import select, update, delete, or_, func, bindparam
+from api.models import db, User, Profile, Post, Likes, Review, Notification, NotificationArchive, IdempotencyKey, RatingSummary
+from api.cdc import record_changes, record_deletes
+from api.ratings import rating_delta_statements, deltas_for_rows, counted_reviews
+from api.rollups import discount_rollups
+
+# Usuarios procesados por vuelta: cada uno puede arrastrar muchas filas dependientes
+USERS_PER_ROUND = 50
+
+
+def soft_delete_post(post):
+    post.deleted_at = datetime.utcnow()
+
+
+def soft_delete_user(user):
+    """
+    Marks the user, its profile and its posts. The posts are marked with one UPDATE
+    instead of loading them into the session. The user's reviews stay until the purge
+    but stop counting in the rating histograms now, like they disappear from the listings.
+    """
+    # Antes de marcar al usuario: despues ya no cuentan y la consulta no las veria
+    rows = db.session.execute(counted_reviews(Review.user_id == user.id)).all()
+    for statement in rating_delta_statements(db.engine.dialect.name, deltas_for_rows(rows, sign=-1)):
+        db.session.execute(statement)
+    now = datetime.utcnow()
+    user.deleted_at = now
+    if user.profile is not None:
+        user.profile.deleted_at = now
+    post_ids = db.session.scalars(select(Post.id).where(Post.user_id == user.id)).all()
+    if post_ids:
+        db.session.execute(
+            update(Post).where(Post.id.in_(post_ids)).values(deleted_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        record_changes(db.session, Post, [{'id': post_id, 'user_id': user.id} for post_id in post_ids],
+                       'update', fields=['deleted_at'])
+
+
+def _delete_in_batches(model, criteria, batch_size, before_delete=None):
+    """
+    Deletes the rows of `model` matching `criteria`, at most batch_size per transaction.
+    `before_delete(ids)` runs in the same transaction (derived data adjustments).
+    """
+    removed = 0
+    while True:
+        ids = db.session.scalars(
+            select(model.id).where(criteria).order_by(model.id).limit(batch_size)
+            .execution_options(include_deleted=True)
+        ).all()
+        if not ids:
+            return removed
+        if before_delete is not None:
+            before_delete(ids)
+        record_deletes(db.session, model, model.id.in_(ids))
+        discount_rollups(db.session, model, model.id.in_(ids))
+        db.session.execute(
+            delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        removed += len(ids)
+
+
+def _discount_reviews(ids):
+    # Las reviews de autores con soft delete ya se descontaron al marcarlos
+    rows = db.session.execute(counted_reviews(Review.id.in_(ids))).all()
+    for statement in rating_delta_statements(db.engine.dialect.name, deltas_for_rows(rows, sign=-1)):
+        db.session.execute(statement)
+
+
+def _discount_likes(ids):
+    # Los likes de un usuario purgado dejan de contar en los posts de los demas
+    rows = db.session.execute(
+        select(Likes.post_id, Post.user_id, func.count(Likes.id)).join(Post, Post.id == Likes.post_id)
+        .where(Likes.id.in_(ids)).group_by(Likes.post_id, Post.user_id)
+    ).all()
+    if not rows:
+        return
+    post = Post.__table__
+    db.session.execute(
+        update(post).where(post.c.id == bindparam('post_id')).values(likes=post.c.likes - bindparam('removed')),
+        [{'post_id': post_id, 'removed': count} for post_id, _, count in rows]
+    )
+    record_changes(db.session, Post, [{'id': post_id, 'user_id': user_id} for post_id, user_id, _ in rows],
+                   'update', fields=['likes'])
+
+
+def _purge_posts(batch_size):
+    removed = {'likes': 0, 'post': 0}
+    while True:
+        post_ids = db.session.scalars(
+            select(Post.id).where(Post.deleted_at.isnot(None)).order_by(Post.id).limit(batch_size)
+            .execution_options(include_deleted=True)
+        ).all()
+        if not post_ids:
+            return removed
+        removed['likes'] += _delete_in_batches(Likes, Likes.post_id.in_(post_ids), batch_size)
+        removed['post'] += _delete_in_batches(Post, Post.id.in_(post_ids), batch_size)
+
+
+def _purge_users(batch_size):
+    removed = {'likes': 0, 'review': 0, 'notification': 0, 'notification_archive': 0, 'profile': 0, 'user': 0}
+    while True:
+        user_ids = db.session.scalars(
+            select(User.id).where(User.deleted_at.isnot(None)).order_by(User.id).limit(USERS_PER_ROUND)
+            .execution_options(include_deleted=True)
+        ).all()
+        if not user_ids:
+            return removed
+        # Posts creados despues de marcar al usuario tambien se van
+        db.session.execute(
+            update(Post).where(Post.user_id.in_(user_ids), Post.deleted_at.is_(None))
+            .values(deleted_at=datetime.utcnow()).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        posts = _purge_posts(batch_size)
+        removed['likes'] += posts['likes']
+        removed['likes'] += _delete_in_batches(
+            Likes, Likes.user_id.in_(user_ids), batch_size, before_delete=_discount_likes
+        )
+        removed['review'] += _delete_in_batches(
+            Review, or_(Review.user_id.in_(user_ids), Review.tattooer_id.in_(user_ids)),
+            batch_size, before_delete=_discount_reviews
+        )
+        removed['notification'] += _delete_in_batches(
+            Notification, or_(Notification.user_id.in_(user_ids), Notification.sender_id.in_(user_ids)),
+            batch_size
+        )
+        removed['notification_archive'] += _delete_in_batches(
+            NotificationArchive, NotificationArchive.user_id.in_(user_ids), batch_size
+        )
+        removed['profile'] += _delete_in_batches(Profile, Profile.user_id.in_(user_ids), batch_size)
+        db.session.execute(delete(IdempotencyKey).where(IdempotencyKey.user_id.in_(user_ids)))
+        db.session.execute(delete(RatingSummary).where(RatingSummary.tattooer_id.in_(user_ids)))
+        db.session.execute(
+            delete(User).where(User.id.in_(user_ids)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        removed['user'] += len(user_ids)
+
+
+def purge_deleted(batch_size=500, log=print):
+    """
+    Removes every soft-deleted post and user with their dependent rows.
+    Returns {table: rows removed}.
+    """
+    removed = _purge_posts(batch_size)
+    for table, count in _purge_users(batch_size).items():
+        removed[table] = removed.get(table, 0) + count
+    for table, count in removed.items():
+        log(f'{table}: {count} rows purged')
+    return removed
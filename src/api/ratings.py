@@ -0,0 +1,130 @@
+"""
+Per-tattooer rating histogram kept in `rating_summary`.
+
+Every flush that inserts, edits or deletes a Review applies the matching +1/-1 to the
+tattooer's row in the same transaction, so profile pages read the summary with a
+primary key lookup instead of scanning the reviews. Writes that bypass the ORM unit of
+work (bulk inserts, set-based deletes) must call rating_delta_statements themselves.
+
+Only reviews whose author is live count, the same ones the review listings show:
+soft-deleting a user takes its reviews out of the histograms right away (see
+purge.soft_delete_user), and the purge does not discount them a second time.
+"""
+from collections import Counter
+from sqlalchemy import event, select, delete, func, case, insert, inspect
+from sqlalchemy.orm import Session
+from api.models import db, User, Review, RatingSummary
+from api.utils import increment_upsert
+
+STAR_COLUMNS = {stars: f'stars_{stars}' for stars in range(1, 6)}
+
+
+def rating_delta_statements(dialect_name, deltas):
+    """
+    Turns {(tattooer_id, rating): delta} into one upsert per tattooer.
+    Ratings outside 1..5 are not part of the histogram and are ignored.
+    """
+    per_tattooer = {}
+    for (tattooer_id, rating), delta in deltas.items():
+        if not delta or tattooer_id is None or rating not in STAR_COLUMNS:
+            continue
+        stars = per_tattooer.setdefault(tattooer_id, Counter())
+        stars[rating] += delta
+
+    table = RatingSummary.__table__
+    columns = ['review_count', 'rating_sum'] + list(STAR_COLUMNS.values())
+    statements = []
+    for tattooer_id, stars in per_tattooer.items():
+        values = {
+            'tattooer_id': tattooer_id,
+            'review_count': sum(stars.values()),
+            'rating_sum': sum(rating * count for rating, count in stars.items()),
+        }
+        values.update({column: stars[rating] for rating, column in STAR_COLUMNS.items()})
+        statement = increment_upsert(dialect_name, table, ['tattooer_id'], columns)
+        statements.append(statement.values(**values))
+    return statements
+
+
+def counted_reviews(criteria):
+    # (tattooer_id, rating) de las reviews que cuentan: autor existente y sin soft delete
+    return (
+        select(Review.tattooer_id, Review.rating)
+        .join(User, User.id == Review.user_id)
+        .where(criteria, User.deleted_at.is_(None))
+        .execution_options(include_deleted=True)
+    )
+
+
+def deltas_for_rows(rows, sign=1):
+    # rows: iterable de (tattooer_id, rating)
+    deltas = Counter()
+    for tattooer_id, rating in rows:
+        deltas[(tattooer_id, rating)] += sign
+    return deltas
+
+
+def _previous(state, key):
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.obj(), key)
+
+
+def _author_counts(session, user_id):
+    # get() aplica el filtro de soft delete: un autor borrado no se encuentra
+    return user_id is not None and session.get(User, user_id) is not None
+
+
+@event.listens_for(Session, 'before_flush')
+def track_review_changes(session, flush_context, instances):
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, Review) and _author_counts(session, obj.user_id):
+            deltas[(obj.tattooer_id, obj.rating)] += 1
+    for obj in session.deleted:
+        if isinstance(obj, Review):
+            state = inspect(obj)
+            if _author_counts(session, _previous(state, 'user_id')):
+                deltas[(_previous(state, 'tattooer_id'), _previous(state, 'rating'))] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, Review) and session.is_modified(obj):
+            state = inspect(obj)
+            old = (_previous(state, 'tattooer_id'), _previous(state, 'rating'))
+            new = (obj.tattooer_id, obj.rating)
+            old_counts = _author_counts(session, _previous(state, 'user_id'))
+            new_counts = _author_counts(session, obj.user_id)
+            if old == new and old_counts == new_counts:
+                continue
+            if old_counts:
+                deltas[old] -= 1
+            if new_counts:
+                deltas[new] += 1
+    if not deltas:
+        return
+    for statement in rating_delta_statements(session.get_bind().dialect.name, deltas):
+        session.execute(statement)
+
+
+def rebuild_rating_summaries():
+    # Recalcula todos los histogramas con un solo INSERT ... SELECT agrupado
+    stars = [func.sum(case((Review.rating == rating, 1), else_=0)) for rating in STAR_COLUMNS]
+    source = (
+        select(Review.tattooer_id, func.count(Review.id), func.sum(Review.rating), *stars)
+        .join(User, User.id == Review.user_id)
+        .where(Review.tattooer_id.isnot(None), Review.rating.between(1, 5), User.deleted_at.is_(None))
+        .group_by(Review.tattooer_id)
+        .execution_options(include_deleted=True)
+    )
+    columns = ['tattooer_id', 'review_count', 'rating_sum'] + list(STAR_COLUMNS.values())
+    db.session.execute(delete(RatingSummary))
+    db.session.execute(insert(RatingSummary.__table__).from_select(columns, source))
+    db.session.commit()
+
+
+def get_rating_summary(tattooer_id):
+    summary = db.session.get(RatingSummary, tattooer_id)
+    if summary is None:
+        return RatingSummary(tattooer_id=tattooer_id, review_count=0, rating_sum=0,
+                             stars_1=0, stars_2=0, stars_3=0, stars_4=0, stars_5=0).serialize()
+    return summary.serialize()
@@ -0,0 +1,219 @@
+"""
+Item-to-item recommendations: "similar posts" and "similar tattooers".
+
+Two items are similar when the same users interacted with both: a like for posts; a
+review, or a like on one of their posts, for tattooers. The similarity is the cosine of
+the binary user vectors, shrunk for pairs with little support:
+
+    score(i, j) = common / sqrt(users_i * users_j) * common / (common + SHRINKAGE)
+
+The co-occurrence counts come from a grouped self-join of the interaction pairs computed
+by the database, a batch of items at a time. Only the TOP_K neighbours of each item are
+kept in `item_neighbors`, so serving a list is one primary key read.
+
+`rebuild_recommendations` recomputes every list (flask rebuild-recommendations).
+`refresh_recommendations` is a CDC consumer: for each batch of new likes/reviews it
+recomputes the lists of the touched items and of the other items of the same users.
+"""
+import heapq
+import math
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import select, delete, insert, union, func, and_
+from api.models import db, Likes, Post, Review, ItemNeighbors, ChangeEvent
+from api.cdc import consume, ack
+
+KINDS = ('post', 'tattooer')
+TOP_K = 20
+# Pares con pocos usuarios en comun no deberian ganarle a pares con mucha evidencia
+SHRINKAGE = 5
+BATCH_ITEMS = 500
+# Limite de parametros por IN (...) en SQLite
+IN_CHUNK = 900
+# Items de partida para "te puede gustar": las interacciones mas recientes del usuario
+SEED_ITEMS = 10
+
+CONSUMER = 'recommendations'
+
+
+def _interactions(kind):
+    # Pares (user_id, item_id) distintos de los que sale la similitud
+    if kind == 'post':
+        return select(Likes.user_id.label('user_id'), Likes.post_id.label('item_id')).distinct()
+    return union(
+        select(Review.user_id.label('user_id'), Review.tattooer_id.label('item_id')),
+        select(Likes.user_id, Post.user_id).join(Post, Post.id == Likes.post_id),
+    )
+
+
+def _chunks(ids, size=IN_CHUNK):
+    ids = sorted(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _user_counts(pairs, item_ids):
+    counts = {}
+    for chunk in _chunks(item_ids):
+        counts.update(db.session.execute(
+            select(pairs.c.item_id, func.count()).where(pairs.c.item_id.in_(chunk)).group_by(pairs.c.item_id)
+        ).all())
+    return counts
+
+
+def _compute(kind, item_ids):
+    """
+    {item_id: [[neighbour_id, score], ...]} for the given items (at most IN_CHUNK).
+    """
+    source = _interactions(kind)
+    a, b = source.subquery('a'), source.subquery('b')
+    cooccurrence = db.session.execute(
+        select(a.c.item_id, b.c.item_id, func.count())
+        .select_from(a)
+        .join(b, and_(a.c.user_id == b.c.user_id, a.c.item_id != b.c.item_id))
+        .where(a.c.item_id.in_(item_ids))
+        .group_by(a.c.item_id, b.c.item_id)
+    ).all()
+    counts = _user_counts(source.subquery('pairs'), {other for _, other, _ in cooccurrence} | set(item_ids))
+
+    candidates = {}
+    for item_id, other_id, common in cooccurrence:
+        score = common / math.sqrt(counts[item_id] * counts[other_id]) * common / (common + SHRINKAGE)
+        candidates.setdefault(item_id, []).append((score, other_id))
+    return {
+        item_id: [[other_id, round(score, 4)]
+                  for score, other_id in heapq.nlargest(TOP_K, scored, key=lambda pair: (pair[0], -pair[1]))]
+        for item_id, scored in candidates.items()
+    }
+
+
+def _store(kind, item_ids, lists):
+    now = datetime.utcnow()
+    db.session.execute(delete(ItemNeighbors).where(ItemNeighbors.kind == kind, ItemNeighbors.item_id.in_(item_ids)))
+    rows = [{'kind': kind, 'item_id': item_id, 'neighbors': neighbors, 'updated_at': now}
+            for item_id, neighbors in lists.items()]
+    if rows:
+        db.session.execute(insert(ItemNeighbors), rows)
+
+
+def refresh_items(kind, item_ids):
+    # Recalcula y guarda las listas de estos items, un lote por transaccion
+    for chunk in _chunks(item_ids, BATCH_ITEMS):
+        _store(kind, chunk, _compute(kind, chunk))
+        db.session.commit()
+
+
+def rebuild_recommendations(log=print):
+    """
+    Recomputes every neighbour list and moves the CDC checkpoint to the events that
+    existed when the rebuild started. Returns {kind: items processed}.
+    """
+    last_event = db.session.scalar(select(func.max(ChangeEvent.id))) or 0
+    started = datetime.utcnow()
+    processed = {}
+    for kind in KINDS:
+        pairs = _interactions(kind).subquery()
+        processed[kind] = 0
+        last_id = 0
+        while True:
+            item_ids = db.session.scalars(
+                select(pairs.c.item_id).where(pairs.c.item_id > last_id)
+                .group_by(pairs.c.item_id).order_by(pairs.c.item_id).limit(BATCH_ITEMS)
+            ).all()
+            if not item_ids:
+                break
+            refresh_items(kind, item_ids)
+            processed[kind] += len(item_ids)
+            last_id = item_ids[-1]
+        # Items que ya no tienen interacciones conservan una lista vieja: se borran
+        db.session.execute(delete(ItemNeighbors).where(ItemNeighbors.kind == kind, ItemNeighbors.updated_at < started))
+        db.session.commit()
+        log(f'{kind}: {processed[kind]} neighbour lists rebuilt')
+    if last_event:
+        ack(CONSUMER, last_event)
+    return processed
+
+
+def _affected_items(events):
+    posts, tattooers, users = set(), set(), set()
+    for change in events:
+        keys = change['keys']
+        if change['table'] == 'likes':
+            posts.add(keys.get('post_id'))
+            users.add(keys.get('user_id'))
+        elif change['table'] == 'review':
+            tattooers.add(keys.get('tattooer_id'))
+            users.add(keys.get('user_id'))
+    users.discard(None)
+    # Un like nuevo cambia la co-ocurrencia con todos los demas items del mismo usuario
+    for chunk in _chunks(users):
+        posts.update(db.session.scalars(select(Likes.post_id).where(Likes.user_id.in_(chunk))))
+        tattooers.update(db.session.scalars(select(Review.tattooer_id).where(Review.user_id.in_(chunk))))
+    posts.discard(None)
+    for chunk in _chunks(posts):
+        tattooers.update(db.session.scalars(select(Post.user_id).where(Post.id.in_(chunk))))
+    tattooers.discard(None)
+    return posts, tattooers
+
+
+def refresh_recommendations(batch_size=500, max_batches=None):
+    """
+    Applies the likes and reviews recorded since the last run. Returns events handled.
+    """
+    def handle(events):
+        posts, tattooers = _affected_items(events)
+        refresh_items('post', posts)
+        refresh_items('tattooer', tattooers)
+    return consume(CONSUMER, handle, batch_size=batch_size, max_batches=max_batches)
+
+
+def similar_items(kind, item_id, k=TOP_K):
+    # Lectura O(k): una fila por clave primaria
+    row = db.session.get(ItemNeighbors, (kind, item_id))
+    return [(neighbor_id, score) for neighbor_id, score in row.neighbors[:k]] if row else []
+
+
+def recommended_items(kind, seed_ids, exclude=(), k=TOP_K):
+    """
+    Sums the neighbour lists of the seed items (the user's recent interactions) and
+    returns the k best [(item_id, score)] that are not seeds or in `exclude`.
+    """
+    if not seed_ids:
+        return []
+    scores = Counter()
+    for row in db.session.scalars(
+        select(ItemNeighbors).where(ItemNeighbors.kind == kind, ItemNeighbors.item_id.in_(seed_ids))
+    ):
+        for neighbor_id, score in row.neighbors:
+            scores[neighbor_id] += score
+    skip = set(seed_ids) | set(exclude)
+    ranked = sorted(((item_id, score) for item_id, score in scores.items() if item_id not in skip),
+                    key=lambda pair: (-pair[1], pair[0]))
+    return [(item_id, round(score, 4)) for item_id, score in ranked[:k]]
+
+
+def posts_for_user(user_id, k=TOP_K):
+    # Posts parecidos a los ultimos que le gustaron al usuario, sin los que ya le gustaron
+    seeds = db.session.scalars(
+        select(Likes.post_id).where(Likes.user_id == user_id).order_by(Likes.id.desc()).limit(SEED_ITEMS)
+    ).all()
+    ranked = recommended_items('post', seeds, k=None)
+    if not ranked:
+        return []
+    liked = set(db.session.scalars(
+        select(Likes.post_id).where(Likes.user_id == user_id, Likes.post_id.in_([item_id for item_id, _ in ranked]))
+    ))
+    return [pair for pair in ranked if pair[0] not in liked][:k]
+
+
+def tattooers_for_user(user_id, k=TOP_K):
+    # Parten de los tatuadores evaluados y de los autores de los posts que le gustaron
+    reviewed = db.session.scalars(
+        select(Review.tattooer_id).where(Review.user_id == user_id).order_by(Review.id.desc()).limit(SEED_ITEMS)
+    ).all()
+    liked_authors = db.session.scalars(
+        select(Post.user_id).join(Likes, Likes.post_id == Post.id)
+        .where(Likes.user_id == user_id).order_by(Likes.id.desc()).limit(SEED_ITEMS)
+    ).all()
+    seeds = list(dict.fromkeys(reviewed + liked_authors))
+    return recommended_items('tattooer', seeds, exclude=(user_id,), k=k)
@@ -0,0 +1,172 @@
+"""
+Hourly and daily aggregates for likes, posts and reviews, kept in `stat_rollup`.
+
+The rollups are refreshed incrementally by `flask refresh-rollups` (cron or the job
+runner): each source table is read in id order after its watermark, a bounded batch at
+a time, aggregated in memory and upserted as increments. The watermark moves in the
+same transaction as the increments, so a batch is applied exactly once. A backfill is
+the same job starting from watermark 0.
+
+Soft-deleted rows are folded like any other: they stay in the stats until the purge
+removes them. Deleting rows that are already behind the watermark must subtract them
+(`discount_rollups`); ORM deletes do it in a before_flush hook, set-based deletes
+(admin, purge) call it themselves before the DELETE.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, select, delete, func, literal
+from sqlalchemy.orm import Session
+from api.models import db, Likes, Post, Profile, Review, StatRollup, RollupWatermark
+from api.utils import increment_upsert
+
+GRANULARITIES = ('hour', 'day')
+SOURCE_MODELS = {Likes: 'likes', Post: 'posts', Review: 'reviews'}
+
+# Filas mas nuevas que esto se dejan para la siguiente pasada: una transaccion
+# que aun no hizo commit podria tener un id menor y quedar detras del watermark
+COMMIT_LAG = timedelta(seconds=30)
+
+
+def _source_queries():
+    # Cada origen entrega (id, created_at, dimension_id, valor a sumar en total)
+    return {
+        'likes': select(Likes.id, Likes.created_at, literal(0), literal(0)),
+        'posts': select(Post.id, Post.created_at, func.coalesce(Profile.category_id, 0), literal(0))
+            .outerjoin(Profile, Profile.user_id == Post.user_id),
+        'reviews': select(Review.id, Review.created_at, Review.tattooer_id, Review.rating),
+    }
+
+
+def _source_id(metric):
+    return {'likes': Likes.id, 'posts': Post.id, 'reviews': Review.id}[metric]
+
+
+def bucket_start(moment, granularity):
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _apply_increments(session, metric, increments):
+    rows = [
+        {'metric': metric, 'granularity': granularity, 'dimension_id': dimension_id,
+         'bucket': bucket, 'count': count, 'total': total}
+        for (granularity, bucket, dimension_id), (count, total) in increments.items()
+    ]
+    statement = increment_upsert(
+        session.get_bind().dialect.name, StatRollup.__table__,
+        ['metric', 'granularity', 'dimension_id', 'bucket'], ['count', 'total']
+    )
+    session.execute(statement, rows)
+
+
+def _aggregate(rows):
+    counts = Counter()
+    totals = Counter()
+    for _, created_at, dimension_id, value in rows:
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(created_at, granularity), dimension_id)
+            counts[key] += 1
+            totals[key] += value or 0
+    return {key: (counts[key], totals[key]) for key in counts}
+
+
+def _locked_watermark(session, metric):
+    # El bloqueo ordena una pasada de refresh con los borrados que la descuentan:
+    # el que llega segundo ve el watermark que dejo el primero
+    return session.get(RollupWatermark, metric, with_for_update=True, populate_existing=True)
+
+
+def discount_rollups(session, model, criteria):
+    """
+    Subtracts from the rollups the rows of `model` matching `criteria` that are already
+    behind the watermark. Runs in the deleting transaction, before the DELETE.
+    """
+    metric = SOURCE_MODELS.get(model)
+    if metric is None:
+        return
+    watermark = _locked_watermark(session, metric)
+    if watermark is None or not watermark.last_id:
+        return
+    rows = session.execute(
+        _source_queries()[metric].where(criteria, model.id <= watermark.last_id)
+        .execution_options(include_deleted=True)
+    ).all()
+    increments = _aggregate(row for row in rows if row[1] is not None)
+    if increments:
+        _apply_increments(session, metric, {key: (-count, -total) for key, (count, total) in increments.items()})
+
+
+@event.listens_for(Session, 'before_flush')
+def discount_deleted_rows(session, flush_context, instances):
+    ids = {}
+    for obj in session.deleted:
+        if type(obj) in SOURCE_MODELS:
+            ids.setdefault(type(obj), []).append(obj.id)
+    for model, model_ids in ids.items():
+        discount_rollups(session, model, model.id.in_(model_ids))
+
+
+def refresh_rollups(batch_size=5000, log=print):
+    """
+    Folds every row newer than each source watermark into the rollups, one
+    transaction per batch. Returns {metric: rows processed}.
+    """
+    processed = {}
+    cutoff = datetime.utcnow() - COMMIT_LAG
+    for metric, query in _source_queries().items():
+        source_id = _source_id(metric)
+        processed[metric] = 0
+        while True:
+            watermark = _locked_watermark(db.session, metric)
+            if watermark is None:
+                watermark = RollupWatermark(source=metric, last_id=0)
+                db.session.add(watermark)
+            # Las filas con soft delete tambien cuentan; el purge las descuenta al borrarlas
+            rows = db.session.execute(
+                query.where(source_id > watermark.last_id).order_by(source_id).limit(batch_size)
+                .execution_options(include_deleted=True)
+            ).all()
+            # Se corta en la primera fila demasiado reciente para conservar el orden por id
+            fresh = next((index for index, row in enumerate(rows) if row[1] is not None and row[1] > cutoff), None)
+            if fresh is not None:
+                rows = rows[:fresh]
+            if not rows:
+                break
+            increments = _aggregate(row for row in rows if row[1] is not None)
+            if increments:
+                _apply_increments(db.session, metric, increments)
+            watermark.last_id = rows[-1][0]
+            db.session.commit()
+            processed[metric] += len(rows)
+            if fresh is not None or len(rows) < batch_size:
+                break
+        db.session.commit()
+        log(f'{metric}: {processed[metric]} rows folded into rollups')
+    return processed
+
+
+def reset_rollups():
+    # Para reconstruir desde cero (backfill completo)
+    db.session.execute(delete(StatRollup))
+    db.session.execute(delete(RollupWatermark))
+    db.session.commit()
+
+
+def query_series(metric, granularity, start, end, dimension_id=None):
+    """
+    Reads a time series from the rollups only: [(bucket, count, total)] ordered by bucket.
+    Without dimension_id the buckets are summed across all dimensions.
+    """
+    query = (
+        select(StatRollup.bucket, func.sum(StatRollup.count), func.sum(StatRollup.total))
+        .where(StatRollup.metric == metric,
+               StatRollup.granularity == granularity,
+               StatRollup.bucket >= start,
+               StatRollup.bucket <= end)
+        .group_by(StatRollup.bucket)
+        .order_by(StatRollup.bucket)
+    )
+    if dimension_id is not None:
+        query = query.where(StatRollup.dimension_id == dimension_id)
+    return db.session.execute(query).all()
@@ -1,27 +1,145 @@
 """
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
-from flask import Flask, request, jsonify, url_for, Blueprint
-from api.models import db, User, Post, Profile, Review, Notification
-from api.utils import generate_sitemap, APIException
+from flask import Flask, request, jsonify, url_for, Blueprint, current_app
+from api.models import db, User, UserType, Post, Profile, Review, Notification, Category, IdempotencyKey
+from api.utils import generate_sitemap, APIException, request_fingerprint, find_idempotent_response, store_idempotent_response, encode_cursor, decode_cursor, requested_fields, requested_includes, sparse_options
+from api.rollups import query_series, GRANULARITIES
+from api.ratings import get_rating_summary, rating_delta_statements, deltas_for_rows
+from api.cdc import record_changes
+from api.purge import soft_delete_post, soft_delete_user
+from api.jobs import enqueue
+from api.geo import nearest, MAX_RADIUS_KM
+from api.recommendations import similar_items, posts_for_user, tattooers_for_user, TOP_K
+from api.archive import find_archived, archived_page
+from api.singleflight import coalesced, invalidate
 from flask_cors import CORS
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
 
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from flask_jwt_extended import jwt_required , get_jwt_identity, create_access_token
 api = Blueprint('api', __name__) 
 
 # Allow CORS requests to this API
 CORS(api)
 
+# Maximo de elementos aceptados por una peticion masiva
+MAX_BULK_ITEMS = 500
+
+# Tamaño de pagina por defecto y maximo para listados paginados
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# La purga no es urgente: corre despues de cualquier otro job en cola
+PURGE_PRIORITY = -10
+
+
+def _enqueue_purge():
+    # El borrado ya se confirmo: si la cola falla se registra y la purga periodica
+    # (flask purge-deleted) lo recoge igual; el cliente no recibe un 500
+    try:
+        enqueue('purge-deleted', priority=PURGE_PRIORITY, dedupe_key='purge-deleted')
+    except Exception:
+        current_app.logger.exception('purge-deleted could not be enqueued')
+
+# Lecturas publicas calientes: frescas unos segundos y luego servidas vencidas mientras
+# una sola peticion las refresca (api/singleflight.py)
+HOT_READ_TTL = 5
+HOT_READ_STALE = 60
+
+
+def _bulk_insert(endpoint, model, validate_items, after_insert=None):
+    """
+    Validates every item of the body in one pass and inserts the valid ones with a single
+    executemany inside one transaction. Honours the Idempotency-Key header so retries
+    after a timeout return the original response instead of inserting twice.
+    """
+    current_user = get_jwt_identity()
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"mensaje": "Se espera una lista de elementos en 'items'"}), 400
+    if len(items) > MAX_BULK_ITEMS:
+        return jsonify({"mensaje": f"Máximo {MAX_BULK_ITEMS} elementos por petición"}), 413
+
+    key = request.headers.get('Idempotency-Key')
+    fingerprint = request_fingerprint(items)
+    if key:
+        stored = find_idempotent_response(db.session, IdempotencyKey, key, current_user, endpoint, fingerprint)
+        if stored is not None:
+            return jsonify(stored[0]), stored[1]
+
+    rows, errors = validate_items(items, current_user)
+    try:
+        created = []
+        if rows:
+            # Un solo INSERT ... RETURNING ejecutado como executemany
+            ids = db.session.scalars(
+                insert(model).returning(model.id, sort_by_parameter_order=True),
+                [row for _, row in rows]
+            ).all()
+            created = [{"index": index, "id": new_id} for (index, _), new_id in zip(rows, ids)]
+            inserted = [dict(row, id=new_id) for (_, row), new_id in zip(rows, ids)]
+            # El executemany no pasa por el flush del ORM: eventos CDC y derivados a mano
+            record_changes(db.session, model, inserted, 'insert')
+            if after_insert is not None:
+                after_insert(inserted)
+        body = {"success": bool(created), "created": created, "errors": errors}
+        status_code = 201 if created else 400
+        if key:
+            store_idempotent_response(db.session, IdempotencyKey, key, current_user, endpoint, fingerprint, body, status_code)
+        db.session.commit()
+        return jsonify(body), status_code
+    except IntegrityError:
+        db.session.rollback()
+        # Otro reintento con la misma llave termino primero: devolvemos su respuesta
+        stored = find_idempotent_response(db.session, IdempotencyKey, key, current_user, endpoint, fingerprint) if key else None
+        if stored is not None:
+            return jsonify(stored[0]), stored[1]
+        return jsonify({"mensaje": "Conflicto al guardar los elementos"}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
 
 """POSTS"""
 
-#Ruta para obtener todos los post
+def _posts_page(limit, cursor=None, fields=None, user_id=None):
+    """
+    One keyset page of posts (of one user, or of everyone), newest first, read from
+    ix_post_user_created / ix_post_created_at. Returns (serialized posts, next_cursor).
+    Post.likes is the counter column, so the like counts come with the rows.
+    """
+    query = select(Post).options(*sparse_options(Post, fields, required=('created_at',)))
+    if user_id is not None:
+        query = query.where(Post.user_id == user_id)
+    if cursor:
+        try:
+            last_created, last_id = decode_cursor(cursor, (str, int))
+            last_created = datetime.fromisoformat(last_created)
+        except ValueError:
+            raise APIException('Cursor inválido', status_code=400)
+        query = query.where(
+            (Post.created_at < last_created) | ((Post.created_at == last_created) & (Post.id < last_id))
+        )
+    posts = db.session.scalars(query.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit + 1)).all()
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_cursor([posts[-1].created_at.isoformat(), posts[-1].id])
+    return [post.serialize(fields) for post in posts], next_cursor
+
+
+#Ruta para obtener todos los post, del mas nuevo al mas viejo y paginados con cursor
+#?limit=20&cursor=<next_cursor>&fields=id,image,likes para traer (y leer de la bd) solo esas columnas
 @api.route('/posts', methods=['GET'])  
 def get_all_posts():
-    posts = db.session.query(Post).order_by(Post.created_at.desc()).all()
-    result = [post.serialize() for post in posts]
-    return jsonify(result), 200
+    fields = requested_fields(Post.SERIALIZE_FIELDS)
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    posts, next_cursor = _posts_page(limit, request.args.get('cursor'), fields)
+    return jsonify({'posts': posts, 'next_cursor': next_cursor}), 200
 
 
 #Ruta crear nuevo post
@@ -53,6 +171,30 @@ def create_post():
         return jsonify({"error": str(e)}), 500
 
 
+def _validate_bulk_posts(items, current_user):
+    rows, errors = [], []
+    now = datetime.utcnow()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('image') or not item.get('description'):
+            errors.append({"index": index, "mensaje": "Faltan campos requeridos"})
+            continue
+        rows.append((index, {
+            "image": item['image'],
+            "description": item['description'],
+            "likes": 0,
+            "user_id": current_user,
+            "created_at": now
+        }))
+    return rows, errors
+
+
+#Ruta crear varios posts en una sola peticion
+@api.route('/posts/bulk', methods=['POST'])
+@jwt_required()
+def create_posts_bulk():
+    return _bulk_insert('posts/bulk', Post, _validate_bulk_posts)
+
+
 #Ruta eliminar un post
 @api.route('/posts/<int:post_id>', methods=['DELETE'])
 @jwt_required()
@@ -69,9 +211,11 @@ def delete_post(post_id):
         return jsonify({"msg": "No tienes permiso para eliminar este post"}), 403
    
     try:
-        # Eliminar el post y confirmar
-        db.session.delete(post)
+        # Marcar el post como eliminado; sus likes se borran despues en segundo plano (job purge-deleted)
+        soft_delete_post(post)
         db.session.commit()
+        invalidate(url_for('api.get_post_by_id', post_id=post_id))
+        _enqueue_purge()
         return jsonify({"msg": "Post eliminado correctamente"}), 200
     except Exception as e:
         db.session.rollback()
@@ -100,6 +244,7 @@ def update_post(post_id):
         post.image = data['image']
         post.description = data['description']
         db.session.commit()
+        invalidate(url_for('api.get_post_by_id', post_id=post_id))
         return jsonify(post.serialize()), 200
     except Exception as e:
         db.session.rollback()
@@ -108,13 +253,15 @@ def update_post(post_id):
 
 #Ruta para ver un post por su id
 @api.route('/posts/<int:post_id>', methods=['GET'])
+@coalesced(HOT_READ_TTL, HOT_READ_STALE)
 def get_post_by_id(post_id):
-    post = Post.query.get(post_id)
+    fields = requested_fields(Post.SERIALIZE_FIELDS)
+    post = db.session.get(Post, post_id, options=sparse_options(Post, fields))
     
     if not post:
         return jsonify({"msg": "Post no encontrado"}), 404
 
-    return jsonify(post.serialize()), 200
+    return jsonify(post.serialize(fields)), 200
 
 
 """AUTENTICACIÓN"""
@@ -127,7 +274,8 @@ def register():
         return jsonify({"mensaje": "Email y contraseña son requeridos"}), 400
     
     # Verificar si el usuario ya existe
-    if db.session.query(User).filter_by(email=data['email']).first():
+    # Incluye usuarios eliminados pendientes de purga: su email sigue ocupado
+    if db.session.query(User).execution_options(include_deleted=True).filter_by(email=data['email']).first():
         return jsonify({"mensaje": "El usuario ya existe"}), 400
     
     # Crear nuevo usuario
@@ -154,9 +302,11 @@ def login():
         return jsonify({"mensaje": "Email y contraseña son requeridos"}), 400
     
     # Buscar usuario
-    user = db.session.query(User).filter_by(email=data['email']).first()
+    # La respuesta lleva el usuario con sus relaciones: se cargan junto con el usuario
+    user = db.session.query(User).options(*sparse_options(User, None, User.SERIALIZE_RELATIONS)) \
+        .filter_by(email=data['email']).first()
     
-    if not user or not user.check_password(data['password']):  # Falta método check_password
+    if not user or not user.check_password(data['password']):
         return jsonify({"mensaje": "Email o contraseña incorrectos"}), 401
     
     # Crear token de acceso
@@ -165,21 +315,35 @@ def login():
     return jsonify({
         "success": True,
         "token": access_token,
-        "user": user.serialize()  # Falta un método serialize
+        "user": user.serialize()
     }), 200
 
 
 """USUARIOS"""
+
+def _full_user(user_id):
+    # Usuario recien guardado con todas sus relaciones: user_type y profile en el mismo
+    # SELECT, cada coleccion con una consulta (en vez de una carga perezosa por relacion)
+    return db.session.get(User, user_id, options=sparse_options(User, None, User.SERIALIZE_RELATIONS),
+                          populate_existing=True)
+
+
+#?fields=id,username&include=profile; sin parametros devuelve el usuario completo con sus relaciones
 @api.route('/user', methods=['GET'])
 @jwt_required()
 def get_current_user():
     current_user_id = get_jwt_identity()
-    user = db.session.query(User).get(current_user_id)
+    fields = requested_fields(User.SERIALIZE_FIELDS)
+    include = requested_includes(User.SERIALIZE_RELATIONS)
+    # Las relaciones pedidas se cargan de antemano: user_type y profile en el mismo SELECT,
+    # cada coleccion con una consulta (ver sparse_options)
+    loaded = include if fields is not None or include is not None else User.SERIALIZE_RELATIONS
+    user = db.session.get(User, current_user_id, options=sparse_options(User, fields, loaded))
     
     if not user:
         return jsonify({"mensaje": "Usuario no encontrado"}), 404
     
-    return jsonify({"success": True, "user": user.serialize()}), 200
+    return jsonify({"success": True, "user": user.serialize(fields, include)}), 200
 
 
 @api.route('/user', methods=['PUT'])
@@ -200,7 +364,7 @@ def update_user():
         user.last_name = data['last_name']
     if 'email' in data:
         # Verificar si el nuevo email ya está en uso
-        if db.session.query(User).filter(User.email == data['email'], User.id != current_user_id).first():
+        if db.session.query(User).execution_options(include_deleted=True).filter(User.email == data['email'], User.id != current_user_id).first():
             return jsonify({"mensaje": "El email ya está en uso"}), 400
         user.email = data['email']
     if 'password' in data:
@@ -209,7 +373,7 @@ def update_user():
     user.updated_at = datetime.utcnow()
     db.session.commit()
     
-    return jsonify({"success": True, "mensaje": "Usuario actualizado", "user": user.serialize()}), 200
+    return jsonify({"success": True, "mensaje": "Usuario actualizado", "user": _full_user(current_user_id).serialize()}), 200
 
 
 
@@ -222,17 +386,30 @@ def delete_user():
     if not user:
         return jsonify({"mensaje": "Usuario no encontrado"}), 404
     
-    db.session.delete(user)
+    # Se marca el usuario (y su perfil y posts); el contenido asociado se purga en segundo plano
+    soft_delete_user(user)
     db.session.commit()
+    _enqueue_purge()
     
     return jsonify({"success": True, "mensaje": "Usuario eliminado"}), 200
 
 """PERFIL"""
+
+# Campos de la respuesta de get_tattooer_profile (usuario + perfil)
+TATTOOER_PROFILE_FIELDS = ('id', 'name', 'username', 'email', 'bio', 'social_media',
+                           'profile_picture', 'ranking', 'rating', 'created_at')
+
 #Ruta ver perfil por ID 
 @api.route('/profile/<int:tattooer_id>', methods=['GET'])
 def get_tattooer_profile(tattooer_id):
-    # Buscar al usuario en la base de datos
-    tattooer = db.session.query(User).filter_by(id=tattooer_id).one_or_none()
+    fields = requested_fields(TATTOOER_PROFILE_FIELDS)
+    user_fields = None if fields is None else fields & set(User.SERIALIZE_FIELDS)
+    profile_fields = None if fields is None else fields & set(Profile.SERIALIZE_FIELDS)
+    # Buscar al usuario en la base de datos, con su perfil en la misma consulta
+    tattooer = db.session.query(User).options(
+        *sparse_options(User, user_fields),
+        joinedload(User.profile).options(*sparse_options(Profile, profile_fields))
+    ).filter_by(id=tattooer_id).one_or_none()
 
     # Validar si el tatuador existe
     if tattooer is None:
@@ -242,23 +419,91 @@ def get_tattooer_profile(tattooer_id):
     if tattooer.profile is None:
         return jsonify({'mensaje': f'El usuario con ID {tattooer_id} no tiene un perfil registrado'}), 404
 
-    # Convertir `social_media` de string a JSON si es necesario
-    social_media = json.loads(tattooer.profile.social_media) if tattooer.profile.social_media else {}
+    return jsonify(_tattooer_profile_data(tattooer, fields)), 200
+
+
+def _parse_location(data):
+    # latitude y longitude van juntas; ambas ausentes o null dejan el perfil sin ubicacion
+    latitude, longitude = data.get('latitude'), data.get('longitude')
+    if latitude is None and longitude is None:
+        return None, None
+    valid = all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in (latitude, longitude))
+    if not valid or not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise APIException('latitude (-90 a 90) y longitude (-180 a 180) deben ser números', status_code=400)
+    return float(latitude), float(longitude)
 
+
+def _tattooer_profile_data(tattooer, fields=None):
     # Estructurar la respuesta con la información relevante del tatuador y su perfil
-    tattooer_data = {
-        'id': tattooer.id,
-        'name': tattooer.name,
-        'username': tattooer.username,
-        'email': tattooer.email,
-        'bio': tattooer.profile.bio,
-        'social_media': social_media,  
-        'profile_picture': tattooer.profile.profile_picture,
-        'ranking': tattooer.profile.ranking,
-        'created_at': tattooer.created_at
-    }
+    # (solo los campos pedidos: el resumen de ratings ni se consulta si no se pide)
+    tattooer_data = {}
+    for name in TATTOOER_PROFILE_FIELDS:
+        if fields is not None and name not in fields:
+            continue
+        if name == 'rating':
+            tattooer_data[name] = get_rating_summary(tattooer.id)
+        elif name == 'social_media':
+            # Columna JSON: ya viene como diccionario desde la bd
+            tattooer_data[name] = tattooer.profile.social_media or {}
+        elif name in ('bio', 'profile_picture', 'ranking'):
+            tattooer_data[name] = getattr(tattooer.profile, name)
+        else:
+            tattooer_data[name] = getattr(tattooer, name)
+    return tattooer_data
+
+
+# Tamaño de la primera pagina de posts y de reviews en la pagina de perfil
+PROFILE_PAGE_POSTS = 12
+PROFILE_PAGE_REVIEWS = 5
+
+
+#Pagina de perfil completa en una sola peticion: perfil, rating, primeros posts y ultimas reviews
+#Siempre son 4 consultas (usuario+perfil, resumen por PK, posts, reviews con su autor)
+@api.route('/profile/<int:tattooer_id>/page', methods=['GET'])
+def get_tattooer_profile_page(tattooer_id):
+    tattooer = db.session.scalars(
+        select(User).options(joinedload(User.profile)).where(User.id == tattooer_id)
+    ).one_or_none()
+    if tattooer is None:
+        return jsonify({'mensaje': f'No se encontró un tatuador con el ID {tattooer_id}'}), 404
+    if tattooer.profile is None:
+        return jsonify({'mensaje': f'El usuario con ID {tattooer_id} no tiene un perfil registrado'}), 404
+
+    profile_fields = set(TATTOOER_PROFILE_FIELDS) - {'rating'}
+    posts, posts_next_cursor = _posts_page(PROFILE_PAGE_POSTS, user_id=tattooer_id)
+
+    # Ultimas reviews con el username del autor en la misma consulta (ix_review_tattooer_id)
+    rows = db.session.execute(
+        select(Review, User.username)
+        .join(User, Review.user_id == User.id)
+        .where(Review.tattooer_id == tattooer_id)
+        .order_by(Review.id.desc())
+        .limit(PROFILE_PAGE_REVIEWS + 1)
+    ).all()
+    reviews_next_cursor = None
+    if len(rows) > PROFILE_PAGE_REVIEWS:
+        rows = rows[:PROFILE_PAGE_REVIEWS]
+        # Mismo cursor que GET /review/<id>?sort=newest para seguir paginando
+        reviews_next_cursor = encode_cursor([rows[-1][0].id])
+    reviews = [{**review.serialize(), 'author_username': username} for review, username in rows]
+
+    return jsonify({
+        'profile': _tattooer_profile_data(tattooer, profile_fields),
+        'rating': get_rating_summary(tattooer_id),
+        'posts': posts,
+        'posts_next_cursor': posts_next_cursor,
+        'reviews': reviews,
+        'reviews_next_cursor': reviews_next_cursor
+    }), 200
 
-    return jsonify(tattooer_data), 200
+
+#Siguientes paginas de posts de un tatuador (?cursor=posts_next_cursor&limit=12&fields=id,image,likes)
+@api.route('/profile/<int:tattooer_id>/posts', methods=['GET'])
+def get_tattooer_posts(tattooer_id):
+    fields = requested_fields(Post.SERIALIZE_FIELDS)
+    limit = min(max(request.args.get('limit', PROFILE_PAGE_POSTS, type=int), 1), MAX_PAGE_SIZE)
+    posts, next_cursor = _posts_page(limit, request.args.get('cursor'), fields, user_id=tattooer_id)
+    return jsonify({'posts': posts, 'next_cursor': next_cursor}), 200
 
 
 #Ruta para crear perfil:
@@ -272,7 +517,7 @@ def create_tattooer_profile():
             return jsonify({'mensaje': f'Falta el campo requerido: {field}'}), 400
 
     # Verificar si el email o username ya está registrado
-    existing_user = db.session.query(User).filter(
+    existing_user = db.session.query(User).execution_options(include_deleted=True).filter(
         (User.email == data['email']) | (User.username == data['username'])
     ).first()
     if existing_user:
@@ -281,6 +526,7 @@ def create_tattooer_profile():
     # Validar que `social_media` sea un objeto JSON válido
     if not isinstance(data['social_media'], dict):
         return jsonify({'mensaje': 'El campo social_media debe ser un objeto JSON válido'}), 400
+    latitude, longitude = _parse_location(data)
 
     # Crear nuevo usuario
     new_user = User(
@@ -288,7 +534,8 @@ def create_tattooer_profile():
         username=data['username'],
         email=data['email'],
         password=data['password'],
-        user_type='tattooer'
+        user_type=db.session.scalar(select(UserType).where(UserType.name == 'tattooer')),
+        created_at=datetime.utcnow()
     )
 
     db.session.add(new_user)
@@ -298,9 +545,12 @@ def create_tattooer_profile():
     new_profile = Profile(
         user_id=new_user.id,
         bio=data['bio'],
-        social_media=json.dumps(data['social_media']),  # Convertir JSON a string para almacenar
+        social_media=data['social_media'],  # Columna JSON: se guarda el objeto tal cual
         profile_picture=data.get('profile_picture', ''),  # Opcional, si no lo envían se guarda vacío
-        ranking=0  # Iniciar ranking en 0 por defecto
+        ranking=0,  # Iniciar ranking en 0 por defecto
+        category_id=data.get('category_id'),  # Opcional
+        latitude=latitude,  # Opcional: ubicacion del estudio para la busqueda por cercania
+        longitude=longitude
     )
 
     db.session.add(new_profile)
@@ -308,7 +558,7 @@ def create_tattooer_profile():
 
     return jsonify({
         'mensaje': 'Perfil creado exitosamente',
-        'user': new_user.serialize()
+        'user': _full_user(new_user.id).serialize()
     }), 201
 
 
@@ -335,11 +585,14 @@ def update_tattooer_profile(tattooer_id):
     if 'social_media' in data:
         if not isinstance(data['social_media'], dict):
             return jsonify({'mensaje': 'El campo social_media debe ser un objeto JSON válido'}), 400
-        profile.social_media = json.dumps(data['social_media'])  # Guardamos como JSON en la DB
+        profile.social_media = data['social_media']  # Guardamos como JSON en la DB
     if 'profile_picture' in data:
         profile.profile_picture = data['profile_picture']
     if 'ranking' in data:
         profile.ranking = data['ranking']
+    if 'latitude' in data or 'longitude' in data:
+        # El geohash del perfil se recalcula al asignar la ubicacion
+        profile.latitude, profile.longitude = _parse_location(data)
 
     # Guardar los cambios en la base de datos
     db.session.commit()
@@ -373,15 +626,58 @@ def delete_tattooer_profile(tattooer_id):
 
 """REVIEWS"""
 
-#obtener las reviews de un tatuador
-@api.route('/review/<int:tattoer_id>', methods=['GET']) 
+#obtener las reviews de un tatuador, paginadas con cursor (keyset)
+#?sort=newest|rating&limit=20&cursor=<next_cursor de la pagina anterior>&fields=id,rating
+@api.route('/review/<int:tattooer_id>', methods=['GET'])
 def get_review_by_tattoer(tattooer_id):
-#validar que exista un usuario con el tattooer_id que es el parametro que nos entregan
-    tattooer= db.session.query(User).filter_by(id=tattooer_id).one_or_none() #consulta si existe un usuario o no y lo guarda en la variable tattooer
-    if tattooer is None :
+    sort = request.args.get('sort', 'newest')
+    if sort not in ('newest', 'rating'):
+        return jsonify({'mensaje': 'sort debe ser newest o rating'}), 400
+    fields = requested_fields(Review.SERIALIZE_FIELDS)
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor')
+
+    #validar que exista un usuario con el tattooer_id que es el parametro que nos entregan
+    if db.session.get(User, tattooer_id) is None:
         return jsonify({'mensaje':f'no se encontro un usuario con el user_id {tattooer_id}'}),404
-    reviews = db.session.query(Review).filter_by(tattooer_id=tattooer_id).all() 
-    return jsonify(reviews),200
+
+    # Las columnas del cursor se leen aunque no se pidan. El join con el autor deja fuera
+    # las reviews de usuarios con soft delete, igual que la pagina de perfil y el resumen
+    query = select(Review).options(*sparse_options(Review, fields, required=('rating',) if sort == 'rating' else ())) \
+        .join(User, Review.user_id == User.id) \
+        .where(Review.tattooer_id == tattooer_id)
+    if sort == 'newest':
+        # El id crece con cada review: ordenar por id equivale a ordenar por fecha de creacion
+        if cursor:
+            (last_id,) = decode_cursor(cursor, (int,))
+            query = query.where(Review.id < last_id)
+        query = query.order_by(Review.id.desc())
+    else:
+        if cursor:
+            last_rating, last_id = decode_cursor(cursor, (int, int))
+            query = query.where(
+                (Review.rating < last_rating) | ((Review.rating == last_rating) & (Review.id < last_id))
+            )
+        query = query.order_by(Review.rating.desc(), Review.id.desc())
+
+    # Se pide una fila extra para saber si hay una pagina siguiente
+    reviews = db.session.scalars(query.limit(limit + 1)).all()
+    next_cursor = None
+    if len(reviews) > limit:
+        reviews = reviews[:limit]
+        last = reviews[-1]
+        next_cursor = encode_cursor([last.id] if sort == 'newest' else [last.rating, last.id])
+
+    return jsonify({
+        'reviews': [review.serialize(fields) for review in reviews],
+        'next_cursor': next_cursor,
+        'summary': get_rating_summary(tattooer_id)
+    }),200
+
+#resumen de ratings de un tatuador (histograma 1-5), lectura por clave primaria
+@api.route('/review/<int:tattooer_id>/summary', methods=['GET'])
+def get_review_summary(tattooer_id):
+    return jsonify(get_rating_summary(tattooer_id)),200
 
 #para que un usuario cree una  review a un tatuador
 @api.route('/review',methods=['POST'])
@@ -395,13 +691,17 @@ def create_review():
     tattooer= db.session.query(User).filter_by(id=data['tattooer_id']).one_or_none()
     if tattooer is None:
         return jsonify({"mensaje": f"no se encontró un usuario con el tattooer_id {data['tattooer_id']}"}), 404
+    rating = data.get('rating')
+    if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5:
+        return jsonify({"mensaje": "El rating debe ser un entero entre 1 y 5"}), 400
     
     #creo nueva instacia del review
     new_review=Review(
         description=data['description'],
-        rating=data['rating'],
+        rating=rating,
         user_id = data['user_id'],
-        tattooer_id=data['tattooer_id']
+        tattooer_id=data['tattooer_id'],
+        created_at=datetime.utcnow()
     )
     #asignar los datos del body a la instacia recien creada
     #new_review.description=data['description']
@@ -412,35 +712,105 @@ def create_review():
     db.session.add(new_review)
     db.session.commit()
     #devuelvo un codigo 201 con el review creado
-    return jsonify(new_review),201
-    
+    return jsonify(new_review.serialize()),201
+
+
+def _validate_bulk_reviews(items, current_user):
+    rows, errors = [], []
+    now = datetime.utcnow()
+    # Una sola consulta para comprobar que existen todos los tatuadores
+    tattooer_ids = {item.get('tattooer_id') for item in items if isinstance(item, dict)}
+    tattooer_ids = {tattooer_id for tattooer_id in tattooer_ids if isinstance(tattooer_id, int)}
+    existing = set(db.session.scalars(select(User.id).where(User.id.in_(tattooer_ids)))) if tattooer_ids else set()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not item.get('description') or 'rating' not in item or 'tattooer_id' not in item:
+            errors.append({"index": index, "mensaje": "Faltan datos requeridos (description, rating, tattooer_id)"})
+            continue
+        rating = item['rating']
+        if not isinstance(rating, int) or isinstance(rating, bool) or not 1 <= rating <= 5:
+            errors.append({"index": index, "mensaje": "El rating debe ser un entero entre 1 y 5"})
+            continue
+        if item['tattooer_id'] not in existing:
+            errors.append({"index": index, "mensaje": f"no se encontró un usuario con el tattooer_id {item['tattooer_id']}"})
+            continue
+        rows.append((index, {
+            "description": item['description'],
+            "rating": rating,
+            "user_id": current_user,
+            "tattooer_id": item['tattooer_id'],
+            "created_at": now
+        }))
+    return rows, errors
+
+
+def _after_bulk_reviews(rows):
+    # El histograma de ratings tampoco se entera del INSERT masivo
+    deltas = deltas_for_rows((row['tattooer_id'], row['rating']) for row in rows)
+    for statement in rating_delta_statements(db.engine.dialect.name, deltas):
+        db.session.execute(statement)
+
+
+#para que un usuario cree varias reviews en una sola peticion
+@api.route('/review/bulk', methods=['POST'])
+@jwt_required()
+def create_reviews_bulk():
+    return _bulk_insert('review/bulk', Review, _validate_bulk_reviews, _after_bulk_reviews)
+
 
 """NOTIFICACIONES"""
 
-#para obtener todas las notificaciones
+#para obtener las notificaciones, de la mas nueva a la mas vieja y paginadas con cursor
+#?limit=20&cursor=<next_cursor>&fields=id,message,is_read
+#&include_archived=1 sigue con las leidas ya archivadas (api/archive.py) en el mismo orden
 @api.route('/notifications',methods=['GET'])
 @jwt_required()
 def get_all_notifications():
         current_user = get_jwt_identity()
-        notifications = db.session.query(Notification).filter_by(user_id=current_user).all()
+        fields = requested_fields(Notification.SERIALIZE_FIELDS)
+        limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+        query = select(Notification).options(*sparse_options(Notification, fields)) \
+            .where(Notification.user_id == current_user)
+        cursor = request.args.get('cursor')
+        last_id = None
+        if cursor:
+            (last_id,) = decode_cursor(cursor, (int,))
+            query = query.where(Notification.id < last_id)
+        # El id crece con cada notificacion: ix_notification_user_id ya entrega este orden
+        notifications = [
+            (notification.id, notification.serialize(fields))
+            for notification in db.session.scalars(query.order_by(Notification.id.desc()).limit(limit + 1))
+        ]
+        if request.args.get('include_archived') in ('1', 'true'):
+            # Se mezclan por id con las archivadas: el cursor sirve igual para las dos tablas
+            notifications = sorted(notifications + archived_page(current_user, limit + 1, last_id, fields),
+                                   key=lambda pair: pair[0], reverse=True)[:limit + 1]
          # Si no hay notificaciones, devolver un mensaje vacío
         if not notifications:
             return jsonify({"mensaje": "No hay notificaciones disponibles",'notifications':[]}), 404
+        next_cursor = None
+        if len(notifications) > limit:
+            notifications = notifications[:limit]
+            next_cursor = encode_cursor([notifications[-1][0]])
     # Convertir la lista de notificaciones en JSON
-        notifications_json = [notification.serialize() for notification in notifications]
-        return jsonify({"success": True, "notifications": notifications_json}), 200
+        notifications_json = [notification for _, notification in notifications]
+        return jsonify({"success": True, "notifications": notifications_json, "next_cursor": next_cursor}), 200
 
 #obtener una notificacion por id 
 @api.route('/notification/<int:notification_id>',methods= ['GET'])
 @jwt_required()
 def get_notification_by_id(notification_id):
         current_user= get_jwt_identity()
-        notification = db.session.query(Notification).filter_by(id=notification_id,user_id=current_user).one_or_none()
+        fields = requested_fields(Notification.SERIALIZE_FIELDS)
+        notification = db.session.query(Notification).options(*sparse_options(Notification, fields, required=('user_id',))) \
+            .filter_by(id=notification_id,user_id=current_user).one_or_none()
+        if notification is not None:
+            return jsonify(notification.serialize(fields)), 200
+    # Las leidas y viejas ya no estan en la tabla: se buscan en el archivo
+        archived = find_archived(current_user, notification_id, fields)
     # Si no se encuentra, devolver un error 404
-        if notification is None:
+        if archived is None:
             return jsonify({"mensaje": f"No se encontró la notificación con el ID {notification_id}"}), 404
-    # Si se encuentra, devolver la notificación en formato JSON
-        return jsonify(notification), 200
+        return jsonify(archived), 200
 
 #para marcar como leida una notificacion
 @api.route('/notifcation/<int:notification_id>/readed',methods=['PUT'])
@@ -448,6 +818,9 @@ def get_notification_by_id(notification_id):
 def set_notification_readed(notification_id):
     current_id = get_jwt_identity()
     notification = db.session.query(Notification).filter_by(id=notification_id,user_id=current_id).one_or_none()
+    if notification is None and find_archived(current_id, notification_id, {'id'}) is not None:
+        # Solo se archivan notificaciones leidas
+        return jsonify({"success": True, "mensaje": "Notificación marcada como leída"}), 200
         # Si la notificación no existe, devolver un error 404
     if notification is None:
         return jsonify({"mensaje": f"No se encontró la notificación con el ID {notification_id}"}), 404
@@ -467,12 +840,15 @@ def create_notification():
     if "mensaje" not in data or "user_id" not in data:
         return jsonify({"mensaje": "Faltan datos requeridos (mensaje, user_id)"}), 400
     # Crear una nueva instancia de Notificación
+    now = datetime.utcnow()
     new_notification = Notification(
-        menssage=data["mensaje"],
+        message=data["mensaje"],
         user_id=data["user_id"],
         is_read=False, # Inicialmente la notificación no está leída
-        date =datetime.utcnow(),
-        sender_id =current_user
+        type=data.get("type", "general"),
+        date=now,
+        sender_id =current_user,
+        created_at=now
     )
     # Guardar en la base de datos
     db.session.add(new_notification)
@@ -483,33 +859,195 @@ def create_notification():
 
 """HOME"""
 
-# Categorías: obtiene todos los perfiles de una categoría determinada.
+# Categorías: obtiene los perfiles de una categoría determinada, paginados con cursor.
+#?limit=20&cursor=<next_cursor>&fields=id,bio
 @api.route('/profiles/category/<string:category>', methods=['GET'])
 def get_profiles_by_category(category):
-
-    profiles = db.session.query(Profile).filter_by(category=category).all()
+    fields = requested_fields(Profile.SERIALIZE_FIELDS)
+    limit = min(max(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+    # La categoria llega por nombre: se filtra con un join en lugar de cargar la categoria aparte
+    query = select(Profile).options(*sparse_options(Profile, fields)) \
+        .join(Category, Profile.category_id == Category.id).where(Category.name == category)
+    cursor = request.args.get('cursor')
+    if cursor:
+        (last_id,) = decode_cursor(cursor, (int,))
+        query = query.where(Profile.id > last_id)
+    profiles = db.session.scalars(query.order_by(Profile.id).limit(limit + 1)).all()
     if not profiles:
         return jsonify({"mensaje": f"No se encontraron perfiles para la categoría '{category}'"}), 404
-    result = [profile.serialize() for profile in profiles]
-    return jsonify(result), 200
+    next_cursor = None
+    if len(profiles) > limit:
+        profiles = profiles[:limit]
+        next_cursor = encode_cursor([profiles[-1].id])
+    result = [profile.serialize(fields) for profile in profiles]
+    return jsonify({'profiles': result, 'next_cursor': next_cursor}), 200
 
 
 # Top Likes: obtiene los posts con más likes.
 @api.route('/posts/top-likes', methods=['GET'])
+@coalesced(HOT_READ_TTL, HOT_READ_STALE)
 def get_top_likes_posts():
     # Se obtienen los posts ordenados por likes en forma descendente
-    posts = db.session.query(Post).order_by(Post.likes.desc()).limit(5).all()
-    result = [post.serialize() for post in posts]
+    fields = requested_fields(Post.SERIALIZE_FIELDS)
+    posts = db.session.query(Post).options(*sparse_options(Post, fields, required=('likes',))) \
+        .order_by(Post.likes.desc()).limit(5).all()
+    result = [post.serialize(fields) for post in posts]
     return jsonify(result), 200
 
 
 # Top Tatuadores: obtiene los perfiles con mejores evaluaciones.
 @api.route('/profiles/top-tattooer', methods=['GET'])
+@coalesced(HOT_READ_TTL, HOT_READ_STALE)
 def get_top_tattooer():
     # Se obtienen los perfiles ordenados por ranking en forma descendente, limitando a 10 resultados
-    profiles = db.session.query(Profile).order_by(Profile.ranking.desc()).limit(10).all()
-    result = [profile.serialize() for profile in profiles]
+    fields = requested_fields(Profile.SERIALIZE_FIELDS)
+    profiles = db.session.query(Profile).options(*sparse_options(Profile, fields, required=('ranking',))) \
+        .order_by(Profile.ranking.desc()).limit(10).all()
+    result = [profile.serialize(fields) for profile in profiles]
+    return jsonify(result), 200
+
+
+# Tatuadores cerca: ?lat=-33.45&lng=-70.66 y ademas
+#   radius_km=10 (todos dentro del radio, hasta limit) o k=20 (los k mas cercanos)
+#   category=<nombre>, min_ranking=3, fields=id,bio
+@api.route('/profiles/nearby', methods=['GET'])
+def get_nearby_profiles():
+    latitude = request.args.get('lat', type=float)
+    longitude = request.args.get('lng', type=float)
+    if latitude is None or longitude is None or not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        return jsonify({"mensaje": "lat y lng son requeridos y deben ser coordenadas válidas"}), 400
+    radius_km = request.args.get('radius_km', type=float)
+    if radius_km is not None and not 0 < radius_km <= MAX_RADIUS_KM:
+        return jsonify({"mensaje": f"radius_km debe estar entre 0 y {MAX_RADIUS_KM:g}"}), 400
+    limit = min(max(request.args.get('k', request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), type=int), 1), MAX_PAGE_SIZE)
+    fields = requested_fields(Profile.SERIALIZE_FIELDS)
+
+    criteria = []
+    category = request.args.get('category')
+    if category is not None:
+        category_id = db.session.scalar(select(Category.id).where(Category.name == category))
+        if category_id is None:
+            return jsonify({"mensaje": f"No existe la categoría '{category}'"}), 404
+        criteria.append(Profile.category_id == category_id)
+    min_ranking = request.args.get('min_ranking', type=int)
+    if min_ranking is not None:
+        criteria.append(Profile.ranking >= min_ranking)
+
+    # El indice geohash entrega los ids mas cercanos; luego se cargan solo esos perfiles
+    hits = nearest(latitude, longitude, limit, radius_km or MAX_RADIUS_KM, criteria)
+    profiles = {
+        profile.id: profile for profile in db.session.scalars(
+            select(Profile).options(*sparse_options(Profile, fields))
+            .where(Profile.id.in_([profile_id for profile_id, _ in hits]))
+        )
+    }
+    result = [
+        {**profiles[profile_id].serialize(fields), 'distance_km': round(distance, 3)}
+        for profile_id, distance in hits if profile_id in profiles
+    ]
     return jsonify(result), 200
 
 
+"""RECOMENDACIONES"""
+
+def _recommended_posts(ranked, fields=None):
+    # Una consulta por clave primaria para los k posts; los eliminados quedan fuera
+    posts = {
+        post.id: post for post in db.session.scalars(
+            select(Post).options(*sparse_options(Post, fields))
+            .where(Post.id.in_([post_id for post_id, _ in ranked]))
+        )
+    }
+    return [{**posts[post_id].serialize(fields), 'score': score} for post_id, score in ranked if post_id in posts]
+
+
+def _recommended_tattooers(ranked, fields=None):
+    profiles = {
+        profile.user_id: profile for profile in db.session.scalars(
+            select(Profile).options(*sparse_options(Profile, fields, required=('user_id',)))
+            .where(Profile.user_id.in_([tattooer_id for tattooer_id, _ in ranked]))
+        )
+    }
+    return [
+        {**profiles[tattooer_id].serialize(fields), 'tattooer_id': tattooer_id, 'score': score}
+        for tattooer_id, score in ranked if tattooer_id in profiles
+    ]
+
+
+# Listas top-k precalculadas (api/recommendations.py), cada lectura es O(k):
+#   ?post_id=12       posts parecidos a un post (fields= de Post)
+#   ?tattooer_id=5    tatuadores parecidos a un tatuador (fields= de Profile)
+#   sin ids, con token: posts y tatuadores que le pueden gustar al usuario
+@api.route('/recommendations', methods=['GET'])
+@jwt_required(optional=True)
+def get_recommendations():
+    k = min(max(request.args.get('k', DEFAULT_PAGE_SIZE, type=int), 1), TOP_K)
+    post_id = request.args.get('post_id', type=int)
+    tattooer_id = request.args.get('tattooer_id', type=int)
+    if post_id is not None:
+        fields = requested_fields(Post.SERIALIZE_FIELDS)
+        return jsonify({"posts": _recommended_posts(similar_items('post', post_id, k), fields)}), 200
+    if tattooer_id is not None:
+        fields = requested_fields(Profile.SERIALIZE_FIELDS)
+        return jsonify({"tattooers": _recommended_tattooers(similar_items('tattooer', tattooer_id, k), fields)}), 200
+
+    current_user = get_jwt_identity()
+    if current_user is None:
+        return jsonify({"mensaje": "Indica post_id o tattooer_id, o inicia sesión para ver recomendaciones"}), 400
+    return jsonify({
+        "posts": _recommended_posts(posts_for_user(current_user, k)),
+        "tattooers": _recommended_tattooers(tattooers_for_user(current_user, k))
+    }), 200
+
+
+"""ESTADISTICAS"""
+
+# Maximo de buckets devueltos en una serie
+MAX_STATS_BUCKETS = 2000
+
+
+def _utc_param(name):
+    # Los buckets se guardan en UTC sin zona: una fecha con offset se convierte a ese formato
+    value = datetime.fromisoformat(request.args[name])
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# Series de tiempo leidas solo desde las tablas de rollup (ver api/rollups.py)
+@api.route('/stats', methods=['GET'])
+def get_stats():
+    metric = request.args.get('metric', 'likes')
+    granularity = request.args.get('granularity', 'day')
+    if metric not in ('likes', 'posts', 'reviews'):
+        return jsonify({"mensaje": "metric debe ser likes, posts o reviews"}), 400
+    if granularity not in GRANULARITIES:
+        return jsonify({"mensaje": "granularity debe ser hour o day"}), 400
+    try:
+        end = _utc_param('end') if 'end' in request.args else datetime.utcnow()
+        start = _utc_param('start') if 'start' in request.args else end - timedelta(days=30)
+    except ValueError:
+        return jsonify({"mensaje": "start y end deben ser fechas ISO 8601"}), 400
+    step = timedelta(hours=1) if granularity == 'hour' else timedelta(days=1)
+    if start > end or (end - start) / step > MAX_STATS_BUCKETS:
+        return jsonify({"mensaje": f"El rango pedido supera {MAX_STATS_BUCKETS} buckets"}), 400
+    dimension_id = request.args.get('dimension_id', type=int)
+
+    series = []
+    for bucket, count, total in query_series(metric, granularity, start, end, dimension_id):
+        point = {"bucket": bucket.isoformat(), "count": count}
+        if metric == 'reviews':
+            point["rating_sum"] = total
+            point["rating_average"] = round(total / count, 2) if count else None
+        series.append(point)
+    return jsonify({
+        "metric": metric,
+        "granularity": granularity,
+        "dimension_id": dimension_id,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "series": series
+    }), 200
+
+
 """BUSCADOR"""
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+Request coalescing (single-flight) with stale-while-revalidate for hot public reads.
+
+When a post goes viral the same GET arrives many times at once. Routes decorated with
+`@coalesced(ttl, stale)` share one computation per key (path plus sorted query string)
+inside the worker: the first request runs the view, the concurrent ones wait for it and
+reuse its serialized bytes, and the result is kept for `ttl` seconds. After that, and
+for `stale` more seconds, the cached bytes are still served while a single background
+refresh runs, so an expiry never sends every waiting request to the database at once.
+
+Only for routes whose response does not depend on the user (no JWT). The cache lives in
+`app.extensions['singleflight']` and is per process; writes in this worker drop their
+keys with `invalidate(path)`, other workers catch up when `ttl` runs out.
+"""
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, copy_current_request_context
+
+# Cuanto espera una peticion al calculo en curso antes de hacer el suyo propio
+WAIT_SECONDS = 10
+
+
+class _Entry:
+    __slots__ = ('body', 'status', 'mimetype', 'fresh_until', 'stale_until')
+
+    def __init__(self, response, ttl, stale):
+        now = time.monotonic()
+        self.body = response.get_data()
+        self.status = response.status_code
+        self.mimetype = response.mimetype
+        self.fresh_until = now + ttl
+        self.stale_until = now + ttl + stale
+
+
+class _Flight:
+    __slots__ = ('done', 'entry')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+
+
+class SingleFlight:
+    """
+    Per-process cache of serialized responses plus the calculations in flight. Holds at
+    most `max_entries` keys (least recently used are dropped first).
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._flights = {}
+
+    def get(self, key, compute, ttl, stale, refresh=None):
+        """
+        Returns the _Entry for `key`, calling `compute()` (which returns a Response) at
+        most once at a time per key. `refresh` is the callable used for the background
+        revalidation of a stale entry; by default `compute`.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.fresh_until:
+                self._entries.move_to_end(key)
+                return entry
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            if entry is not None and now < entry.stale_until:
+                # Vencida pero usable: se responde ya y solo el lider la refresca
+                if leader:
+                    threading.Thread(target=self._run, args=(key, refresh or compute, flight, ttl, stale),
+                                     daemon=True).start()
+                return entry
+        if leader:
+            return self._run(key, compute, flight, ttl, stale)
+        if flight.done.wait(WAIT_SECONDS) and flight.entry is not None:
+            return flight.entry
+        # El lider fallo o tarda demasiado: esta peticion no queda colgada de el
+        return _Entry(compute(), ttl, stale)
+
+    def _run(self, key, compute, flight, ttl, stale):
+        try:
+            flight.entry = _Entry(compute(), ttl, stale)
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                # Solo se guardan respuestas exitosas; un 404 se comparte pero no se retiene
+                if flight.entry is not None and flight.entry.status == 200:
+                    self._entries[key] = flight.entry
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            flight.done.set()
+        return flight.entry
+
+    def invalidate(self, path):
+        # Todas las variantes de query string de la ruta
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == path]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _key():
+    return request.path, tuple(sorted(request.args.items(multi=True)))
+
+
+def coalesced(ttl, stale):
+    """
+    Route decorator: concurrent identical requests share one execution of the view and
+    its serialized response, fresh for `ttl` seconds and served stale (while one
+    background refresh runs) for `stale` more. Without a SingleFlight in the app's
+    extensions the view runs as usual.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            flights = current_app.extensions.get('singleflight')
+            if flights is None:
+                return view(*args, **kwargs)
+
+            def compute():
+                return current_app.make_response(view(*args, **kwargs))
+
+            # El refresco en segundo plano corre en su propio hilo con una copia de la peticion
+            @copy_current_request_context
+            def refresh():
+                return compute()
+
+            entry = flights.get(_key(), compute, ttl, stale, refresh)
+            return current_app.response_class(entry.body, status=entry.status, mimetype=entry.mimetype)
+        return wrapper
+    return decorator
+
+
+def invalidate(path):
+    flights = current_app.extensions.get('singleflight')
+    if flights is not None:
+        flights.invalidate(path)
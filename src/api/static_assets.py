@@ -0,0 +1,200 @@
+"""
+Serving of the built front end (public/).
+
+At startup the app builds a manifest of public/ (size, mtime, content hash and the
+precompressed .br/.gz variants next to each file), so serving a request is a dict
+lookup instead of filesystem calls, and unknown paths fall back to index.html (SPA)
+without touching the disk. Files go out through send_file, which uses the server's
+wsgi.file_wrapper (sendfile under gunicorn) and answers Range / If-None-Match.
+
+Precompress with `flask compress-assets` after `npm run build`.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+from flask import request, send_file, abort
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin el modulo solo se generan variantes .gz
+    brotli = None
+
+# Extension de cada variante precomprimida, en orden de preferencia
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+# Solo vale la pena comprimir texto; imagenes y fuentes ya vienen comprimidas
+COMPRESSIBLE = {'.js', '.css', '.html', '.json', '.svg', '.txt', '.map', '.ico', '.xml'}
+MIN_COMPRESS_SIZE = 1024
+
+# Archivos con huella de contenido en el nombre (bundle.3f9a12bc.js) nunca cambian
+FINGERPRINT = re.compile(r'\.[0-9a-f]{8,}\.')
+IMMUTABLE_MAX_AGE = 31536000
+
+HASH_CHUNK = 1024 * 1024
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:20]
+
+
+class Asset:
+    __slots__ = ('path', 'size', 'mtime', 'etag', 'mimetype', 'immutable', 'variants')
+
+    def __init__(self, path, name):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.etag = _file_hash(path)
+        self.mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.immutable = bool(FINGERPRINT.search(name))
+        self.find_variants()
+
+    def find_variants(self):
+        # Una variante mas vieja que el original quedo de un build anterior: se ignora
+        self.variants = {}
+        for encoding, suffix in ENCODINGS.items():
+            variant = self.path + suffix
+            if os.path.isfile(variant) and os.stat(variant).st_mtime >= self.mtime:
+                self.variants[encoding] = variant
+
+
+class AssetManifest:
+    """
+    Maps every URL path under `root` to its Asset. With `reload=True` (development)
+    an entry is re-read when the file on disk changed, and new files are picked up when
+    a directory changed; only new or modified files are hashed again.
+    """
+    def __init__(self, root, reload=False):
+        self.root = os.path.realpath(root)
+        self.reload = reload
+        self.assets = {}
+        self.directories = {}
+        self.build()
+
+    def build(self):
+        assets, directories = {}, {}
+        if os.path.isdir(self.root):
+            for directory, _, files in os.walk(self.root):
+                directories[directory] = os.stat(directory).st_mtime
+                for filename in files:
+                    if os.path.splitext(filename)[1] in ENCODINGS.values():
+                        continue
+                    path = os.path.join(directory, filename)
+                    name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                    asset = self.assets.get(name)
+                    if asset is None or self._changed(asset):
+                        asset = Asset(path, name)
+                    else:
+                        # Mismo archivo: se conserva el hash, solo se revisan las variantes .gz/.br
+                        asset.find_variants()
+                    assets[name] = asset
+        self.assets = assets
+        self.directories = directories
+
+    def get(self, name):
+        asset = self.assets.get(name)
+        if not self.reload:
+            return asset
+        # Una ruta del SPA no es un archivo: solo se vuelve a recorrer public/ si algo cambio
+        if (asset is not None and self._changed(asset)) or (asset is None and self._tree_changed()):
+            self.build()
+            asset = self.assets.get(name)
+        return asset
+
+    def _tree_changed(self):
+        # Crear, borrar o renombrar un archivo cambia el mtime de su directorio
+        if not self.directories:
+            return os.path.isdir(self.root)
+        for directory, mtime in self.directories.items():
+            try:
+                if os.stat(directory).st_mtime != mtime:
+                    return True
+            except FileNotFoundError:
+                return True
+        return False
+
+    @staticmethod
+    def _changed(asset):
+        try:
+            return os.stat(asset.path).st_mtime != asset.mtime
+        except FileNotFoundError:
+            return True
+
+
+def send_asset(manifest, name, fallback='index.html'):
+    asset = manifest.get(name)
+    if asset is None:
+        # Rutas del SPA (react-router): se decide con el manifiesto, sin stat()
+        asset = manifest.get(fallback)
+    if asset is None:
+        abort(404)
+
+    encoding = None
+    if asset.variants:
+        candidates = [encoding for encoding in ENCODINGS if encoding in asset.variants]
+        best = request.accept_encodings.best_match(candidates + ['identity'], default='identity')
+        if best in asset.variants:
+            encoding = best
+
+    path = asset.variants[encoding] if encoding else asset.path
+    response = send_file(
+        path,
+        mimetype=asset.mimetype,
+        conditional=True,
+        etag=f'{asset.etag}-{encoding}' if encoding else asset.etag,
+        last_modified=asset.mtime,
+        max_age=IMMUTABLE_MAX_AGE if asset.immutable else 0,
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if asset.variants:
+        response.vary.add('Accept-Encoding')
+    if asset.immutable:
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        # Sin huella en el nombre: el navegador revalida con el ETag (respuesta 304)
+        response.cache_control.no_cache = True
+    return response
+
+
+def precompress(root, log=print):
+    """
+    Writes .gz (and .br when the brotli module is installed) next to every compressible
+    file of `root` that does not have an up-to-date variant. Returns files written.
+    """
+    written = 0
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            extension = os.path.splitext(filename)[1]
+            if extension not in COMPRESSIBLE:
+                continue
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            if stat.st_size < MIN_COMPRESS_SIZE:
+                continue
+            for encoding, suffix in ENCODINGS.items():
+                target = path + suffix
+                if encoding == 'br' and brotli is None:
+                    continue
+                if os.path.isfile(target) and os.stat(target).st_mtime >= stat.st_mtime:
+                    continue
+                if encoding == 'br':
+                    with open(path, 'rb') as source, open(target, 'wb') as out:
+                        out.write(brotli.compress(source.read(), quality=11))
+                else:
+                    # mtime=0: la salida es la misma en cada build para el mismo archivo
+                    with open(path, 'rb') as source, open(target, 'wb') as raw:
+                        with gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=9, mtime=0) as out:
+                            shutil.copyfileobj(source, out)
+                written += 1
+                log(f'{os.path.relpath(target, root)} written')
+    return written
@@ -0,0 +1,59 @@
+"""
+Job handlers run by `flask worker` (see api/jobs.py). Routes only enqueue by name:
+    enqueue('purge-deleted', dedupe_key='purge-deleted')
+"""
+from api.jobs import job
+from api.purge import purge_deleted
+from api.rollups import refresh_rollups
+from api.ratings import rebuild_rating_summaries
+from api.cdc import prune_events
+from api.models import db, IdempotencyKey
+from api.utils import prune_idempotent_responses, IDEMPOTENCY_KEY_TTL_HOURS
+from api.recommendations import refresh_recommendations, rebuild_recommendations
+from api.archive import archive_notifications, ARCHIVE_AFTER_DAYS
+
+
+def _quiet(*args):
+    pass
+
+
+# Una sola purga a la vez: dos procesos borrarian los mismos lotes
+@job('purge-deleted', concurrency=1, timeout=1800)
+def purge_deleted_job(batch_size=500):
+    purge_deleted(batch_size=batch_size, log=_quiet)
+
+
+@job('refresh-rollups', concurrency=1, timeout=900)
+def refresh_rollups_job(batch_size=5000):
+    refresh_rollups(batch_size=batch_size, log=_quiet)
+
+
+@job('rebuild-rating-summaries', concurrency=1, timeout=1800, max_attempts=3)
+def rebuild_rating_summaries_job():
+    rebuild_rating_summaries()
+
+
+@job('cdc-prune', concurrency=1, timeout=600)
+def cdc_prune_job(batch_size=5000):
+    prune_events(batch_size=batch_size)
+
+
+@job('idempotency-prune', concurrency=1, timeout=600)
+def idempotency_prune_job(hours=IDEMPOTENCY_KEY_TTL_HOURS, batch_size=5000):
+    prune_idempotent_responses(db.session, IdempotencyKey, hours=hours, batch_size=batch_size)
+
+
+# Consumidor CDC: una sola instancia para no recalcular las mismas listas en paralelo
+@job('refresh-recommendations', concurrency=1, timeout=900)
+def refresh_recommendations_job(batch_size=500):
+    refresh_recommendations(batch_size=batch_size)
+
+
+@job('rebuild-recommendations', concurrency=1, timeout=3600, max_attempts=3)
+def rebuild_recommendations_job():
+    rebuild_recommendations(log=_quiet)
+
+
+@job('archive-notifications', concurrency=1, timeout=1800)
+def archive_notifications_job(days=ARCHIVE_AFTER_DAYS, batch_size=1000):
+    archive_notifications(days=days, batch_size=batch_size, log=_quiet)
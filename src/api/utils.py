@@ -1,4 +1,15 @@
-from flask import jsonify, url_for
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime, timedelta
+from flask import jsonify, url_for, request
+from sqlalchemy import select, delete
+from sqlalchemy.orm import load_only, selectinload, joinedload
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+# Tiempo minimo que un cliente puede reintentar con la misma Idempotency-Key
+IDEMPOTENCY_KEY_TTL_HOURS = 24
 
 class APIException(Exception):
     status_code = 400
@@ -15,6 +26,134 @@ class APIException(Exception):
         rv['message'] = self.message
         return rv
 
+def request_fingerprint(data):
+    # Hash estable del body para detectar una Idempotency-Key reutilizada con otro contenido
+    raw = json.dumps(data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def find_idempotent_response(session, model, key, user_id, endpoint, fingerprint):
+    """
+    Returns (body, status_code) stored for this Idempotency-Key, or None if the key is new.
+    Raises APIException when the key was already used with a different endpoint or body.
+    """
+    record = session.query(model).filter_by(key=key, user_id=user_id).one_or_none()
+    if record is None:
+        return None
+    if record.endpoint != endpoint or record.request_hash != fingerprint:
+        raise APIException('La Idempotency-Key ya se usó con una petición distinta', status_code=422)
+    return record.response, record.status_code
+
+def store_idempotent_response(session, model, key, user_id, endpoint, fingerprint, body, status_code):
+    # Se agrega a la misma transaccion que las filas insertadas: o se guarda todo o nada
+    session.add(model(
+        key=key,
+        user_id=user_id,
+        endpoint=endpoint,
+        request_hash=fingerprint,
+        response=body,
+        status_code=status_code,
+        created_at=datetime.utcnow()
+    ))
+
+def prune_idempotent_responses(session, model, hours=IDEMPOTENCY_KEY_TTL_HOURS, batch_size=5000):
+    """
+    Deletes the stored responses older than `hours`, in bounded batches. A retry with
+    an expired key runs as a new request. Returns the number of keys removed.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    removed = 0
+    while True:
+        ids = select(model.id).where(model.created_at < cutoff).order_by(model.id).limit(batch_size)
+        count = session.execute(delete(model).where(model.id.in_(ids))).rowcount
+        session.commit()
+        removed += count
+        if count < batch_size:
+            return removed
+
+def increment_upsert(dialect_name, table, index_elements, increment_columns):
+    """
+    INSERT statement that, when the row identified by `index_elements` already exists,
+    adds the inserted values of `increment_columns` to it (ON CONFLICT / ON DUPLICATE KEY).
+    Execute it with one parameter set or many (executemany).
+    """
+    if dialect_name == 'mysql':
+        statement = mysql.insert(table)
+        return statement.on_duplicate_key_update(
+            {column: table.c[column] + statement.inserted[column] for column in increment_columns}
+        )
+    dialect = postgresql if dialect_name == 'postgresql' else sqlite
+    statement = dialect.insert(table)
+    return statement.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: table.c[column] + statement.excluded[column] for column in increment_columns}
+    )
+
+def encode_cursor(values):
+    # Cursor opaco para paginacion keyset: los valores de orden de la ultima fila
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(token, types=None):
+    """
+    Values stored by encode_cursor. With `types`, one per value (e.g. (int,) or
+    (int, int)), the shape is checked too: a cursor edited by hand is a 400, not a 500.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, binascii.Error):
+        raise APIException('Cursor inválido', status_code=400)
+    if types is not None and not (
+        isinstance(values, list) and len(values) == len(types)
+        # bool es subclase de int, pero true no es un id
+        and all(isinstance(value, kind) and not isinstance(value, bool) for value, kind in zip(values, types))
+    ):
+        raise APIException('Cursor inválido', status_code=400)
+    return values
+
+def _split_param(name):
+    raw = request.args.get(name)
+    if raw is None:
+        return None
+    return {value.strip() for value in raw.split(',') if value.strip()}
+
+def requested_fields(allowed):
+    """
+    Reads `?fields=a,b`, checking every name against `allowed` (usually a model's
+    SERIALIZE_FIELDS). Returns None when absent, meaning every field.
+    """
+    fields = _split_param('fields')
+    if fields is None:
+        return None
+    unknown = fields - set(allowed)
+    if unknown:
+        raise APIException(f"Campos desconocidos: {', '.join(sorted(unknown))}", status_code=400)
+    return fields
+
+def requested_includes(allowed):
+    # `?include=profile,posts` para las relaciones anidadas (SERIALIZE_RELATIONS del modelo)
+    include = _split_param('include')
+    if include is None:
+        return None
+    unknown = include - set(allowed)
+    if unknown:
+        raise APIException(f"Relaciones desconocidas: {', '.join(sorted(unknown))}", status_code=400)
+    return include
+
+def sparse_options(model, fields, include=None, required=()):
+    """
+    Loader options that narrow the SELECT to the requested columns (plus the primary key
+    and `required`, e.g. keyset sort columns) and eager-load the included relationships:
+    to-one relations in the same query (JOIN), collections with one query each.
+    """
+    options = []
+    if fields is not None:
+        columns = {'id', *fields, *required}
+        options.append(load_only(*[getattr(model, name) for name in sorted(columns)]))
+    for name in sorted(include or ()):
+        relation = getattr(model, name)
+        options.append(selectinload(relation) if relation.property.uselist else joinedload(relation))
+    return options
+
 def has_no_empty_params(rule):
     defaults = rule.defaults if rule.defaults is not None else ()
     arguments = rule.arguments if rule.arguments is not None else ()
@@ -2,22 +2,20 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
-from flask import Flask, request, jsonify, url_for, send_from_directory
-from flask_migrate import Migrate
-from flask_swagger import swagger
+import secrets
+from flask import Flask, jsonify, current_app
+from flask_jwt_extended import JWTManager
 from api.utils import APIException, generate_sitemap
 from api.models import db
 from api.routes import api
-from api.admin import setup_admin
-from api.commands import setup_commands
+from api.static_assets import AssetManifest, send_asset
+from api.singleflight import SingleFlight
 
 # from models import Person
 
 ENV = "development" if os.getenv("FLASK_DEBUG") == "1" else "production"
 static_file_dir = os.path.join(os.path.dirname(
     os.path.realpath(__file__)), '../public/')
-app = Flask(__name__)
-app.url_map.strict_slashes = False
 
 db_url = os.getenv("DATABASE_URL")
 
@@ -25,47 +23,98 @@ db_url = os.getenv("DATABASE_URL")
 
 db_url = "sqlite:///database.db"
 
-app.config['SQLALCHEMY_DATABASE_URI'] = db_url
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-MIGRATE = Migrate(app, db, compare_type=True)
-db.init_app(app)
+DEFAULT_CONFIG = {
+    'SQLALCHEMY_DATABASE_URI': db_url,
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    # Sin valor por defecto: una clave conocida permitiria firmar tokens de cualquier usuario
+    'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY'),
+    # Flask-Admin se puede apagar en los workers que no lo sirven (ENABLE_ADMIN=0)
+    'ENABLE_ADMIN': os.getenv('ENABLE_ADMIN', '1') == '1',
+    # Migrate y los comandos `flask ...` solo hacen falta en la linea de comandos
+    'ENABLE_CLI': True,
+    # Front compilado; en desarrollo el manifiesto se relee cuando cambia un archivo
+    'STATIC_ROOT': static_file_dir,
+    'STATIC_RELOAD': ENV == "development",
+    # Cola de jobs en SQLite local (api/jobs.py); por defecto instance/jobs.db
+    'JOBS_DATABASE': os.getenv('JOBS_DATABASE'),
+    # Respuestas cacheadas por worker para las lecturas calientes (api/singleflight.py)
+    'SINGLEFLIGHT_MAX_ENTRIES': int(os.getenv('SINGLEFLIGHT_MAX_ENTRIES', 1024)),
+    # Profiling bajo demanda (api/profiling.py): apagado si no hay token
+    'PROFILING_TOKEN': os.getenv('PROFILING_TOKEN'),
+    'PROFILING_DIR': os.getenv('PROFILING_DIR'),
+}
+
+
+def create_app(config=None):
+    """
+    Application factory. `config` overrides DEFAULT_CONFIG; the admin and CLI surfaces
+    are imported and registered only when enabled, so gunicorn workers skip them.
+    """
+    app = Flask(__name__)
+    app.url_map.strict_slashes = False
+    app.config.update(DEFAULT_CONFIG)
+    if config:
+        app.config.update(config)
+    if not app.config['JWT_SECRET_KEY']:
+        if not app.config.get('TESTING'):
+            raise RuntimeError('JWT_SECRET_KEY is not set; define it in .env or in the service environment')
+        # Los tests firman con una clave al azar por app
+        app.config['JWT_SECRET_KEY'] = secrets.token_hex(32)
+    if not app.config['JOBS_DATABASE']:
+        os.makedirs(app.instance_path, exist_ok=True)
+        app.config['JOBS_DATABASE'] = os.path.join(app.instance_path, 'jobs.db')
+
+    db.init_app(app)
+    JWTManager(app)
+    app.extensions['static_assets'] = AssetManifest(app.config['STATIC_ROOT'], reload=app.config['STATIC_RELOAD'])
+    app.extensions['singleflight'] = SingleFlight(app.config['SINGLEFLIGHT_MAX_ENTRIES'])
+
+    # add the admin
+    if app.config['ENABLE_ADMIN']:
+        from api.admin import setup_admin
+        setup_admin(app)
+
+    # add the profiling routes (only with PROFILING_TOKEN)
+    if app.config['PROFILING_TOKEN']:
+        from api.profiling import setup_profiling
+        setup_profiling(app)
+
+    # add the commands
+    if app.config['ENABLE_CLI']:
+        from flask_migrate import Migrate
+        from api.commands import setup_commands
+        Migrate(app, db, compare_type=True)
+        setup_commands(app)
+
+    # Add all endpoints form the API with a "api" prefix
+    app.register_blueprint(api, url_prefix='/api')
+
+    # Handle/serialize errors like a JSON object
+    app.register_error_handler(APIException, handle_invalid_usage)
+
+    app.add_url_rule('/', 'sitemap', sitemap)
+    app.add_url_rule('/<path:path>', 'serve_any_other_file', serve_any_other_file, methods=['GET'])
+    return app
 
-# add the admin
-setup_admin(app)
 
-# add the admin
-setup_commands(app)
-
-# Add all endpoints form the API with a "api" prefix
-app.register_blueprint(api, url_prefix='/api')
-
-# Handle/serialize errors like a JSON object
-
-
-@app.errorhandler(APIException)
 def handle_invalid_usage(error):
     return jsonify(error.to_dict()), error.status_code
 
 # generate sitemap with all your endpoints
 
 
-@app.route('/')
 def sitemap():
     if ENV == "development":
-        return generate_sitemap(app)
-    return send_from_directory(static_file_dir, 'index.html')
+        return generate_sitemap(current_app)
+    return send_asset(current_app.extensions['static_assets'], 'index.html')
 
 # any other endpoint will try to serve it like a static file
-@app.route('/<path:path>', methods=['GET'])
 def serve_any_other_file(path):
-    if not os.path.isfile(os.path.join(static_file_dir, path)):
-        path = 'index.html'
-    response = send_from_directory(static_file_dir, path)
-    response.cache_control.max_age = 0  # avoid cache memory
-    return response
+    # El manifiesto responde si el archivo existe; si no, se sirve index.html (SPA)
+    return send_asset(current_app.extensions['static_assets'], path)
 
 
 # this only runs if `$ python src/main.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3001))
-    app.run(host='0.0.0.0', port=PORT, debug=True)
+    create_app().run(host='0.0.0.0', port=PORT, debug=True)
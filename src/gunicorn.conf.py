@@ -0,0 +1,23 @@
+# Se carga con `gunicorn -c src/gunicorn.conf.py` (Procfile, render.yaml): gunicorn busca
+# gunicorn.conf.py en el directorio de arranque, antes de aplicar --chdir ./src/, asi que
+# sin -c este archivo se ignora (tests/test_deploy.py lo comprueba).
+# La app se construye una sola vez en el master y los workers la heredan por fork,
+# compartiendo sus paginas de memoria en modo copy-on-write.
+import gc
+
+preload_app = True
+
+
+def when_ready(server):
+    # La app ya fue importada: se congelan esos objetos para que el GC de cada
+    # worker no escriba en sus cabeceras y no fuerce copias de paginas compartidas
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Las conexiones del pool abiertas en el master no se pueden compartir entre
+    # procesos: cada worker descarta las heredadas sin cerrarlas y abre las suyas
+    from wsgi import application
+    from api.models import db
+    with application.app_context():
+        db.engine.dispose(close=False)
@@ -1,7 +1,10 @@
 # This file was created to run the application on heroku using gunicorn.
 # Read more about it here: https://devcenter.heroku.com/articles/python-gunicorn
 
-from app import app as application
+from app import create_app
+
+# Los workers web no necesitan Migrate ni los comandos de la CLI
+application = create_app({'ENABLE_CLI': False})
 
 if __name__ == "__main__":
     application.run()
@@ -0,0 +1,114 @@
+"""
+Query and latency budgets for the routes of the `api` blueprint.
+
+`BudgetClient` wraps the Flask test client. Every request counts the SQL statements
+sent to the database, the rows fetched back from it and the wall time, and fails the
+test when one of them goes over the endpoint's `Budget`:
+
+    client = BudgetClient(app)
+    client.get('/api/posts', Budget(statements=1, rows=21))
+
+Rows are counted at the DB-API cursor (sqlite3), so an unbounded `.all()` or a lazy
+load per row shows up even when the route only returns a few of them. The app must be
+created with `counting_engine_options()` as SQLALCHEMY_ENGINE_OPTIONS.
+"""
+import sqlite3
+import time
+from typing import NamedTuple
+from sqlalchemy import event
+
+
+class Budget(NamedTuple):
+    statements: int
+    rows: int
+    # Holgado: el test atrapa consultas que crecen con los datos, no ruido de la maquina
+    ms: float = 250.0
+
+
+class Usage(NamedTuple):
+    statements: int
+    rows: int
+    ms: float
+
+
+class CountingCursor(sqlite3.Cursor):
+    # Filas entregadas por el driver desde el ultimo reset (todas las conexiones)
+    fetched = 0
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            CountingCursor.fetched += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        CountingCursor.fetched += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        CountingCursor.fetched += len(rows)
+        return rows
+
+    def __next__(self):
+        row = super().__next__()
+        CountingCursor.fetched += 1
+        return row
+
+
+class CountingConnection(sqlite3.Connection):
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+
+def counting_engine_options():
+    # sqlite3.connect(factory=...) hace que SQLAlchemy use los cursores que cuentan filas
+    return {'connect_args': {'factory': CountingConnection}}
+
+
+class BudgetClient:
+    """
+    Test client whose requests take a Budget. `last` holds the Usage of the latest
+    request, so a test can also compare two requests.
+    """
+
+    def __init__(self, app, headers=None):
+        self.client = app.test_client()
+        self.headers = dict(headers or {})
+        self.last = None
+        self._statements = 0
+        with app.app_context():
+            from api.models import db
+            event.listen(db.engine, 'before_cursor_execute', self._count_statement)
+
+    def _count_statement(self, *args):
+        # Un executemany cuenta como una sola sentencia, igual que en la red
+        self._statements += 1
+
+    def request(self, method, path, budget, headers=None, **kwargs):
+        self._statements = 0
+        CountingCursor.fetched = 0
+        start = time.perf_counter()
+        response = self.client.open(path, method=method, headers={**self.headers, **(headers or {})}, **kwargs)
+        self.last = Usage(self._statements, CountingCursor.fetched, (time.perf_counter() - start) * 1000)
+
+        over = [
+            f'{name} {used:g} > {allowed:g}'
+            for name, used, allowed in zip(Budget._fields, self.last, budget)
+            if used > allowed
+        ]
+        assert not over, f'{method} {path} over budget: {", ".join(over)}'
+        return response
+
+    def get(self, path, budget, **kwargs):
+        return self.request('GET', path, budget, **kwargs)
+
+    def post(self, path, budget, **kwargs):
+        return self.request('POST', path, budget, **kwargs)
+
+    def put(self, path, budget, **kwargs):
+        return self.request('PUT', path, budget, **kwargs)
+
+    def delete(self, path, budget, **kwargs):
+        return self.request('DELETE', path, budget, **kwargs)
@@ -0,0 +1,205 @@
+"""
+Seeded apps for the budget suite, one per data scale.
+
+The dataset grows the way the marketplace does: more users, each with the same
+activity (posts, likes, reviews, notifications), except the popular tattooer the cases
+log in as, whose inbox gets a notification from every customer. A route whose cost
+depends on the size of a table (or of that inbox) instead of on the size of its
+response goes over budget at 10x.
+"""
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select, update, bindparam, func
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '../src'))
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+
+from app import create_app  # noqa: E402
+from api.models import db, UserType, User, Profile, Post, Likes, Review, Notification, Category  # noqa: E402
+from api.ratings import rebuild_rating_summaries  # noqa: E402
+from api.recommendations import rebuild_recommendations  # noqa: E402
+from api.rollups import refresh_rollups  # noqa: E402
+from api.archive import archive_notifications  # noqa: E402
+from api.utils import encode_cursor  # noqa: E402
+from budget import counting_engine_options  # noqa: E402
+
+SCALES = (1, 10)
+
+# Por unidad de escala
+TATTOOERS = 20
+CUSTOMERS = 100
+# Por usuario: constante en todas las escalas
+POSTS_PER_TATTOOER = 3
+LIKES_PER_CUSTOMER = 5
+REVIEWS_PER_CUSTOMER = 1
+NOTIFICATIONS_PER_USER = 3
+# Leidas hace meses: pasan al archivo (api/archive.py)
+ARCHIVED_PER_USER = 3
+
+PASSWORD = 'secret'
+CATEGORIES = ('realismo', 'blackwork', 'acuarela', 'tradicional')
+# Los estudios se reparten cerca de Santiago
+CENTER = (-33.45, -70.66)
+
+
+def _quiet(*args):
+    pass
+
+
+def seed(scale, rng):
+    """
+    Bulk-inserts the dataset and builds the derived tables (rating summaries,
+    recommendations, rollups). Returns the ids the test cases point at.
+    """
+    now = datetime.utcnow()
+    tattooers, customers = TATTOOERS * scale, CUSTOMERS * scale
+    db.session.execute(insert(UserType), [{'name': 'tattooer'}, {'name': 'customer'}])
+    db.session.execute(insert(Category), [
+        {'name': name, 'description': '', 'image': ''} for name in CATEGORIES
+    ])
+
+    users = []
+    for index in range(tattooers + customers):
+        is_tattooer = index < tattooers
+        users.append({
+            'id': index + 1, 'name': f'user {index + 1}', 'username': f'user{index + 1}',
+            'email': f'user{index + 1}@example.com', 'password': PASSWORD, 'notification_enabled': True,
+            'user_type_id': 1 if is_tattooer else 2, 'created_at': now - timedelta(days=60),
+        })
+    db.session.execute(insert(User), users)
+    tattooer_ids = [user['id'] for user in users[:tattooers]]
+    customer_ids = [user['id'] for user in users[tattooers:]]
+
+    db.session.execute(insert(Profile), [
+        {
+            'user_id': tattooer_id, 'bio': 'bio', 'social_media': {'instagram': f'@user{tattooer_id}'},
+            'profile_picture': '', 'ranking': rng.randint(0, 5),
+            'category_id': index % len(CATEGORIES) + 1,
+            'latitude': CENTER[0] + rng.uniform(-0.2, 0.2), 'longitude': CENTER[1] + rng.uniform(-0.2, 0.2),
+        }
+        for index, tattooer_id in enumerate(tattooer_ids)
+    ])
+    # insert() no pasa por el @validates del modelo: el geohash se completa aparte
+    for profile in db.session.scalars(select(Profile)):
+        profile.latitude = profile.latitude
+
+    posts = [
+        {
+            'image': 'https://example.com/tattoo.jpg', 'description': 'tattoo', 'likes': 0, 'user_id': tattooer_id,
+            'created_at': now - timedelta(days=30, minutes=rng.randint(0, 40000)),
+        }
+        for tattooer_id in tattooer_ids for _ in range(POSTS_PER_TATTOOER)
+    ]
+    db.session.execute(insert(Post), posts)
+    post_ids = list(range(1, len(posts) + 1))
+
+    likes, counts = [], {}
+    for customer_id in customer_ids:
+        for post_id in rng.sample(post_ids, LIKES_PER_CUSTOMER):
+            likes.append({'user_id': customer_id, 'post_id': post_id,
+                          'created_at': now - timedelta(days=20, minutes=rng.randint(0, 20000))})
+            counts[post_id] = counts.get(post_id, 0) + 1
+    db.session.execute(insert(Likes), likes)
+    db.session.execute(
+        update(Post.__table__).where(Post.id == bindparam('post_id')).values(likes=bindparam('count')),
+        [{'post_id': post_id, 'count': count} for post_id, count in counts.items()]
+    )
+
+    db.session.execute(insert(Review), [
+        {
+            'description': 'review', 'rating': rng.randint(1, 5), 'user_id': customer_id,
+            'tattooer_id': rng.choice(tattooer_ids), 'created_at': now - timedelta(days=10),
+        }
+        for customer_id in customer_ids for _ in range(REVIEWS_PER_CUSTOMER)
+    ])
+
+    db.session.execute(insert(Notification), [
+        {
+            'user_id': user['id'], 'sender_id': rng.choice(customer_ids), 'date': now - timedelta(days=5),
+            'is_read': rng.random() < 0.5, 'message': 'Tienes un nuevo like', 'type': 'like',
+            'created_at': now - timedelta(days=5),
+        }
+        for user in users for _ in range(NOTIFICATIONS_PER_USER)
+    ])
+    db.session.execute(insert(Notification), [
+        {
+            'user_id': user['id'], 'sender_id': rng.choice(customer_ids), 'date': now - timedelta(days=120 + index),
+            'is_read': True, 'message': 'Tienes un nuevo like', 'type': 'like',
+            'created_at': now - timedelta(days=120 + index),
+        }
+        for user in users for index in range(ARCHIVED_PER_USER)
+    ])
+    me = tattooer_ids[0]
+    # Bandeja que crece con el sitio: un listado sin paginar se nota a 10x
+    db.session.execute(insert(Notification), [
+        {
+            'user_id': me, 'sender_id': customer_id, 'date': now - timedelta(days=1), 'is_read': False,
+            'message': 'Nuevo seguidor', 'type': 'follow', 'created_at': now - timedelta(days=1),
+        }
+        for customer_id in customer_ids
+    ])
+    db.session.commit()
+
+    rebuild_rating_summaries()
+    rebuild_recommendations(log=_quiet)
+    refresh_rollups(log=_quiet)
+    archived = db.session.scalar(
+        select(func.max(Notification.id)).where(Notification.user_id == me, Notification.created_at < now - timedelta(days=90))
+    )
+    archive_notifications(days=90, log=_quiet)
+
+    return {
+        'tattooer': me,
+        'customer': customer_ids[0],
+        'post': db.session.scalar(select(Post.id).where(Post.user_id == me).limit(1)),
+        'notification': db.session.scalar(select(Notification.id).where(Notification.user_id == me).limit(1)),
+        'archived_notification': archived,
+        # Pagina que mezcla notificaciones de la tabla y del archivo
+        'archive_cursor': encode_cursor([archived + 1]),
+        'category': CATEGORIES[0],
+        'lat': CENTER[0],
+        'lng': CENTER[1],
+    }
+
+
+@pytest.fixture(scope='session', params=SCALES, ids=lambda scale: f'{scale}x')
+def seeded_app(request, tmp_path_factory):
+    directory = tmp_path_factory.mktemp(f'scale{request.param}')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{directory / "api.db"}',
+        'SQLALCHEMY_ENGINE_OPTIONS': counting_engine_options(),
+        'JOBS_DATABASE': str(directory / 'jobs.db'),
+        'ENABLE_ADMIN': False,
+        'ENABLE_CLI': False,
+        # Sin muestreo: contaria filas y tiempo ajenos a la ruta
+        'PROFILING_TOKEN': None,
+        'TESTING': True,
+    })
+    with app.app_context():
+        db.create_all()
+        ids = seed(request.param, random.Random(request.param))
+        db.session.remove()
+    return app, ids
+
+
+@pytest.fixture()
+def empty_app(tmp_path):
+    # Base vacia por test, para los modulos con estado propio (cdc, purga, jobs)
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "api.db"}',
+        'JOBS_DATABASE': str(tmp_path / 'jobs.db'),
+        'ENABLE_ADMIN': False,
+        'ENABLE_CLI': False,
+        'PROFILING_TOKEN': None,
+        'TESTING': True,
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(UserType), [{'name': 'tattooer'}, {'name': 'customer'}])
+        db.session.commit()
+        yield app
+        db.session.remove()
@@ -0,0 +1,23 @@
+"""
+Application factory checks (src/app.py).
+"""
+import pytest
+
+from app import create_app
+
+
+def _config(tmp_path, **overrides):
+    return {'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'JOBS_DATABASE': str(tmp_path / 'jobs.db'),
+            'ENABLE_ADMIN': False, 'ENABLE_CLI': False, 'PROFILING_TOKEN': None, **overrides}
+
+
+def test_refuses_to_start_without_jwt_secret(tmp_path):
+    with pytest.raises(RuntimeError, match='JWT_SECRET_KEY'):
+        create_app(_config(tmp_path, JWT_SECRET_KEY=None))
+
+
+def test_testing_apps_get_a_random_jwt_secret(tmp_path):
+    first = create_app(_config(tmp_path, JWT_SECRET_KEY=None, TESTING=True))
+    second = create_app(_config(tmp_path, JWT_SECRET_KEY=None, TESTING=True))
+    assert first.config['JWT_SECRET_KEY'] != second.config['JWT_SECRET_KEY']
+    assert create_app(_config(tmp_path, JWT_SECRET_KEY='clave'))
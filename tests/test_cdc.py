@@ -0,0 +1,114 @@
+"""
+Change-data-capture outbox (api/cdc.py): delivery order, checkpoints and pruning.
+"""
+from datetime import datetime, timedelta
+
+from api.cdc import read_batch, ack, consume, prune_events, GAP_TIMEOUT
+from api.models import db, User, Post, Notification, ChangeEvent, CdcCheckpoint
+
+
+def _user():
+    user = User(name='cdc', username='cdc', email='cdc@example.com', password='x', created_at=datetime.utcnow())
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _post(user, description):
+    post = Post(image='https://example.com/a.jpg', description=description, likes=0, user_id=user.id,
+                created_at=datetime.utcnow())
+    db.session.add(post)
+    db.session.commit()
+    return post
+
+
+def test_events_follow_commits_and_checkpoints(empty_app):
+    user = _user()
+    post = _post(user, 'a')
+    post.description = 'b'
+    db.session.commit()
+
+    events = read_batch('test')
+    assert [(event['table'], event['operation']) for event in events] == [('post', 'insert'), ('post', 'update')]
+    assert events[1]['fields'] == ['description']
+    ack('test', events[0]['id'])
+    assert [event['id'] for event in read_batch('test')] == [events[1]['id']]
+
+
+def test_events_after_prune_are_still_delivered(empty_app):
+    user = _user()
+    _post(user, 'a')
+    _post(user, 'b')
+    assert consume('test', lambda events: None) == 2
+    assert prune_events() == 2
+
+    # Con la tabla vacia el siguiente id sigue siendo mayor que el checkpoint
+    post = _post(user, 'c')
+    events = read_batch('test')
+    assert [(event['operation'], event['row_id']) for event in events] == [('insert', post.id)]
+
+
+def _event(event_id, flushed_at):
+    db.session.add(ChangeEvent(id=event_id, table_name='post', row_id=event_id, operation='insert',
+                               payload={'keys': {'user_id': 1}, 'fields': []}, created_at=flushed_at))
+    db.session.commit()
+
+
+def _delivered(consumer):
+    delivered = []
+    consume(consumer, lambda events: delivered.extend(event['id'] for event in events))
+    return delivered
+
+
+def test_late_commit_is_delivered_after_later_ids(empty_app):
+    # PostgreSQL: la transaccion del id 2 hizo flush hace rato pero confirma al final,
+    # despues de que el consumidor ya entrego el 3
+    flushed_at = datetime.utcnow() - timedelta(minutes=1)
+    _event(1, flushed_at)
+    _event(3, flushed_at)
+    assert _delivered('test') == [1, 3]
+    assert list(db.session.get(CdcCheckpoint, 'test').gaps) == ['2']
+
+    _event(4, flushed_at)
+    _event(2, flushed_at)
+    assert _delivered('test') == [2, 4]
+    assert db.session.get(CdcCheckpoint, 'test').gaps == {}
+    assert _delivered('test') == []
+
+
+def test_gaps_are_kept_until_timeout(empty_app):
+    now = datetime.utcnow()
+    _event(1, now)
+    _event(3, now)
+    assert _delivered('test') == [1, 3]
+    # El evento pendiente no se puede purgar mientras el hueco siga abierto
+    assert prune_events() == 1
+
+    checkpoint = db.session.get(CdcCheckpoint, 'test')
+    checkpoint.gaps = {'2': (now - GAP_TIMEOUT - timedelta(seconds=1)).isoformat()}
+    db.session.commit()
+    # Pasado el timeout se asume rollback: un id 2 que aparezca ya no se entrega
+    _event(2, now)
+    assert _delivered('test') == []
+    ack('test', 3, delivered=[])
+    assert db.session.get(CdcCheckpoint, 'test').gaps == {}
+    assert prune_events() == 2
+
+
+def test_admin_mark_read_records_updates(empty_app):
+    from api.admin import NotificationAdmin
+    user = _user()
+    now = datetime.utcnow()
+    unread, read = (Notification(user_id=user.id, sender_id=user.id, date=now, is_read=is_read, message='hola',
+                                 type='general', created_at=now) for is_read in (False, True))
+    db.session.add_all([unread, read])
+    db.session.commit()
+    consume('test', lambda events: None)
+
+    empty_app.secret_key = 'test'
+    with empty_app.test_request_context():
+        NotificationAdmin(Notification, db.session).action_mark_read([str(unread.id), str(read.id)])
+    events = read_batch('test')
+    assert [(event['table'], event['row_id'], event['operation'], event['fields']) for event in events] == \
+        [('notification', unread.id, 'update', ['is_read'])]
+    assert events[0]['keys'] == {'user_id': user.id, 'sender_id': user.id}
@@ -0,0 +1,48 @@
+"""
+Keyset cursors edited by hand: any value that encode_cursor could not have produced for
+the route is a 400, never a 500.
+"""
+import pytest
+from flask_jwt_extended import create_access_token
+
+from api.utils import encode_cursor
+
+BAD_CURSORS = [
+    'no-es-base64!',
+    encode_cursor([]),
+    encode_cursor({}),
+    encode_cursor(7),
+    encode_cursor(['7']),
+    encode_cursor([True]),
+    encode_cursor([1, 2, 3]),
+    encode_cursor([None, None]),
+]
+
+PATHS = [
+    '/api/review/{tattooer}?cursor={cursor}',
+    '/api/review/{tattooer}?sort=rating&cursor={cursor}',
+    '/api/posts?cursor={cursor}',
+    '/api/profiles/category/{category}?cursor={cursor}',
+    '/api/notifications?cursor={cursor}',
+    '/api/notifications?include_archived=1&cursor={cursor}',
+]
+
+
+@pytest.mark.parametrize('path', PATHS)
+@pytest.mark.parametrize('cursor', BAD_CURSORS)
+def test_malformed_cursor_is_a_bad_request(seeded_app, path, cursor):
+    app, ids = seeded_app
+    with app.app_context():
+        headers = {'Authorization': f'Bearer {create_access_token(identity=ids["tattooer"])}'}
+    response = app.test_client().get(path.format(cursor=cursor, **ids), headers=headers)
+    assert response.status_code == 400, response.get_data(as_text=True)
+    assert response.get_json()['message'] == 'Cursor inválido'
+
+
+def test_valid_cursors_still_page(seeded_app):
+    app, ids = seeded_app
+    client = app.test_client()
+    for path in ('/api/review/{tattooer}?limit=1', '/api/review/{tattooer}?sort=rating&limit=1'):
+        first = client.get(path.format(**ids)).get_json()
+        second = client.get(path.format(**ids) + f'&cursor={first["next_cursor"]}').get_json()
+        assert second['reviews'] and second['reviews'][0]['id'] != first['reviews'][0]['id']
@@ -0,0 +1,64 @@
+"""
+Export / import round trip (api/dataset.py): the derived tables are rebuilt after an import.
+"""
+from datetime import datetime, timedelta
+
+from api.dataset import export_dataset, import_dataset
+from api.models import db, User, Post, Likes, Review
+from api.recommendations import rebuild_recommendations, similar_items
+from api.rollups import refresh_rollups
+
+CREATED_AT = datetime.utcnow().replace(microsecond=0) - timedelta(hours=2)
+
+
+def _quiet(*args):
+    pass
+
+
+def _user(name, user_type_id):
+    user = User(name=name, username=name, email=f'{name}@example.com', password='x', user_type_id=user_type_id,
+                created_at=CREATED_AT)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def _snapshot(client, tattooer_id, post_id):
+    stats = client.get(f'/api/stats?metric=reviews&granularity=day'
+                       f'&start={(CREATED_AT - timedelta(days=1)).isoformat()}'
+                       f'&end={(CREATED_AT + timedelta(days=1)).isoformat()}').get_json()
+    return {
+        'summary': client.get(f'/api/review/{tattooer_id}/summary').get_json(),
+        'stats': stats['series'],
+        'similar': similar_items('post', post_id),
+    }
+
+
+def test_round_trip_rebuilds_derived_tables(empty_app, tmp_path):
+    tattooer = _user('tattooer', 1)
+    fans = [_user(f'fan{index}', 2) for index in range(3)]
+    posts = [Post(image='https://example.com/a.jpg', description=str(index), likes=len(fans), user_id=tattooer.id,
+                  created_at=CREATED_AT) for index in range(2)]
+    db.session.add_all(posts)
+    db.session.flush()
+    for rating, fan in zip((5, 4, 4), fans):
+        db.session.add_all(Likes(user_id=fan.id, post_id=post.id, created_at=CREATED_AT) for post in posts)
+        db.session.add(Review(user_id=fan.id, tattooer_id=tattooer.id, rating=rating, description='ok',
+                              created_at=CREATED_AT))
+    db.session.commit()
+    refresh_rollups(log=_quiet)
+    rebuild_recommendations(log=_quiet)
+
+    client = empty_app.test_client()
+    tattooer_id, post_id = tattooer.id, posts[0].id
+    before = _snapshot(client, tattooer_id, post_id)
+    assert before['summary']['review_count'] == 3
+    assert before['similar'] and before['stats']
+
+    export_dataset(str(tmp_path / 'export'), log=_quiet)
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    import_dataset(str(tmp_path / 'export'), log=_quiet)
+
+    assert _snapshot(client, tattooer_id, post_id) == before
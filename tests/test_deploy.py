@@ -0,0 +1,35 @@
+"""
+Start commands of the deploy files (Procfile, render.yaml) as gunicorn parses them
+from the repository root: src/gunicorn.conf.py must actually be loaded.
+"""
+import os
+import re
+import shlex
+import sys
+
+import pytest
+from gunicorn.app.wsgiapp import WSGIApplication
+
+ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+
+
+def _procfile():
+    with open(os.path.join(ROOT, 'Procfile')) as source:
+        return next(line.split(':', 1)[1].strip() for line in source if line.startswith('web:'))
+
+
+def _render():
+    with open(os.path.join(ROOT, 'render.yaml')) as source:
+        return re.search(r'startCommand:\s*"([^"]+)"', source.read()).group(1)
+
+
+@pytest.mark.parametrize('command', [_procfile(), _render()], ids=['Procfile', 'render.yaml'])
+def test_start_command_loads_gunicorn_conf(command, monkeypatch):
+    # Igual que el servicio: se arranca desde la raiz del repositorio
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setattr(sys, 'argv', shlex.split(command))
+    monkeypatch.delenv('GUNICORN_CMD_ARGS', raising=False)
+    cfg = WSGIApplication().cfg
+    assert cfg.preload_app is True
+    assert cfg.when_ready.__name__ == 'when_ready' and cfg.when_ready.__module__ == '__config__'
+    assert cfg.post_fork.__module__ == '__config__'
@@ -0,0 +1,43 @@
+"""
+Stored Idempotency-Key responses of the bulk endpoints and their TTL.
+"""
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from api.models import db, User, IdempotencyKey
+from api.utils import prune_idempotent_responses, IDEMPOTENCY_KEY_TTL_HOURS
+
+
+def _user():
+    user = User(name='a', username='a', email='a@example.com', password='x', created_at=datetime.utcnow())
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _bulk(client, user, key):
+    return client.post('/api/posts/bulk', headers={
+        'Authorization': f'Bearer {create_access_token(identity=user.id)}', 'Idempotency-Key': key,
+    }, json={'items': [{'image': 'https://example.com/a.jpg', 'description': 'a'}]})
+
+
+def test_replays_until_the_key_is_pruned(empty_app):
+    user = _user()
+    client = empty_app.test_client()
+    first = _bulk(client, user, 'lote-1')
+    assert first.status_code == 201
+    assert _bulk(client, user, 'lote-1').get_json() == first.get_json()
+
+    # Recien guardada: el prune no la toca
+    assert prune_idempotent_responses(db.session, IdempotencyKey) == 0
+    db.session.execute(db.update(IdempotencyKey).values(
+        created_at=datetime.utcnow() - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS + 1)
+    ))
+    db.session.commit()
+    assert prune_idempotent_responses(db.session, IdempotencyKey, batch_size=1) == 1
+
+    # Vencida: el reintento corre como una peticion nueva
+    again = _bulk(client, user, 'lote-1')
+    assert again.status_code == 201
+    assert again.get_json() != first.get_json()
@@ -0,0 +1,128 @@
+"""
+SQLite job queue (api/jobs.py): claiming, retries, visibility timeout and lock renewal.
+"""
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+import api.routes
+from api import jobs
+from api.jobs import HANDLERS, job, enqueue, claim, run_job, queue_stats, _connection
+from api.models import db, User, Post
+
+
+def _quiet(*args):
+    pass
+
+
+@pytest.fixture()
+def handlers(empty_app):
+    # Tipos de job propios de cada test; el registro global queda como estaba
+    before = dict(HANDLERS)
+    HANDLERS.clear()
+    yield HANDLERS
+    HANDLERS.clear()
+    HANDLERS.update(before)
+
+
+def _status(job_id):
+    return _connection().execute('SELECT status, attempts FROM job WHERE id = ?', (job_id,)).fetchone()
+
+
+def test_claim_order_and_dedupe(handlers):
+    job('test')(lambda: None)
+    low = enqueue('test', priority=-1)
+    high = enqueue('test', priority=5)
+    assert enqueue('test', dedupe_key='k') is not None
+    assert enqueue('test', dedupe_key='k') is None
+
+    assert claim('w')[0] == high
+    assert _status(high) == ('running', 1)
+    assert claim('w', types=['otro']) is None
+    claimed = [claim('w')[0] for _ in range(2)]
+    assert low == claimed[-1]
+    assert claim('w') is None
+
+
+def test_concurrency_cap(handlers):
+    job('solo', concurrency=1)(lambda: None)
+    enqueue('solo')
+    enqueue('solo')
+    assert claim('a') is not None
+    assert claim('b') is None
+
+
+def test_failures_are_retried_then_kept_as_failed(handlers):
+    calls = []
+
+    @job('flaky', max_attempts=2)
+    def flaky():
+        calls.append(1)
+        raise RuntimeError('boom')
+
+    job_id = enqueue('flaky')
+    assert run_job('w', log=_quiet)
+    assert _status(job_id) == ('queued', 1)
+    # Sin esperar el backoff
+    _connection().execute('UPDATE job SET run_at = 0 WHERE id = ?', (job_id,))
+    assert run_job('w', log=_quiet)
+    assert _status(job_id) == ('failed', 2)
+    assert len(calls) == 2
+    assert not run_job('w', log=_quiet)
+    assert queue_stats() == {('failed', 'flaky'): 1}
+
+
+def test_expired_lock_is_claimed_again(handlers):
+    job('test', timeout=60)(lambda: None)
+    job_id = enqueue('test')
+    assert claim('muerto')[0] == job_id
+    assert claim('vivo') is None
+    _connection().execute('UPDATE job SET locked_until = 0 WHERE id = ?', (job_id,))
+    assert claim('vivo') == (job_id, 'test', {}, 2)
+
+
+def test_running_job_keeps_its_lock(handlers, empty_app, monkeypatch):
+    monkeypatch.setattr(jobs, 'HEARTBEAT_FRACTION', 6)
+    started = threading.Event()
+
+    @job('largo', timeout=0.3)
+    def largo():
+        started.set()
+        time.sleep(1)
+
+    job_id = enqueue('largo')
+
+    def work():
+        with empty_app.app_context():
+            run_job('w', log=_quiet)
+
+    worker = threading.Thread(target=work)
+    worker.start()
+    started.wait(5)
+    # Mucho despues del timeout original otro proceso no puede tomarlo
+    time.sleep(0.6)
+    assert claim('otro') is None
+    worker.join()
+    assert _status(job_id) == ('done', 1)
+
+
+def test_delete_succeeds_when_enqueue_fails(empty_app, monkeypatch):
+    user = User(name='a', username='a', email='a@example.com', password='x', created_at=datetime.utcnow())
+    db.session.add(user)
+    db.session.flush()
+    post = Post(image='https://example.com/a.jpg', description='a', likes=0, user_id=user.id,
+                created_at=datetime.utcnow())
+    db.session.add(post)
+    db.session.commit()
+    headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+
+    def broken(*args, **kwargs):
+        raise OSError('cola no disponible')
+
+    monkeypatch.setattr(api.routes, 'enqueue', broken)
+    client = empty_app.test_client()
+    assert client.delete(f'/api/posts/{post.id}', headers=headers).status_code == 200
+    assert client.delete('/api/user', headers=headers).status_code == 200
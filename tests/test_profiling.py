@@ -0,0 +1,82 @@
+"""
+On-demand profiling (api/profiling.py): per-request profiles, worker-wide sampling
+and the downloads.
+"""
+import time
+
+import pytest
+
+from app import create_app
+from api.models import db
+
+TOKEN = 'perfilar'
+
+
+def _slow_view():
+    time.sleep(0.05)
+    return {'ok': True}
+
+
+@pytest.fixture()
+def profiled_app(tmp_path):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "api.db"}',
+        'JOBS_DATABASE': str(tmp_path / 'jobs.db'),
+        'PROFILING_TOKEN': TOKEN,
+        'PROFILING_DIR': str(tmp_path / 'profiles'),
+        'ENABLE_ADMIN': False,
+        'ENABLE_CLI': False,
+        'TESTING': True,
+    })
+    app.add_url_rule('/lento', 'lento', _slow_view)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_disabled_without_token(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'JOBS_DATABASE': str(tmp_path / 'jobs.db'),
+                      'PROFILING_TOKEN': None, 'ENABLE_ADMIN': False, 'ENABLE_CLI': False,
+                      'TESTING': True})
+    assert 'profiling' not in app.blueprints
+
+
+def test_routes_require_the_token(profiled_app):
+    client = profiled_app.test_client()
+    assert client.get('/_profiling/profiles').status_code == 403
+    assert client.get('/_profiling/profiles', headers={'X-Profiling-Token': 'otro'}).status_code == 403
+    assert 'X-Profile-Id' not in client.get('/lento', headers={'X-Profile': 'otro'}).headers
+
+
+def test_request_profile_downloads(profiled_app):
+    client = profiled_app.test_client()
+    profile_id = client.get('/lento', headers={'X-Profile': TOKEN}).headers['X-Profile-Id']
+
+    listed = client.get('/_profiling/profiles', headers={'X-Profiling-Token': TOKEN}).get_json()
+    assert [(item['id'], item['kind'], item['path'], item['status']) for item in listed] == \
+        [(profile_id, 'request', '/lento', 200)]
+
+    stacks = client.get(f'/_profiling/profiles/{profile_id}?token={TOKEN}').get_data(as_text=True)
+    assert '_slow_view (tests/test_profiling.py' in stacks
+    assert all(line.rpartition(' ')[2].isdigit() for line in stacks.splitlines())
+
+    response = client.get(f'/_profiling/profiles/{profile_id}?format=speedscope&token={TOKEN}')
+    document = response.get_json()
+    assert response.headers['Content-Disposition'] == f'attachment; filename={profile_id}.speedscope.json'
+    profile = document['profiles'][0]
+    assert len(profile['samples']) == len(profile['weights']) > 0
+    assert '_slow_view' in {frame['name'] for frame in document['shared']['frames']}
+
+
+def test_worker_sampling(profiled_app):
+    client = profiled_app.test_client()
+    headers = {'X-Profiling-Token': TOKEN}
+    assert client.post('/_profiling/sample?seconds=0.2', headers=headers).status_code == 202
+    assert client.post('/_profiling/sample?seconds=0.2', headers=headers).status_code == 409
+    time.sleep(0.4)
+
+    listed = client.get('/_profiling/profiles', headers=headers).get_json()
+    assert [item['kind'] for item in listed] == ['worker']
+    assert listed[0]['ticks'] > 0
+    assert client.post('/_profiling/sample?seconds=0', headers=headers).status_code == 400
+    assert client.get('/_profiling/profiles/..secreto', headers=headers).status_code == 404
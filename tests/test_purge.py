@@ -0,0 +1,99 @@
+"""
+Soft deletion and the background purge (api/purge.py).
+"""
+from datetime import datetime
+
+from api.models import db, User, Profile, Post, Likes, Review, Notification
+from api.purge import soft_delete_user, soft_delete_post, purge_deleted
+from api.ratings import rebuild_rating_summaries
+
+
+def _quiet(*args):
+    pass
+
+
+def _user(name):
+    user = User(name=name, username=name, email=f'{name}@example.com', password='x', created_at=datetime.utcnow())
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def _post(user):
+    post = Post(image='https://example.com/a.jpg', description='a', likes=0, user_id=user.id,
+                created_at=datetime.utcnow())
+    db.session.add(post)
+    db.session.flush()
+    return post
+
+
+def _like(user, post):
+    db.session.add(Likes(user_id=user.id, post_id=post.id, created_at=datetime.utcnow()))
+    post.likes += 1
+
+
+def test_purging_a_user_discounts_its_likes(empty_app):
+    owner, fan, leaving = _user('owner'), _user('fan'), _user('leaving')
+    first, second = _post(owner), _post(owner)
+    own = _post(leaving)
+    for post in (first, second):
+        _like(fan, post)
+        _like(leaving, post)
+    _like(fan, own)
+    db.session.add(Review(user_id=leaving.id, tattooer_id=owner.id, rating=5, description='bien',
+                          created_at=datetime.utcnow()))
+    db.session.add(Notification(user_id=owner.id, sender_id=leaving.id, date=datetime.utcnow(), is_read=False,
+                                message='like', type='like', created_at=datetime.utcnow()))
+    db.session.commit()
+
+    soft_delete_user(leaving)
+    db.session.commit()
+    removed = purge_deleted(batch_size=1, log=_quiet)
+
+    assert removed == {'likes': 3, 'post': 1, 'review': 1, 'notification': 1, 'notification_archive': 0,
+                       'profile': 0, 'user': 1}
+    db.session.expire_all()
+    assert [db.session.get(Post, post.id).likes for post in (first, second)] == [1, 1]
+    assert db.session.scalar(db.select(db.func.count(Likes.id))) == 2
+
+
+def test_purging_a_post_removes_its_likes(empty_app):
+    owner, fan = _user('owner'), _user('fan')
+    post = _post(owner)
+    _like(fan, post)
+    db.session.commit()
+
+    soft_delete_post(post)
+    db.session.commit()
+    assert purge_deleted(log=_quiet) == {'likes': 1, 'post': 1, 'review': 0, 'notification': 0,
+                                         'notification_archive': 0, 'profile': 0, 'user': 0}
+    assert db.session.scalar(db.select(db.func.count(Post.id)).execution_options(include_deleted=True)) == 0
+
+
+def test_reviews_of_a_deleted_author_stop_counting_when_marked(empty_app):
+    tattooer, staying, leaving = _user('tattooer'), _user('staying'), _user('leaving')
+    db.session.add(Profile(user_id=tattooer.id, social_media={}, bio='', profile_picture='', ranking=0))
+    for author, rating in ((staying, 5), (leaving, 1)):
+        db.session.add(Review(user_id=author.id, tattooer_id=tattooer.id, rating=rating, description='r',
+                              created_at=datetime.utcnow()))
+    db.session.commit()
+    client = empty_app.test_client()
+
+    def visible():
+        listed = client.get(f'/api/review/{tattooer.id}').get_json()
+        page = client.get(f'/api/profile/{tattooer.id}/page').get_json()
+        summary = client.get(f'/api/review/{tattooer.id}/summary').get_json()
+        return ([review['rating'] for review in listed['reviews']],
+                [review['rating'] for review in page['reviews']],
+                (summary['review_count'], summary['histogram']['1'], summary['histogram']['5']))
+
+    assert visible() == ([1, 5], [1, 5], (2, 1, 1))
+    soft_delete_user(leaving)
+    db.session.commit()
+    assert visible() == ([5], [5], (1, 0, 1))
+    # Una reconstruccion aplica la misma regla
+    rebuild_rating_summaries()
+    assert visible() == ([5], [5], (1, 0, 1))
+    # La purga no vuelve a descontarla
+    purge_deleted(log=_quiet)
+    assert visible() == ([5], [5], (1, 0, 1))
@@ -0,0 +1,150 @@
+"""
+Every route of src/api/routes.py with its budget: SQL statements, rows fetched and
+wall time. The same budget must hold on the 1x and the 10x dataset (conftest.SCALES),
+so a route that starts reading whole tables fails here before it reaches production.
+
+New routes need a case: test_every_route_has_a_budget fails otherwise.
+"""
+from datetime import datetime
+from typing import Callable, NamedTuple, Optional
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from api.models import db, User, Profile, Post
+from budget import Budget, BudgetClient
+from conftest import PASSWORD
+
+
+def _own_post(ids):
+    post = Post(image='https://example.com/borrar.jpg', description='borrar', likes=0,
+                user_id=ids['tattooer'], created_at=datetime.utcnow())
+    db.session.add(post)
+    db.session.commit()
+    return {'own_post': post.id}
+
+
+def _throwaway_user(ids):
+    count = db.session.scalar(db.select(db.func.count(User.id)).execution_options(include_deleted=True))
+    user = User(name='temporal', username=f'temporal{count}', email=f'temporal{count}@example.com',
+                password=PASSWORD, created_at=datetime.utcnow())
+    db.session.add(user)
+    db.session.commit()
+    return {'throwaway': user.id}
+
+
+def _throwaway_tattooer(ids):
+    extra = _throwaway_user(ids)
+    db.session.add(Profile(user_id=extra['throwaway'], bio='bio', social_media={}, profile_picture='', ranking=0))
+    db.session.commit()
+    return extra
+
+
+class Case(NamedTuple):
+    endpoint: str
+    method: str
+    # Se completa con los ids del dataset: '/api/posts/{post}'
+    path: str
+    budget: Budget
+    body: Optional[Callable] = None
+    # Clave de ids del usuario del token; None para peticiones anonimas
+    user: Optional[str] = 'tattooer'
+    status: int = 200
+    setup: Optional[Callable] = None
+
+
+# Los listados leen una pagina mas una fila (DEFAULT_PAGE_SIZE + 1 = 21), nunca la tabla.
+# El usuario completo (/user sin include, login) trae todas sus relaciones: se mide con
+# un cliente, cuya actividad es la misma en todas las escalas.
+CASES = [
+    # POSTS
+    Case('api.get_all_posts', 'GET', '/api/posts', Budget(1, 21)),
+    Case('api.create_post', 'POST', '/api/posts', Budget(3, 1), status=201,
+         body=lambda ids: {'image': 'https://example.com/nuevo.jpg', 'description': 'nuevo'}),
+    Case('api.create_posts_bulk', 'POST', '/api/posts/bulk', Budget(4, 3), status=201,
+         body=lambda ids: {'items': [{'image': 'https://example.com/a.jpg', 'description': 'a'}] * 3}),
+    Case('api.delete_post', 'DELETE', '/api/posts/{own_post}', Budget(3, 1), setup=_own_post),
+    Case('api.update_post', 'PUT', '/api/posts/{post}', Budget(4, 2),
+         body=lambda ids: {'image': 'https://example.com/editado.jpg', 'description': 'editado'}),
+    Case('api.get_post_by_id', 'GET', '/api/posts/{post}', Budget(1, 1), user=None),
+    # AUTENTICACION
+    Case('api.register', 'POST', '/api/register', Budget(2, 0), user=None, status=201,
+         body=lambda ids: {'email': 'nuevo@example.com', 'password': 'x', 'name': 'Nuevo', 'username': 'nuevo'}),
+    Case('api.login', 'POST', '/api/login', Budget(4, 20), user=None,
+         body=lambda ids: {'email': f'user{ids["customer"]}@example.com', 'password': PASSWORD}),
+    # USUARIOS
+    Case('api.get_current_user', 'GET', '/api/user', Budget(4, 20), user='customer'),
+    Case('api.get_current_user', 'GET', '/api/user?fields=id,username&include=profile', Budget(1, 2)),
+    Case('api.update_user', 'PUT', '/api/user', Budget(6, 21), user='customer',
+         body=lambda ids: {'name': 'Nombre editado'}),
+    # Una lectura mas: las reviews del usuario salen del histograma al marcarlo
+    Case('api.delete_user', 'DELETE', '/api/user', Budget(5, 1), user='throwaway', setup=_throwaway_user),
+    # PERFIL
+    Case('api.get_tattooer_profile', 'GET', '/api/profile/{tattooer}', Budget(2, 2), user=None),
+    Case('api.get_tattooer_profile_page', 'GET', '/api/profile/{tattooer}/page', Budget(4, 20), user=None),
+    Case('api.get_tattooer_posts', 'GET', '/api/profile/{tattooer}/posts', Budget(1, 13), user=None),
+    Case('api.create_tattooer_profile', 'POST', '/api/profile', Budget(11, 4), user=None, status=201,
+         body=lambda ids: {'name': 'Estudio', 'email': 'estudio@example.com', 'username': 'estudio',
+                           'password': 'x', 'bio': 'bio', 'social_media': {'instagram': '@estudio'},
+                           'latitude': -33.44, 'longitude': -70.65}),
+    Case('api.update_tattooer_profile', 'PUT', '/api/profile/{tattooer}', Budget(5, 3), user=None,
+         body=lambda ids: {'bio': 'bio editada', 'latitude': -33.46, 'longitude': -70.67}),
+    Case('api.delete_tattooer_profile', 'DELETE', '/api/profile/{throwaway}', Budget(4, 2), user=None,
+         setup=_throwaway_tattooer),
+    # REVIEWS
+    Case('api.get_review_by_tattoer', 'GET', '/api/review/{tattooer}', Budget(3, 23), user=None),
+    Case('api.get_review_summary', 'GET', '/api/review/{tattooer}/summary', Budget(1, 1), user=None),
+    Case('api.create_review', 'POST', '/api/review', Budget(6, 3), user='customer', status=201,
+         body=lambda ids: {'user_id': ids['customer'], 'tattooer_id': ids['tattooer'],
+                           'rating': 4, 'description': 'muy bueno'}),
+    Case('api.create_reviews_bulk', 'POST', '/api/review/bulk', Budget(6, 4), user='customer', status=201,
+         body=lambda ids: {'items': [{'tattooer_id': ids['tattooer'], 'rating': 5, 'description': 'bien'}] * 3}),
+    # NOTIFICACIONES
+    Case('api.get_all_notifications', 'GET', '/api/notifications', Budget(1, 21)),
+    # Archivo: una fila comprimida por mes, a lo sumo dos meses para una pagina
+    Case('api.get_all_notifications', 'GET', '/api/notifications?include_archived=1&cursor={archive_cursor}',
+         Budget(2, 23)),
+    Case('api.get_notification_by_id', 'GET', '/api/notification/{notification}', Budget(1, 1)),
+    Case('api.get_notification_by_id', 'GET', '/api/notification/{archived_notification}', Budget(2, 2)),
+    Case('api.set_notification_readed', 'PUT', '/api/notifcation/{notification}/readed', Budget(3, 1)),
+    Case('api.create_notification', 'POST', '/api/notification', Budget(3, 1), status=201,
+         body=lambda ids: {'mensaje': 'Nuevo seguidor', 'user_id': ids['customer']}),
+    # HOME
+    Case('api.get_profiles_by_category', 'GET', '/api/profiles/category/{category}', Budget(1, 21), user=None),
+    Case('api.get_top_likes_posts', 'GET', '/api/posts/top-likes', Budget(1, 5), user=None),
+    Case('api.get_top_tattooer', 'GET', '/api/profiles/top-tattooer', Budget(1, 10), user=None),
+    # El radio crece hasta juntar k=20; el recuadro en SQL deja fuera el resto de las celdas
+    Case('api.get_nearby_profiles', 'GET', '/api/profiles/nearby?lat={lat}&lng={lng}', Budget(6, 150), user=None),
+    # RECOMENDACIONES
+    Case('api.get_recommendations', 'GET', '/api/recommendations', Budget(8, 80), user='customer'),
+    Case('api.get_recommendations', 'GET', '/api/recommendations?post_id={post}', Budget(2, 21), user=None),
+    # ESTADISTICAS
+    Case('api.get_stats', 'GET', '/api/stats?metric=reviews', Budget(1, 31), user=None),
+]
+
+
+@pytest.fixture(scope='session')
+def budget_client(seeded_app):
+    app, ids = seeded_app
+    return app, ids, BudgetClient(app)
+
+
+@pytest.mark.parametrize('case', CASES, ids=lambda case: f'{case.method} {case.path}')
+def test_route_within_budget(budget_client, case):
+    app, ids, client = budget_client
+    with app.app_context():
+        # Filas propias de las escrituras destructivas; se crean fuera de la medicion
+        ids = {**ids, **(case.setup(ids) if case.setup else {})}
+        headers = {'Authorization': f'Bearer {create_access_token(identity=ids[case.user])}'} if case.user else {}
+    path = case.path.format(**ids)
+    assert app.url_map.bind('localhost').match(path.split('?')[0], method=case.method)[0] == case.endpoint
+
+    response = client.request(case.method, path, case.budget, headers=headers,
+                              json=case.body(ids) if case.body else None)
+    assert response.status_code == case.status, response.get_json()
+
+
+def test_every_route_has_a_budget(seeded_app):
+    app, _ = seeded_app
+    endpoints = {rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint.startswith('api.')}
+    assert endpoints - {case.endpoint for case in CASES} == set()
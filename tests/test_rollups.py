@@ -0,0 +1,86 @@
+"""
+Rollups (api/rollups.py): soft-deleted rows are folded and every delete subtracts the
+rows already behind the watermark.
+"""
+from datetime import datetime, timedelta
+
+from api.admin import PostAdmin, ReviewAdmin
+from api.models import db, User, Post, Likes, Review
+from api.purge import soft_delete_post, purge_deleted
+from api.rollups import refresh_rollups, query_series
+
+# Fuera del COMMIT_LAG: la primera pasada de refresh ya las agrega
+CREATED_AT = datetime.utcnow().replace(microsecond=0) - timedelta(hours=2)
+
+
+def _quiet(*args):
+    pass
+
+
+def _activity():
+    owner = User(name='owner', username='owner', email='owner@example.com', password='x', created_at=CREATED_AT)
+    fan = User(name='fan', username='fan', email='fan@example.com', password='x', created_at=CREATED_AT)
+    db.session.add_all([owner, fan])
+    db.session.flush()
+    post = Post(image='https://example.com/a.jpg', description='a', likes=1, user_id=owner.id,
+                created_at=CREATED_AT)
+    db.session.add(post)
+    db.session.flush()
+    db.session.add(Likes(user_id=fan.id, post_id=post.id, created_at=CREATED_AT))
+    review = Review(user_id=fan.id, tattooer_id=owner.id, rating=4, description='bien', created_at=CREATED_AT)
+    db.session.add(review)
+    db.session.commit()
+    return post, review
+
+
+def _totals():
+    start, end = CREATED_AT - timedelta(days=1), CREATED_AT + timedelta(days=1)
+    totals = {}
+    for metric in ('likes', 'posts', 'reviews'):
+        series = query_series(metric, 'day', start, end)
+        totals[metric] = (sum(row[1] for row in series), sum(row[2] for row in series))
+    return totals
+
+
+def test_soft_deleted_rows_count_until_purged(empty_app):
+    post, _ = _activity()
+    soft_delete_post(post)
+    db.session.commit()
+
+    refresh_rollups(log=_quiet)
+    assert _totals() == {'likes': (1, 0), 'posts': (1, 0), 'reviews': (1, 4)}
+    purge_deleted(log=_quiet)
+    assert _totals() == {'likes': (0, 0), 'posts': (0, 0), 'reviews': (1, 4)}
+
+
+def test_admin_deletes_discount_folded_rows(empty_app):
+    post, review = _activity()
+    refresh_rollups(log=_quiet)
+
+    # flash() guarda el mensaje en la sesion de Flask
+    empty_app.secret_key = 'test'
+    with empty_app.test_request_context():
+        ReviewAdmin(Review, db.session).action_delete([review.id])
+        PostAdmin(Post, db.session).action_delete([post.id])
+    assert _totals() == {'likes': (0, 0), 'posts': (0, 0), 'reviews': (0, 0)}
+    # Las filas borradas ya no estan: otra pasada no cambia nada
+    refresh_rollups(log=_quiet)
+    assert _totals() == {'likes': (0, 0), 'posts': (0, 0), 'reviews': (0, 0)}
+
+
+def test_orm_deletes_discount_only_folded_rows(empty_app):
+    post, review = _activity()
+    refresh_rollups(log=_quiet)
+    db.session.delete(review)
+    db.session.commit()
+    assert _totals()['reviews'] == (0, 0)
+
+    # Una review aun no agregada no se descuenta: nunca se sumo
+    fan = db.session.scalar(db.select(User).where(User.username == 'fan'))
+    late = Review(user_id=fan.id, tattooer_id=post.user_id, rating=2, description='mal', created_at=CREATED_AT)
+    db.session.add(late)
+    db.session.commit()
+    db.session.delete(late)
+    db.session.commit()
+    refresh_rollups(log=_quiet)
+    assert _totals() == {'likes': (1, 0), 'posts': (1, 0), 'reviews': (0, 0)}
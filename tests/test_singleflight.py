@@ -0,0 +1,76 @@
+"""
+Request coalescing for the hot public reads (api/singleflight.py).
+"""
+import threading
+import time
+
+from flask import Response
+from flask_jwt_extended import create_access_token
+
+from api.singleflight import SingleFlight
+from budget import Budget, BudgetClient
+
+
+def _slow(calls, body, delay=0.05):
+    def compute():
+        calls.append(body)
+        time.sleep(delay)
+        return Response(body, mimetype='application/json')
+    return compute
+
+
+def test_concurrent_requests_share_one_computation():
+    flights, calls, bodies = SingleFlight(), [], []
+    barrier = threading.Barrier(8)
+
+    def worker():
+        barrier.wait()
+        bodies.append(flights.get('key', _slow(calls, b'[1]'), ttl=5, stale=60).body)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert bodies == [b'[1]'] * 8
+
+
+def test_expired_entry_is_served_stale_while_one_refresh_runs():
+    flights, calls = SingleFlight(), []
+    flights.get('key', _slow(calls, b'old', delay=0), ttl=0, stale=60)
+
+    # Vencida: todas reciben la version anterior sin esperar y se refresca una sola vez
+    bodies = [flights.get('key', _slow(calls, b'new', delay=0.1), ttl=5, stale=60).body for _ in range(5)]
+    assert bodies == [b'old'] * 5
+    time.sleep(0.2)
+    assert flights.get('key', _slow(calls, b'newer'), ttl=5, stale=60).body == b'new'
+    assert calls == [b'old', b'new']
+
+
+def test_failed_responses_are_not_kept():
+    flights, calls = SingleFlight(), []
+
+    def missing():
+        calls.append(1)
+        return Response(b'{}', status=404)
+
+    assert flights.get('key', missing, ttl=5, stale=60).status == 404
+    flights.get('key', missing, ttl=5, stale=60)
+    assert len(calls) == 2
+
+
+def test_hot_routes_are_served_from_the_worker_cache(seeded_app):
+    app, ids = seeded_app
+    app.extensions['singleflight'].clear()
+    client = BudgetClient(app)
+    for path in (f'/api/posts/{ids["post"]}', '/api/posts/top-likes', '/api/profiles/top-tattooer'):
+        first = client.get(path, Budget(1, 10))
+        assert client.get(path, Budget(0, 0)).get_data() == first.get_data()
+
+    # Editar el post descarta su respuesta en este worker
+    with app.app_context():
+        token = create_access_token(identity=ids['tattooer'])
+    client.put(f'/api/posts/{ids["post"]}', Budget(4, 2), headers={'Authorization': f'Bearer {token}'},
+               json={'image': 'https://example.com/cache.jpg', 'description': 'sin cache'})
+    assert client.get(f'/api/posts/{ids["post"]}', Budget(1, 1)).get_json()['description'] == 'sin cache'
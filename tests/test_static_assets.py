@@ -0,0 +1,69 @@
+"""
+Front end manifest (api/static_assets.py) in development reload mode.
+"""
+import os
+
+import pytest
+
+from api import static_assets
+from api.static_assets import AssetManifest
+
+
+@pytest.fixture()
+def hashed(monkeypatch):
+    names = []
+    original = static_assets._file_hash
+
+    def counting(path):
+        names.append(os.path.basename(path))
+        return original(path)
+
+    monkeypatch.setattr(static_assets, '_file_hash', counting)
+    return names
+
+
+def _write(path, content, mtime=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_spa_misses_do_not_rehash(tmp_path, hashed):
+    _write(tmp_path / 'index.html', '<html>')
+    _write(tmp_path / 'js' / 'bundle.js', 'app()')
+    manifest = AssetManifest(str(tmp_path), reload=True)
+    assert sorted(hashed) == ['bundle.js', 'index.html']
+
+    hashed.clear()
+    for _ in range(5):
+        assert manifest.get('profile/3') is None
+    assert manifest.get('index.html') is not None
+    assert hashed == []
+
+
+def test_new_and_modified_files_are_picked_up(tmp_path, hashed):
+    _write(tmp_path / 'index.html', '<html>', mtime=1000)
+    _write(tmp_path / 'js' / 'bundle.js', 'app()', mtime=1000)
+    manifest = AssetManifest(str(tmp_path), reload=True)
+    etag = manifest.get('index.html').etag
+
+    hashed.clear()
+    _write(tmp_path / 'js' / 'chunk.js', 'lazy()')
+    assert manifest.get('js/chunk.js') is not None
+    assert hashed == ['chunk.js']
+
+    hashed.clear()
+    _write(tmp_path / 'index.html', '<html lang="es">', mtime=2000)
+    assert manifest.get('index.html').etag != etag
+    assert hashed == ['index.html']
+
+    os.remove(tmp_path / 'js' / 'chunk.js')
+    assert manifest.get('js/chunk.js') is None
+
+
+def test_without_reload_the_manifest_is_fixed(tmp_path, hashed):
+    _write(tmp_path / 'index.html', '<html>')
+    manifest = AssetManifest(str(tmp_path))
+    _write(tmp_path / 'nuevo.js', 'x')
+    assert manifest.get('nuevo.js') is None
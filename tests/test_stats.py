@@ -0,0 +1,22 @@
+"""
+GET /api/stats date parameters.
+"""
+from urllib.parse import quote
+
+
+def _stats(app, start, end):
+    return app.test_client().get(f'/api/stats?metric=likes&granularity=hour&start={quote(start)}&end={quote(end)}')
+
+
+def test_offsets_are_converted_to_utc(seeded_app):
+    app, _ = seeded_app
+    response = _stats(app, '2026-10-01T00:00:00-03:00', '2026-10-01T06:00:00+00:00')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['start'], body['end']) == ('2026-10-01T03:00:00', '2026-10-01T06:00:00')
+
+
+def test_naive_and_aware_dates_can_be_mixed(seeded_app):
+    app, _ = seeded_app
+    assert _stats(app, '2026-10-01T00:00:00', '2026-10-02T00:00:00+02:00').status_code == 200
+    assert _stats(app, '2026-10-02T00:00:00+02:00', '2026-10-01T00:00:00').status_code == 400
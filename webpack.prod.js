@@ -4,6 +4,8 @@ const Dotenv = require('dotenv-webpack');
 module.exports = merge(common, {
     mode: 'production',
     output: {
+        // Huella de contenido en el nombre: el backend lo sirve con cache immutable
+        filename: 'bundle.[contenthash:8].js',
         publicPath: '/'
     },
     plugins: [